@@ -2,6 +2,12 @@
 from app.infrastructure.container import InfrastructureContainer
 from app.config import Settings
 
+from app.application.services.availability import AvailabilityTracker
+from app.application.services.availability_feed import AvailabilityFeed
+from app.application.services.lease_coalescer import LeaseCoalescer
+from app.application.services.lease_reaper import LeaseReaper
+from app.application.services.lease_waiters import LeaseWaiters
+from app.application.services.reservation import ReservationPool
 from app.application.services.user import UserService
 
 class ServicesContainer:
@@ -11,10 +17,93 @@ class ServicesContainer:
         self._settings = settings
         self._infra = infra
         self._user_service: UserService | None = None
+        self._lease_reaper: LeaseReaper | None = None
+        self._reservation_pool: ReservationPool | None = None
+        self._lease_waiters: LeaseWaiters | None = None
+        self._availability: AvailabilityTracker | None = None
+        self._availability_feed: AvailabilityFeed | None = None
 
     @property
     def user_service(self) -> UserService:
         """Получить user service."""
         if self._user_service is None:
-            self._user_service = UserService(user_repo=self._infra.user_repository)
-        return self._user_service
\ No newline at end of file
+            self._user_service = UserService(
+                user_repo=self._infra.user_repository,
+                lease_ttl=self._settings.lease_ttl_seconds,
+                lease_coalescer=self._build_lease_coalescer(),
+                reservation_pool=self.reservation_pool,
+                lease_waiters=self.lease_waiters,
+                etag_max_age=self._settings.user_etag_max_age_seconds,
+                availability=self.availability,
+                availability_feed=self.availability_feed,
+            )
+        return self._user_service
+
+    @property
+    def lease_waiters(self) -> LeaseWaiters:
+        """Получить очередь ожидания аренды, подписанную на события освобождения."""
+        if self._lease_waiters is None:
+            self._lease_waiters = LeaseWaiters(max_waiters=self._settings.lease_max_waiters)
+            self._infra.release_notifier.subscribe(self._lease_waiters.on_released)
+        return self._lease_waiters
+
+    @property
+    def availability(self) -> AvailabilityTracker:
+        """Получить счетчики доступности, связанные с другими воркерами через release_notifier."""
+        if self._availability is None:
+            self._availability = AvailabilityTracker(
+                user_repo=self._infra.user_repository,
+                reconcile_interval=self._settings.availability_reconcile_interval_seconds,
+                notifier=self._infra.release_notifier,
+                publish_interval=self._settings.availability_publish_interval_seconds,
+            )
+        return self._availability
+
+    @property
+    def availability_feed(self) -> AvailabilityFeed:
+        """Получить рассылку изменений доступности подписчикам потока."""
+        if self._availability_feed is None:
+            self._availability_feed = AvailabilityFeed(
+                tracker=self.availability,
+                interval=self._settings.availability_stream_interval_seconds,
+                queue_size=self._settings.availability_stream_queue_size,
+                max_subscribers=self._settings.availability_stream_max_subscribers,
+                keepalive=self._settings.availability_stream_keepalive_seconds,
+            )
+        return self._availability_feed
+
+    def _build_lease_coalescer(self) -> LeaseCoalescer | None:
+        """Коалесцер аренд, если окно объединения задано."""
+        if self._settings.lease_coalesce_window_ms <= 0:
+            return None
+        return LeaseCoalescer(
+            user_repo=self._infra.user_repository,
+            window=self._settings.lease_coalesce_window_ms / 1000,
+            max_batch=self._settings.lease_coalesce_max_batch,
+        )
+
+    @property
+    def lease_reaper(self) -> LeaseReaper:
+        """Получить фоновую задачу очистки истекших аренд."""
+        if self._lease_reaper is None:
+            self._lease_reaper = LeaseReaper(
+                user_repo=self._infra.user_repository,
+                interval=self._settings.lease_reaper_interval_seconds,
+                batch_size=self._settings.lease_reaper_batch_size,
+            )
+        return self._lease_reaper
+
+    @property
+    def reservation_pool(self) -> ReservationPool | None:
+        """Получить резерв пользователей воркера (None, если режим выключен)."""
+        if self._reservation_pool is None and self._settings.reservation_block_size > 0:
+            self._reservation_pool = ReservationPool(
+                user_repo=self._infra.user_repository,
+                block_size=self._settings.reservation_block_size,
+                low_water=self._settings.reservation_low_water,
+                reservation_ttl=self._settings.reservation_ttl_seconds,
+                flush_interval=self._settings.reservation_flush_interval_seconds,
+                project_ids=self._settings.reservation_project_ids,
+                availability=self.availability,
+            )
+        return self._reservation_pool
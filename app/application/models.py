@@ -40,11 +40,37 @@ class UserRead(BaseModel):
     env: Env
     domain: Domain
     locktime: int
+    lease_expires_at: int | None = None
+
+
+class UserLease(UserRead):
+    """Схема арендованного пользователя: токен аренды видит только ее держатель."""
+    lease_token: UUID | None = None
+
+
+class UserFilter(BaseModel):
+    """Фильтр пользователей по проекту, окружению и домену."""
+    project_id: UUID | None = None
+    env: Env | None = None
+    domain: Domain | None = None
+
+
+class UserListFilter(UserFilter):
+    """Фильтр списка пользователей с учетом состояния блокировки."""
+    locked: bool | None = None
+
+
+@dataclass
+class UserPage:
+    """Страница пользователей с курсором на следующую страницу."""
+    items: list[UserRead]
+    next_cursor: str | None
+
 
 @dataclass
 class LockOperationResult:
     """Результат операции блокировки пользователя."""
-    user: UserRead
+    user: UserLease
     already_locked: bool
 
 
@@ -52,4 +78,58 @@ class LockOperationResult:
 class UnlockOperationResult:
     """Результат операции разблокировки пользователя."""
     user: UserRead
-    already_unlocked: bool
\ No newline at end of file
+    already_unlocked: bool
+
+
+@dataclass
+class BatchUnlockOperationResult:
+    """Результат пакетной разблокировки пользователей."""
+    results: list[UnlockOperationResult]
+    not_found: list[UUID]
+
+
+
+@dataclass
+class LeaseRenewal:
+    """Продленная аренда пользователя."""
+    user_id: UUID
+    lease_expires_at: int | None
+
+
+@dataclass
+class BatchRenewOperationResult:
+    """Результат пакетного продления аренд."""
+    renewed: list[LeaseRenewal]
+    lost: list[UUID]
+
+
+
+@dataclass
+class BulkCreateFailure:
+    """Ошибка создания одной строки при массовом импорте."""
+    index: int
+    error: str
+
+
+@dataclass
+class BulkCreateResult:
+    """Результат массового импорта пользователей."""
+    created: list[UUID]
+    failures: list[BulkCreateFailure]
+
+
+@dataclass
+class AvailabilityBucket:
+    """Число свободных и заблокированных пользователей одного фильтра."""
+    project_id: UUID
+    env: str
+    domain: str
+    free: int
+    locked: int
+
+
+@dataclass
+class Availability:
+    """Сводка доступности пользователей по фильтрам."""
+    buckets: list[AvailabilityBucket]
+    reconciled_at: float
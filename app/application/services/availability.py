@@ -0,0 +1,198 @@
+"""Счетчики свободных и заблокированных пользователей по фильтрам."""
+import asyncio
+import logging
+import time
+from typing import Callable
+from uuid import UUID
+
+from app.application.models import AvailabilityBucket
+from app.infrastructure.db.notifications import AvailabilityDeltas, ReleaseKey, ReleaseNotifier
+from app.infrastructure.db.repository.user import UserRepository
+from app.infrastructure.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+AVAILABILITY_DRIFT = registry.counter(
+    "user_availability_drift_total", "Расхождение счетчиков доступности с БД, исправленное сверкой"
+)
+
+# Ключ счетчика: (project_id, env, domain)
+BucketKey = tuple[UUID, str, str]
+
+
+def _value(member) -> str:
+    return getattr(member, "value", member)
+
+
+def bucket_key(user: dict) -> BucketKey:
+    return user["project_id"], _value(user["env"]), _value(user["domain"])
+
+
+class AvailabilityTracker:
+    """Число свободных и заблокированных пользователей по (project_id, env, domain) в памяти.
+
+    Счетчики меняются инкрементально: создания и блокировки сообщают UserService
+    и ReservationPool, освобождения приходят событиями репозитория (включая reaper
+    и другие воркеры). Свои создания и блокировки трекер копит и раз в publish_interval
+    рассылает другим воркерам одним сообщением. Расхождения (например, после потери
+    сообщения) исправляет сверка с БД раз в reconcile_interval секунд.
+    """
+
+    def __init__(
+        self,
+        user_repo: UserRepository,
+        reconcile_interval: float,
+        notifier: ReleaseNotifier | None = None,
+        publish_interval: float = 0.2,
+    ) -> None:
+        self._user_repo = user_repo
+        self._reconcile_interval = reconcile_interval
+        self._notifier = notifier
+        self._publish_interval = publish_interval
+        # ключ -> [free, locked]
+        self._counts: dict[BucketKey, list[int]] = {}
+        # Изменения, пришедшие во время сверки: применяются поверх ее результата
+        self._pending: list[tuple[BucketKey, int, int]] | None = None
+        # Свои изменения, еще не разосланные другим воркерам
+        self._outbox: dict[BucketKey, tuple[int, int]] = {}
+        self._listeners: list[Callable[[BucketKey], None]] = []
+        self.reconciled_at: float | None = None
+        self._tasks: list[asyncio.Task] = []
+        if notifier is not None:
+            notifier.subscribe(self.on_released)
+            notifier.subscribe_deltas(self.on_deltas)
+
+    def add_listener(self, callback: Callable[[BucketKey], None]) -> None:
+        """Получать ключи фильтров, счетчики которых изменились."""
+        self._listeners.append(callback)
+
+    def on_created(self, users: list[dict]) -> None:
+        for user in users:
+            self._apply(bucket_key(user), 1, 0, local=True)
+
+    def on_locked(self, users: list[dict]) -> None:
+        for user in users:
+            self._apply(bucket_key(user), -1, 1, local=True)
+
+    def on_released(self, released: dict[ReleaseKey, int]) -> None:
+        # Освобождения другим воркерам рассылает сам репозиторий
+        for key, count in released.items():
+            self._apply(key, count, -count)
+
+    def on_deltas(self, deltas: AvailabilityDeltas) -> None:
+        """Изменения от другого воркера."""
+        for key, (free, locked) in deltas.items():
+            self._apply(key, free, locked)
+
+    def get(self, key: BucketKey) -> AvailabilityBucket:
+        free, locked = self._counts.get(key, (0, 0))
+        return AvailabilityBucket(*key, free=max(free, 0), locked=max(locked, 0))
+
+    def snapshot(
+        self, project_id: UUID | None = None, env: str | None = None, domain: str | None = None
+    ) -> list[AvailabilityBucket]:
+        """Счетчики по фильтру (None - любое значение), без обращения к БД."""
+        env, domain = _value(env), _value(domain)
+        return [
+            self.get(key)
+            for key in self._counts
+            if (project_id is None or key[0] == project_id)
+            and (env is None or key[1] == env)
+            and (domain is None or key[2] == domain)
+        ]
+
+    def start(self) -> None:
+        """Запустить фоновую сверку (первая - сразу) и рассылку изменений."""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run())]
+            if self._notifier is not None:
+                self._tasks.append(asyncio.create_task(self._run_publish()))
+
+    async def stop(self) -> None:
+        """Остановить фоновые задачи и разослать накопленные изменения."""
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self._tasks:
+            try:
+                await self.publish()
+            except Exception:
+                logger.exception("Availability publish failed")
+        self._tasks = []
+
+    async def publish(self) -> None:
+        """Разослать накопленные свои изменения другим воркерам."""
+        if not self._outbox or self._notifier is None:
+            return
+        deltas, self._outbox = self._outbox, {}
+        await self._notifier.publish_deltas(deltas)
+
+    async def reconcile(self) -> None:
+        """Заменить счетчики результатом GROUP BY по таблице.
+
+        Изменение, закоммиченное во время запроса, может попасть и в результат,
+        и в отложенные изменения; такое расхождение исправит следующая сверка.
+        """
+        self._pending = []
+        try:
+            rows = await self._user_repo.count_by_bucket()
+        except BaseException:
+            self._pending = None
+            raise
+
+        counts = {bucket_key(row): [row["free"], row["locked"]] for row in rows}
+        pending, self._pending = self._pending, None
+        for key, free, locked in pending:
+            counter = counts.setdefault(key, [0, 0])
+            counter[0] += free
+            counter[1] += locked
+
+        drift = sum(
+            abs(counts.get(key, (0, 0))[i] - self._counts.get(key, (0, 0))[i])
+            for key in counts.keys() | self._counts.keys()
+            for i in (0, 1)
+        )
+        changed = [key for key in counts.keys() | self._counts.keys() if counts.get(key) != self._counts.get(key)]
+        if drift and self.reconciled_at is not None:
+            AVAILABILITY_DRIFT.inc(drift)
+        self._counts = counts
+        self.reconciled_at = time.time()
+        for key in changed:
+            self._changed(key)
+
+    def _apply(self, key: BucketKey, free: int, locked: int, local: bool = False) -> None:
+        counter = self._counts.setdefault(key, [0, 0])
+        counter[0] += free
+        counter[1] += locked
+        if self._pending is not None:
+            self._pending.append((key, free, locked))
+        if local and self._notifier is not None:
+            sent_free, sent_locked = self._outbox.get(key, (0, 0))
+            self._outbox[key] = (sent_free + free, sent_locked + locked)
+        self._changed(key)
+
+    def _changed(self, key: BucketKey) -> None:
+        for callback in self._listeners:
+            try:
+                callback(key)
+            except Exception:
+                logger.exception("Availability listener failed")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.reconcile()
+            except Exception:
+                logger.exception("Availability reconcile failed")
+            await asyncio.sleep(self._reconcile_interval)
+
+    async def _run_publish(self) -> None:
+        while True:
+            await asyncio.sleep(self._publish_interval)
+            try:
+                await self.publish()
+            except Exception:
+                logger.exception("Availability publish failed")
@@ -0,0 +1,151 @@
+"""Рассылка изменений доступности подписчикам потока."""
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator
+from uuid import UUID
+
+from app.application.models import AvailabilityBucket
+from app.application.services.availability import AvailabilityTracker, BucketKey
+from app.infrastructure.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+STREAM_SUBSCRIBERS = registry.gauge("user_availability_stream_subscribers", "Подписчики потока доступности")
+STREAM_DROPPED = registry.counter(
+    "user_availability_stream_dropped_total",
+    "События потока доступности, вытесненные из очереди медленного подписчика",
+)
+
+
+class AvailabilitySubscription:
+    """Очередь событий одного подписчика.
+
+    Очередь ограничена: при переполнении вытесняется самое старое событие,
+    а подписчик помечается отставшим и следующим получает полный снимок
+    своих фильтров вместо пропущенных изменений.
+    """
+
+    def __init__(self, project_ids: set[UUID], queue_size: int) -> None:
+        # Пустое множество - все проекты
+        self.project_ids = project_ids
+        self.queue: deque[list[AvailabilityBucket]] = deque()
+        self.queue_size = queue_size
+        self.lagged = False
+        self.ready = asyncio.Event()
+
+    def matches(self, key: BucketKey) -> bool:
+        return not self.project_ids or key[0] in self.project_ids
+
+    def put(self, buckets: list[AvailabilityBucket]) -> None:
+        if len(self.queue) >= self.queue_size:
+            self.queue.popleft()
+            self.lagged = True
+            STREAM_DROPPED.inc()
+        self.queue.append(buckets)
+        self.ready.set()
+
+
+class AvailabilityFeed:
+    """Раздает подписчикам изменившиеся счетчики доступности не чаще раза в interval.
+
+    Изменения фильтров между рассылками схлопываются: подписчик получает
+    последние значения счетчиков, а не каждое событие аренды. Рассылка только
+    кладет события в очереди подписчиков и никогда не ждет их чтения, поэтому
+    медленный клиент не тормозит аренду.
+    """
+
+    def __init__(
+        self,
+        tracker: AvailabilityTracker,
+        interval: float,
+        queue_size: int,
+        max_subscribers: int,
+        keepalive: float,
+    ) -> None:
+        self._tracker = tracker
+        self._interval = interval
+        self._keepalive = keepalive
+        self._queue_size = queue_size
+        self._max_subscribers = max_subscribers
+        self._subscriptions: set[AvailabilitySubscription] = set()
+        self._dirty: set[BucketKey] = set()
+        self._task: asyncio.Task | None = None
+        tracker.add_listener(self._on_changed)
+        STREAM_SUBSCRIBERS.set_function(lambda: len(self._subscriptions))
+
+    def subscribe(self, project_ids: list[UUID] | None = None) -> AvailabilitySubscription | None:
+        """Подписаться на изменения по проектам; None, если лимит подписчиков исчерпан."""
+        if len(self._subscriptions) >= self._max_subscribers:
+            return None
+        subscription = AvailabilitySubscription(set(project_ids or ()), self._queue_size)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: AvailabilitySubscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    async def events(self, subscription: AvailabilitySubscription) -> AsyncIterator[list[AvailabilityBucket]]:
+        """События подписчика: сначала полный снимок, затем изменения.
+
+        Пустой список означает, что за keepalive секунд изменений не было.
+        """
+        yield self._snapshot(subscription)
+        while True:
+            if not subscription.queue:
+                subscription.ready.clear()
+                try:
+                    await asyncio.wait_for(subscription.ready.wait(), self._keepalive)
+                except asyncio.TimeoutError:
+                    yield []
+                    continue
+            if subscription.lagged:
+                subscription.queue.clear()
+                subscription.lagged = False
+                yield self._snapshot(subscription)
+            else:
+                yield subscription.queue.popleft()
+
+    def start(self) -> None:
+        """Запустить фоновую рассылку."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить фоновую рассылку."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def flush(self) -> None:
+        """Разослать изменившиеся с прошлой рассылки счетчики."""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        buckets = {key: self._tracker.get(key) for key in dirty}
+        for subscription in self._subscriptions:
+            changed = [bucket for key, bucket in buckets.items() if subscription.matches(key)]
+            if changed:
+                subscription.put(changed)
+
+    def _snapshot(self, subscription: AvailabilitySubscription) -> list[AvailabilityBucket]:
+        if not subscription.project_ids:
+            return self._tracker.snapshot()
+        return [bucket for project_id in subscription.project_ids for bucket in self._tracker.snapshot(project_id)]
+
+    def _on_changed(self, key: BucketKey) -> None:
+        if self._subscriptions:
+            self._dirty.add(key)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Availability feed flush failed")
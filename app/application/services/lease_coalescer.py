@@ -0,0 +1,136 @@
+"""Объединение одновременных запросов аренды в один запрос к БД (group commit)."""
+import asyncio
+import logging
+from typing import Any, Hashable
+from uuid import UUID
+
+from app.infrastructure.db.repository.user import UserNotFoundError, UserRepository
+from app.infrastructure.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+COALESCED_BATCH_SIZE = registry.histogram(
+    "user_lease_coalesced_batch_size",
+    "Число запросов аренды, выполненных одним запросом к БД",
+    ("operation",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+_ACQUIRE = "acquire"
+_LEASE = "lease"
+
+
+class _Batch:
+    """Запросы с одинаковым ключом, накопленные за окно."""
+
+    __slots__ = ("items", "waiters", "timer")
+
+    def __init__(self):
+        self.items: list[Any] = []
+        self.waiters: list[asyncio.Future] = []
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class LeaseCoalescer:
+    """Собирает одновременные запросы аренды за окно window и выполняет их одним UPDATE.
+
+    Запросы группируются по ключу: для аренды по фильтру - (project_id, env, domain, ttl),
+    для блокировки по id - ttl. Пачка уходит в БД по истечении окна или при наборе
+    max_batch запросов, результаты раздаются ожидающим в порядке поступления.
+    Методы повторяют контракт соответствующих методов UserRepository.
+    """
+
+    def __init__(self, user_repo: UserRepository, window: float, max_batch: int) -> None:
+        self._user_repo = user_repo
+        self._window = window
+        self._max_batch = max_batch
+        self._pending: dict[Hashable, _Batch] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._batch_sizes = {
+            _ACQUIRE: COALESCED_BATCH_SIZE.labels(_ACQUIRE),
+            _LEASE: COALESCED_BATCH_SIZE.labels(_LEASE),
+        }
+
+    async def acquire_lock(self, user_id: UUID, ttl: int | None = None) -> tuple[dict, bool]:
+        """Заблокировать пользователя по id; UserNotFoundError, если его нет."""
+        result = await self._submit((_ACQUIRE, ttl), user_id)
+        if result is None:
+            raise UserNotFoundError()
+        return result
+
+    async def lease_user(
+        self,
+        project_id: UUID | None = None,
+        env: str | None = None,
+        domain: str | None = None,
+        ttl: int | None = None,
+    ) -> dict | None:
+        """Заблокировать любого свободного пользователя по фильтру; None, если свободных нет."""
+        return await self._submit((_LEASE, project_id, env, domain, ttl), None)
+
+    async def _submit(self, key: tuple, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _Batch()
+            batch.timer = loop.call_later(self._window, self._flush, key, batch)
+
+        waiter = loop.create_future()
+        batch.items.append(item)
+        batch.waiters.append(waiter)
+        if len(batch.waiters) >= self._max_batch:
+            batch.timer.cancel()
+            self._flush(key, batch)
+        return await waiter
+
+    def _flush(self, key: tuple, batch: _Batch) -> None:
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+        task = asyncio.create_task(self._execute(key, batch))
+        # Держим ссылку на задачу, пока она не завершится
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, key: tuple, batch: _Batch) -> None:
+        operation = key[0]
+        self._batch_sizes[operation].observe(len(batch.waiters))
+        try:
+            if operation == _ACQUIRE:
+                results = await self._acquire_batch(batch.items, ttl=key[1])
+            else:
+                _, project_id, env, domain, ttl = key
+                rows = await self._user_repo.lease_users(
+                    len(batch.waiters), project_id=project_id, env=env, domain=domain, ttl=ttl
+                )
+                results = rows + [None] * (len(batch.waiters) - len(rows))
+        except Exception as e:
+            for waiter in batch.waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+
+        # Блокировки, взятые для уже отмененных запросов, сразу возвращаем
+        orphaned = []
+        for waiter, result in zip(batch.waiters, results):
+            if not waiter.done():
+                waiter.set_result(result)
+            elif result is not None and (operation == _LEASE or not result[1]):
+                orphaned.append(result["id"] if operation == _LEASE else result[0]["id"])
+        if orphaned:
+            try:
+                await self._user_repo.release_users(orphaned)
+            except Exception:
+                logger.exception("Failed to release leases of cancelled requests")
+
+    async def _acquire_batch(self, user_ids: list[UUID], ttl: int | None) -> list[tuple[dict, bool] | None]:
+        """Результаты блокировки по id в порядке запросов; повторный id получает already_locked."""
+        results, _ = await self._user_repo.acquire_locks(list(dict.fromkeys(user_ids)), ttl=ttl)
+        by_id = {user["id"]: (user, already_locked) for user, already_locked in results}
+
+        ordered = []
+        for user_id in user_ids:
+            result = by_id.get(user_id)
+            ordered.append(result)
+            if result is not None:
+                by_id[user_id] = (result[0], True)
+        return ordered
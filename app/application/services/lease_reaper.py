@@ -0,0 +1,57 @@
+"""Фоновая задача, возвращающая в пул пользователей с истекшей арендой."""
+import asyncio
+import logging
+
+from app.infrastructure.db.repository.user import UserRepository
+from app.infrastructure.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LEASES_EXPIRED = registry.counter("user_leases_expired_total", "Количество аренд, снятых по истечении TTL")
+
+
+class LeaseReaper:
+    """Периодически снимает блокировку с пользователей, чья аренда истекла."""
+
+    def __init__(self, user_repo: UserRepository, interval: float, batch_size: int) -> None:
+        self._user_repo = user_repo
+        self._interval = interval
+        self._batch_size = batch_size
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Запустить фоновую задачу."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить фоновую задачу."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def reap(self) -> int:
+        """Освободить все истекшие аренды пачками по batch_size. Возвращает число освобожденных."""
+        total = 0
+        while True:
+            reclaimed = await self._user_repo.reclaim_expired(self._batch_size)
+            total += len(reclaimed)
+            LEASES_EXPIRED.inc(len(reclaimed))
+            # Неполная пачка - истекших аренд больше нет
+            if len(reclaimed) < self._batch_size:
+                return total
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                reclaimed = await self.reap()
+                if reclaimed:
+                    logger.info("Reclaimed %s expired leases", reclaimed)
+            except Exception:
+                logger.exception("Lease reaper iteration failed")
@@ -0,0 +1,95 @@
+"""Очередь запросов аренды, ожидающих освобождения пользователя."""
+import asyncio
+import itertools
+from collections import deque
+from uuid import UUID
+
+from app.infrastructure.db.notifications import ReleaseKey
+from app.infrastructure.metrics import registry
+
+LEASE_WAITERS = registry.gauge("user_lease_waiters", "Запросы аренды, ожидающие освобождения пользователя")
+LEASE_WAKEUPS = registry.counter("user_lease_waiter_wakeups_total", "Пробуждения ожидающих запросов аренды")
+
+# Ключ фильтра ожидания; None - любое значение
+WaitKey = tuple[UUID | None, str | None, str | None]
+
+
+def wait_key(project_id: UUID | None, env=None, domain=None) -> WaitKey:
+    return project_id, getattr(env, "value", env), getattr(domain, "value", domain)
+
+
+class LeaseWaiters:
+    """FIFO-очереди ожидания по фильтру аренды.
+
+    Событие освобождения пользователя с ключом (project_id, env, domain) будит
+    не больше count ожидающих среди всех подходящих фильтров (с учетом None
+    как «любое значение»), начиная с самого раннего. Проснувшийся запрос сам
+    повторяет аренду в БД: пользователя может успеть забрать другой клиент.
+    """
+
+    def __init__(self, max_waiters: int) -> None:
+        self._max_waiters = max_waiters
+        self._queues: dict[WaitKey, deque[tuple[int, asyncio.Future]]] = {}
+        self._sequence = itertools.count()
+        self._size = 0
+        LEASE_WAITERS.set_function(lambda: self._size)
+
+    def register(self, key: WaitKey) -> tuple[int, asyncio.Future] | None:
+        """Встать в очередь фильтра; None, если лимит ожидающих исчерпан."""
+        if self._size >= self._max_waiters:
+            return None
+        entry = (next(self._sequence), asyncio.get_running_loop().create_future())
+        self._queues.setdefault(key, deque()).append(entry)
+        self._size += 1
+        return entry
+
+    def requeue(self, key: WaitKey, entry: tuple[int, asyncio.Future]) -> tuple[int, asyncio.Future]:
+        """Вернуться в очередь после неудачной попытки, сохранив место (порядковый номер)."""
+        sequence, _ = entry
+        entry = (sequence, asyncio.get_running_loop().create_future())
+        queue = self._queues.setdefault(key, deque())
+        # Ранние номера ближе к началу очереди
+        position = next((i for i, (other, _) in enumerate(queue) if other > sequence), len(queue))
+        queue.insert(position, entry)
+        self._size += 1
+        return entry
+
+    def discard(self, key: WaitKey, entry: tuple[int, asyncio.Future]) -> None:
+        """Убрать запись из очереди (аренда получена или ожидание прекращено)."""
+        queue = self._queues.get(key)
+        if queue is None:
+            return
+        try:
+            queue.remove(entry)
+        except ValueError:
+            return
+        self._size -= 1
+        if not queue:
+            del self._queues[key]
+
+    def on_released(self, released: dict[ReleaseKey, int]) -> None:
+        """Разбудить ожидающих под освобожденных пользователей."""
+        for (project_id, env, domain), count in released.items():
+            keys = {
+                (p, e, d)
+                for p in (project_id, None)
+                for e in (env, None)
+                for d in (domain, None)
+            }
+            queues = [self._queues[key] for key in keys if key in self._queues]
+            for _ in range(count):
+                if not self._wake_oldest(queues):
+                    break
+            for key in keys:
+                if key in self._queues and not self._queues[key]:
+                    del self._queues[key]
+
+    def _wake_oldest(self, queues: list[deque]) -> bool:
+        oldest = min((queue for queue in queues if queue), key=lambda queue: queue[0][0], default=None)
+        if oldest is None:
+            return False
+        _, future = oldest.popleft()
+        self._size -= 1
+        future.set_result(True)
+        LEASE_WAKEUPS.inc()
+        return True
@@ -0,0 +1,206 @@
+"""Резервы свободных пользователей в памяти воркера (hi/lo)."""
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections import deque
+from uuid import UUID, uuid4
+
+from app.application.services.availability import AvailabilityTracker
+from app.infrastructure.db.repository.user import UserRepository
+from app.infrastructure.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+RESERVATION_LEASES = registry.counter(
+    "user_reservation_leases_total", "Аренды по фильтрам с резервом: из памяти (hit) или из БД (miss)", ("result",)
+)
+RESERVED_USERS = registry.gauge("user_reservation_reserved", "Пользователи в резерве воркера")
+
+_FilterKey = tuple[UUID | None, str | None, str | None]
+
+
+class ReservationPool:
+    """Резервирует блоки свободных пользователей за воркером и раздает их из памяти.
+
+    Блок резервируется одним UPDATE: строки блокируются и помечаются reserved_by,
+    поэтому другие воркеры их не получат. Выдача из резерва не ходит в БД - аренда
+    записывается фоновой задачей пачкой раз в flush_interval. Когда резерв фильтра
+    опускается до low_water, фоновая задача дозаполняет его до block_size.
+
+    Резерв живет reservation_ttl секунд: после падения воркера строки освободит
+    LeaseReaper. Записи старше половины TTL воркер не выдает, а возвращает в БД.
+
+    Пока аренда не записана, строка остается в резерве и release_lock/release_users
+    ее не освобождают. Освобождение такой аренды откладывается через defer_release
+    и применяется сразу после ее записи.
+    """
+
+    def __init__(
+        self,
+        user_repo: UserRepository,
+        block_size: int,
+        low_water: int,
+        reservation_ttl: int,
+        flush_interval: float,
+        project_ids: list[UUID] | None = None,
+        availability: AvailabilityTracker | None = None,
+    ) -> None:
+        self._user_repo = user_repo
+        self._block_size = block_size
+        self._low_water = low_water
+        self._reservation_ttl = reservation_ttl
+        self._max_age = reservation_ttl / 2
+        self._flush_interval = flush_interval
+        # Пустой список - резервы для любых фильтров
+        self._project_ids = set(project_ids or ())
+        # Зарезервированные строки заблокированы в БД - счетчики доступности должны это видеть
+        self._availability = availability
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+        self._reserves: dict[_FilterKey, deque[tuple[dict, float]]] = {}
+        self._refill_needed: set[_FilterKey] = set()
+        self._handed_out: dict[UUID, dict] = {}
+        self._released: set[UUID] = set()
+        self._stale: list[UUID] = []
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._hits = RESERVATION_LEASES.labels("hit")
+        self._misses = RESERVATION_LEASES.labels("miss")
+        RESERVED_USERS.set_function(lambda: sum(len(reserve) for reserve in self._reserves.values()))
+
+    def handles(self, project_id: UUID | None) -> bool:
+        """Обслуживаются ли аренды проекта из резерва."""
+        return not self._project_ids or project_id in self._project_ids
+
+    def take(
+        self,
+        project_id: UUID | None = None,
+        env: str | None = None,
+        domain: str | None = None,
+        ttl: int | None = None,
+    ) -> dict | None:
+        """Выдать пользователя из резерва без обращения к БД; None, если резерв пуст."""
+        key = (project_id, env, domain)
+        reserve = self._reserves.get(key)
+        if reserve is None:
+            reserve = self._reserves[key] = deque()
+
+        user = None
+        oldest_allowed = time.monotonic() - self._max_age
+        while reserve:
+            candidate, reserved_at = reserve.popleft()
+            if reserved_at >= oldest_allowed:
+                user = candidate
+                break
+            self._stale.append(candidate["id"])
+
+        if len(reserve) <= self._low_water:
+            self._refill_needed.add(key)
+            self._wakeup.set()
+
+        if user is None:
+            self._misses.inc()
+            return None
+
+        self._hits.inc()
+        # Токен аренды записан в строку при резервировании и у каждой строки свой,
+        # поэтому клиент может продлевать аренду еще до ее подтверждения в БД
+        now = int(time.time())
+        leased = {**user, "locktime": now, "lease_expires_at": now + ttl if ttl else None}
+        self._handed_out[leased["id"]] = leased
+        return leased
+
+    def defer_release(self, user_id: UUID) -> tuple[dict, bool] | None:
+        """Отложить освобождение аренды, выданной из резерва и еще не записанной в БД.
+
+        Возвращает (пользователь, already_unlocked) как release_lock репозитория
+        или None, если аренду выдавал не этот резерв либо она уже записана.
+        """
+        lease = self._handed_out.get(user_id)
+        if lease is None:
+            return None
+        already_released = user_id in self._released
+        self._released.add(user_id)
+        self._wakeup.set()
+        return {**lease, "locktime": 0, "lease_expires_at": None}, already_released
+
+    def start(self) -> None:
+        """Запустить фоновую задачу подтверждения и дозаполнения резервов."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить фоновую задачу, записать выданные аренды и вернуть неиспользованный резерв."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self._confirm()
+        released = await self._user_repo.release_reserved(self.worker_id)
+        self._reserves.clear()
+        self._refill_needed.clear()
+        self._stale.clear()
+        if released:
+            logger.info(f"Returned {released} reserved users")
+
+    async def maintain(self) -> None:
+        """Записать выданные аренды, вернуть устаревший резерв и дозаполнить резервы."""
+        await self._confirm()
+        self._collect_stale()
+        if self._stale:
+            stale, self._stale = self._stale, []
+            await self._user_repo.release_reserved(self.worker_id, stale)
+
+        while self._refill_needed:
+            key = self._refill_needed.pop()
+            reserve = self._reserves.setdefault(key, deque())
+            missing = self._block_size - len(reserve)
+            if missing <= 0:
+                continue
+            project_id, env, domain = key
+            users = await self._user_repo.reserve_users(
+                missing, self.worker_id, project_id=project_id, env=env, domain=domain, ttl=self._reservation_ttl
+            )
+            if self._availability is not None:
+                self._availability.on_locked(users)
+            reserved_at = time.monotonic()
+            reserve.extend((user, reserved_at) for user in users)
+
+    async def _confirm(self) -> None:
+        if self._handed_out:
+            # Аренды остаются выданными до успешной записи: освобождение, пришедшее
+            # во время записи, тоже должно быть отложено. При ошибке повторим позже
+            leases = list(self._handed_out.values())
+            await self._user_repo.confirm_reserved(self.worker_id, leases)
+            for lease in leases:
+                del self._handed_out[lease["id"]]
+
+        ready = [user_id for user_id in self._released if user_id not in self._handed_out]
+        if ready:
+            await self._user_repo.release_users(ready)
+            self._released.difference_update(ready)
+
+    def _collect_stale(self) -> None:
+        """Снять с начала очередей записи старше допустимого возраста (очереди упорядочены по времени)."""
+        oldest_allowed = time.monotonic() - self._max_age
+        for reserve in self._reserves.values():
+            while reserve and reserve[0][1] < oldest_allowed:
+                self._stale.append(reserve.popleft()[0]["id"])
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.maintain()
+            except Exception:
+                logger.exception("Reservation pool maintenance failed")
@@ -1,46 +1,416 @@
+import asyncio
+import base64
+import binascii
+import time
 from datetime import datetime
+from typing import Any, AsyncIterable, AsyncIterator
 from uuid import UUID
 
 from fastapi import HTTPException, status
+from pydantic import TypeAdapter, ValidationError
 
-from app.application.models import LockOperationResult, UnlockOperationResult, UserCreate, UserRead
+from app.application.models import (
+    Availability,
+    AvailabilityBucket,
+    BatchRenewOperationResult,
+    BatchUnlockOperationResult,
+    BulkCreateFailure,
+    BulkCreateResult,
+    Domain,
+    Env,
+    LeaseRenewal,
+    LockOperationResult,
+    UnlockOperationResult,
+    UserCreate,
+    UserFilter,
+    UserListFilter,
+    UserLease,
+    UserPage,
+    UserRead,
+)
+from app.application.services.availability import AvailabilityTracker
+from app.application.services.availability_feed import AvailabilityFeed
+from app.application.services.lease_coalescer import LeaseCoalescer
+from app.application.services.lease_waiters import LeaseWaiters, wait_key
+from app.application.services.reservation import ReservationPool
 from app.infrastructure.db.repository.user import UserNotFoundError, UserRepository
+from app.infrastructure.metrics import registry
+
+_user_create_list = TypeAdapter(list[UserCreate])
+
+LEASES_ACQUIRED = registry.counter("user_leases_acquired_total", "Количество выданных аренд пользователей")
+LEASES_RELEASED = registry.counter("user_leases_released_total", "Количество освобожденных аренд пользователей")
+LEASES_ALREADY_LOCKED = registry.counter(
+    "user_leases_already_locked_total", "Попытки заблокировать уже заблокированного пользователя"
+)
+LEASES_EXHAUSTED = registry.counter(
+    "user_leases_exhausted_total", "Запросы аренды, для которых не нашлось свободных пользователей"
+)
+READS_COALESCED = registry.counter(
+    "user_reads_coalesced_total", "Чтения списка пользователей, получившие результат уже выполняемого запроса"
+)
 
 
 class UserService:
     """Бизнес логика для операций с пользователями."""
 
-    def __init__(self, user_repo: UserRepository) -> None:
+    def __init__(
+        self,
+        user_repo: UserRepository,
+        lease_ttl: int | None = None,
+        lease_coalescer: LeaseCoalescer | None = None,
+        reservation_pool: ReservationPool | None = None,
+        lease_waiters: LeaseWaiters | None = None,
+        etag_max_age: float = 0.0,
+        availability: AvailabilityTracker | None = None,
+        availability_feed: AvailabilityFeed | None = None,
+    ) -> None:
         self._user_repo = user_repo
+        # TTL аренды по умолчанию, если клиент не передал свой
+        self._lease_ttl = lease_ttl
+        # Одиночные блокировки идут через коалесцер, если он включен
+        self._leases = lease_coalescer or user_repo
+        # Резерв воркера для аренды по фильтру без обращения к БД
+        self._reservations = reservation_pool
+        # Очередь запросов, ждущих освобождения пользователя
+        self._waiters = lease_waiters
+        # Как долго ETag чтений может не меняться, 0 - пока не изменится версия данных
+        self._etag_max_age = etag_max_age
+        # Выполняемые запросы списка по нормализованным параметрам (single-flight)
+        self._list_inflight: dict[tuple, asyncio.Task] = {}
+        # Счетчики свободных пользователей; создания и блокировки сервис сообщает сам
+        self._availability = availability
+        # Поток изменений доступности для подписчиков
+        self._availability_feed = availability_feed
 
     async def create_user(self, user: UserCreate) -> UserRead:
-        user_data = user.model_dump()
-        # Автоматически устанавливаем locktime и created_at в сервисе
-        user_data["locktime"] = 0
-        user_data["created_at"] = datetime.now()
-        created = await self._user_repo.create_user(user_data)
+        created = await self._user_repo.create_user(self._fill_defaults(user))
+        if self._availability is not None:
+            self._availability.on_created([created])
         return self._user_to_read(created)
 
-    async def get_users(self) -> list[UserRead]:
-        users = await self._user_repo.list_users()
-        return [self._user_to_read(u) for u in users]
+    async def bulk_create_users(self, chunks: AsyncIterable[list[Any]]) -> BulkCreateResult:
+        """Создать пользователей из потока пачек сырых строк.
+
+        Каждая пачка валидируется целиком и вставляется одним многострочным INSERT.
+        Индексы в ошибках - сквозные номера строк во всем потоке.
+        """
+        created: list[UUID] = []
+        failures: list[BulkCreateFailure] = []
+        seen_ids: set[UUID] = set()
+        offset = 0
+
+        async for chunk in chunks:
+            users, errors = self._validate_chunk(chunk)
+            failures.extend(BulkCreateFailure(index=offset + i, error=error) for i, error in errors.items())
 
-    async def acquire_lock(self, user_id: UUID) -> LockOperationResult:
+            # Повторы id внутри одного импорта
+            unique = []
+            for i, user in users:
+                if user.id in seen_ids:
+                    failures.append(BulkCreateFailure(index=offset + i, error="Duplicate id in request"))
+                else:
+                    seen_ids.add(user.id)
+                    unique.append((i, user))
+
+            if unique:
+                rows = [self._fill_defaults(u) for _, u in unique]
+                inserted = set(await self._user_repo.bulk_create_users(rows))
+                if self._availability is not None:
+                    self._availability.on_created([row for row in rows if row["id"] in inserted])
+                for i, user in unique:
+                    if user.id in inserted:
+                        created.append(user.id)
+                    else:
+                        failures.append(BulkCreateFailure(index=offset + i, error="User already exists"))
+
+            offset += len(chunk)
+
+        failures.sort(key=lambda failure: failure.index)
+        return BulkCreateResult(created=created, failures=failures)
+
+    def users_etag(self) -> str:
+        """ETag чтений пользователей без обращения к БД.
+
+        Строится из версии данных репозитория. Создания и блокировки в других воркерах
+        эта версия не видит, поэтому при заданном etag_max_age ETag дополнительно
+        меняется раз в etag_max_age секунд, ограничивая время устаревания.
+        """
+        etag = self._user_repo.version
+        if self._etag_max_age > 0:
+            etag = f"{etag}-{int(time.time() // self._etag_max_age)}"
+        return f'W/"{etag}"'
+
+    async def get_user(self, user_id: UUID) -> UserRead:
         try:
-            user, already_locked = await self._user_repo.acquire_lock(user_id)
+            user = await self._user_repo.get_user(user_id)
         except UserNotFoundError:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-        return LockOperationResult(user=self._user_to_read(user), already_locked=already_locked)
+        return self._user_to_read(user)
 
-    async def release_lock(self, user_id: UUID) -> UnlockOperationResult:
+    def get_availability(self, user_filter: UserFilter | None = None) -> Availability:
+        """Число свободных и заблокированных пользователей по фильтрам из счетчиков в памяти.
+
+        До первой сверки с БД счетчики неполны, поэтому отвечаем 503.
+        """
+        if self._availability is None or self._availability.reconciled_at is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Availability is not ready")
+        return Availability(
+            buckets=self._availability.snapshot(**self._filter_kwargs(user_filter or UserFilter())),
+            reconciled_at=self._availability.reconciled_at,
+        )
+
+    async def stream_availability(
+        self, project_ids: list[UUID] | None = None
+    ) -> AsyncIterator[list[AvailabilityBucket]]:
+        """Поток сводок доступности по проектам: полный снимок, затем изменившиеся фильтры.
+
+        Пустой список - изменений не было (повод отправить keep-alive).
+        """
+        if (
+            self._availability_feed is None
+            or self._availability is None
+            or self._availability.reconciled_at is None
+        ):
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Availability is not ready")
+        subscription = self._availability_feed.subscribe(project_ids)
+        if subscription is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many subscribers")
+        try:
+            async for buckets in self._availability_feed.events(subscription):
+                yield buckets
+        finally:
+            self._availability_feed.unsubscribe(subscription)
+
+    async def get_users(
+        self, user_filter: UserListFilter | None = None, cursor: str | None = None, limit: int = 100
+    ) -> UserPage:
+        user_filter = user_filter or UserListFilter()
+        # Запрашиваем на одну строку больше, чтобы понять, есть ли следующая страница
+        users = await self._list_users(
+            **self._filter_kwargs(user_filter),
+            locked=user_filter.locked,
+            after=self._decode_cursor(cursor) if cursor else None,
+            limit=limit + 1,
+        )
+        items = [self._user_to_read(u) for u in users[:limit]]
+        next_cursor = self._encode_cursor(items[-1]) if len(users) > limit else None
+        return UserPage(items=items, next_cursor=next_cursor)
+
+    async def _list_users(self, **params) -> list[dict]:
+        """Прочитать список через репозиторий, разделяя один запрос между одинаковыми одновременными чтениями.
+
+        Пока запрос с теми же параметрами выполняется, новые вызовы ждут его результат,
+        а не идут в БД. Результат не переиспользуется после завершения запроса,
+        поэтому данные не старше самого запроса. Отмена одного из ожидающих
+        не отменяет общий запрос.
+        """
+        key = tuple(sorted((name, getattr(value, "value", value)) for name, value in params.items()))
+        task = self._list_inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._user_repo.list_users(**params))
+            self._list_inflight[key] = task
+            task.add_done_callback(lambda _: self._list_inflight.pop(key, None))
+        else:
+            READS_COALESCED.inc()
+        return await asyncio.shield(task)
+
+    async def export_users(self, user_filter: UserListFilter | None = None) -> AsyncIterator[UserRead]:
+        user_filter = user_filter or UserListFilter()
+        async for user in self._user_repo.iter_users(**self._filter_kwargs(user_filter), locked=user_filter.locked):
+            yield self._user_to_read(user)
+
+    async def acquire_lock(self, user_id: UUID, ttl: int | None = None) -> LockOperationResult:
         try:
-            user, already_unlocked = await self._user_repo.release_lock(user_id)
+            user, already_locked = await self._leases.acquire_lock(user_id, ttl=self._ttl(ttl))
         except UserNotFoundError:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
+        (LEASES_ALREADY_LOCKED if already_locked else LEASES_ACQUIRED).inc()
+        if not already_locked and self._availability is not None:
+            self._availability.on_locked([user])
+        # Токен чужой аренды не отдаем
+        lease = self._user_to_lease({**user, "lease_token": None} if already_locked else user)
+        return LockOperationResult(user=lease, already_locked=already_locked)
+
+    async def lease_user(
+        self, user_filter: UserFilter, ttl: int | None = None, wait: float | None = None
+    ) -> UserLease:
+        """Заблокировать любого свободного пользователя по фильтру.
+
+        Если свободных нет и задан wait, запрос ждет освобождения подходящего
+        пользователя до wait секунд вместо немедленного отказа.
+        """
+        user = await self._try_lease(user_filter, ttl)
+        if user is None and wait and self._waiters is not None:
+            user = await self._wait_and_lease(user_filter, ttl, wait)
+        if user is None:
+            LEASES_EXHAUSTED.inc()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="No free users")
+
+        LEASES_ACQUIRED.inc()
+        return self._user_to_lease(user)
+
+    async def lease_users(
+        self, user_filter: UserFilter, count: int, ttl: int | None = None
+    ) -> list[LockOperationResult]:
+        users = await self._user_repo.lease_users(count, **self._filter_kwargs(user_filter), ttl=self._ttl(ttl))
+        if self._availability is not None:
+            self._availability.on_locked(users)
+        LEASES_ACQUIRED.inc(len(users))
+        if len(users) < count:
+            LEASES_EXHAUSTED.inc()
+        return [LockOperationResult(user=self._user_to_lease(u), already_locked=False) for u in users]
+
+    async def release_lock(self, user_id: UUID) -> UnlockOperationResult:
+        # Аренда из резерва, еще не записанная в БД, освобождается после записи
+        released = self._reservations.defer_release(user_id) if self._reservations is not None else None
+        if released is not None:
+            user, already_unlocked = released
+        else:
+            try:
+                user, already_unlocked = await self._user_repo.release_lock(user_id)
+            except UserNotFoundError:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+        if not already_unlocked:
+            LEASES_RELEASED.inc()
         return UnlockOperationResult(user=self._user_to_read(user), already_unlocked=already_unlocked)
 
+    async def release_users(self, user_ids: list[UUID]) -> BatchUnlockOperationResult:
+        results, remaining = [], []
+        for user_id in user_ids:
+            released = self._reservations.defer_release(user_id) if self._reservations is not None else None
+            if released is not None:
+                results.append(released)
+            else:
+                remaining.append(user_id)
+
+        not_found = []
+        if remaining:
+            released, not_found = await self._user_repo.release_users(remaining)
+            results.extend(released)
+        LEASES_RELEASED.inc(sum(1 for _, already_unlocked in results if not already_unlocked))
+        return BatchUnlockOperationResult(
+            results=[
+                UnlockOperationResult(user=self._user_to_read(u), already_unlocked=already_unlocked)
+                for u, already_unlocked in results
+            ],
+            not_found=not_found,
+        )
+
+    async def renew_leases(
+        self, leases: list[tuple[UUID, UUID]], ttl: int | None = None
+    ) -> BatchRenewOperationResult:
+        renewed = await self._user_repo.renew_leases(leases, ttl=self._ttl(ttl))
+        renewed_ids = {row["id"] for row in renewed}
+        return BatchRenewOperationResult(
+            renewed=[LeaseRenewal(user_id=row["id"], lease_expires_at=row["lease_expires_at"]) for row in renewed],
+            lost=[user_id for user_id, _ in leases if user_id not in renewed_ids],
+        )
+
+    async def _try_lease(self, user_filter: UserFilter, ttl: int | None) -> dict | None:
+        user = None
+        if self._reservations is not None and self._reservations.handles(user_filter.project_id):
+            user = self._reservations.take(**self._filter_kwargs(user_filter), ttl=self._ttl(ttl))
+        if user is None:
+            user = await self._leases.lease_user(**self._filter_kwargs(user_filter), ttl=self._ttl(ttl))
+            # Выдача из резерва счетчики не меняет: строка заблокирована в БД еще при резервировании
+            if user is not None and self._availability is not None:
+                self._availability.on_locked([user])
+        return user
+
+    async def _wait_and_lease(self, user_filter: UserFilter, ttl: int | None, wait: float) -> dict | None:
+        """Ждать в очереди фильтра и повторять аренду после каждого освобождения."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        key = wait_key(**self._filter_kwargs(user_filter))
+        entry = self._waiters.register(key)
+        if entry is None:
+            return None
+
+        try:
+            # Пользователь мог освободиться до постановки в очередь
+            user = await self._try_lease(user_filter, ttl)
+            while user is None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return None
+                try:
+                    await asyncio.wait_for(entry[1], remaining)
+                except asyncio.TimeoutError:
+                    # Пробуждение могло совпасть с таймаутом - тогда используем его
+                    if not entry[1].done() or entry[1].cancelled():
+                        return None
+                # Снова встаем в очередь до попытки, чтобы не пропустить следующее освобождение
+                entry = self._waiters.requeue(key, entry)
+                user = await self._try_lease(user_filter, ttl)
+            return user
+        finally:
+            self._waiters.discard(key, entry)
+
+    @staticmethod
+    def _fill_defaults(user: UserCreate) -> dict:
+        user_data = user.model_dump()
+        # Автоматически устанавливаем locktime и created_at в сервисе
+        user_data["locktime"] = 0
+        user_data["created_at"] = datetime.now()
+        return user_data
+
+    @staticmethod
+    def _validate_chunk(chunk: list[Any]) -> tuple[list[tuple[int, UserCreate]], dict[int, str]]:
+        """Провалидировать пачку одним вызовом TypeAdapter.
+
+        При ошибках невалидные строки откладываются, а остальные валидируются повторно.
+        """
+        try:
+            return list(enumerate(_user_create_list.validate_python(chunk))), {}
+        except ValidationError as e:
+            errors: dict[int, str] = {}
+            for error in e.errors():
+                index, *field = error["loc"]
+                errors.setdefault(index, f"{'.'.join(map(str, field)) or 'row'}: {error['msg']}")
+
+        valid_indexes = [i for i in range(len(chunk)) if i not in errors]
+        users = _user_create_list.validate_python([chunk[i] for i in valid_indexes])
+        return list(zip(valid_indexes, users)), errors
+
+    def _ttl(self, ttl: int | None) -> int | None:
+        return ttl if ttl is not None else self._lease_ttl
+
+    @staticmethod
+    def _filter_kwargs(user_filter: UserFilter) -> dict:
+        return {"project_id": user_filter.project_id, "env": user_filter.env, "domain": user_filter.domain}
+
+    @staticmethod
+    def _encode_cursor(user: UserRead) -> str:
+        raw = f"{user.created_at.isoformat()}|{user.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+        try:
+            created_at, user_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            return datetime.fromisoformat(created_at), UUID(user_id)
+        except (ValueError, binascii.Error):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
     @staticmethod
     def _user_to_read(data: dict) -> UserRead:
-        return UserRead.model_validate(data)
+        """Модель из строки репозитория без валидации.
+
+        Строки приходят из БД уже проверенными, а повторная проверка (особенно
+        EmailStr) была основной стоимостью чтения списков. Без валидации типы
+        должны совпадать с моделью, поэтому enum из ORM заменяются на enum модели.
+        """
+        return UserRead.model_construct(**UserService._model_values(data))
+
+    @staticmethod
+    def _user_to_lease(data: dict) -> UserLease:
+        """Модель аренды с токеном - только для ответа тому, кто аренду получил."""
+        return UserLease.model_construct(**UserService._model_values(data))
+
+    @staticmethod
+    def _model_values(data: dict) -> dict:
+        return {**data, "env": Env(data["env"]), "domain": Domain(data["domain"])}
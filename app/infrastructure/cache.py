@@ -0,0 +1,137 @@
+"""Кэш с инвалидацией по тегам.
+
+CacheBackend задает интерфейс хранилища, InMemoryCache - реализация внутри процесса
+(LRU с ограничением размера и TTL). Интерфейс асинхронный, чтобы рядом можно было
+добавить сетевой бэкенд (например, Redis) без изменений у вызывающего кода.
+
+Чтобы значение, прочитанное до инвалидации, не попало в кэш после нее, запись
+принимает since - версию кэша, снятую перед чтением из источника. Если какой-то
+из тегов записи инвалидирован позже этой версии, запись пропускается.
+"""
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Iterable
+
+from app.infrastructure.metrics import registry
+
+CACHE_REQUESTS = registry.counter("cache_requests_total", "Обращения к кэшу", ("cache", "result"))
+CACHE_EVICTIONS = registry.counter("cache_evictions_total", "Вытеснения из кэша", ("cache", "reason"))
+CACHE_INVALIDATIONS = registry.counter("cache_invalidated_entries_total", "Записи, удаленные инвалидацией", ("cache",))
+CACHE_ENTRIES = registry.gauge("cache_entries", "Записей в кэше", ("cache",))
+
+# Значение-маркер промаха (None - допустимое значение в кэше)
+MISSING = object()
+
+
+class CacheBackend(ABC):
+    """Хранилище кэша с тегами."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Any:
+        """Значение по ключу или MISSING."""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, tags: Iterable[str] = (), since: int | None = None) -> None:
+        """Сохранить значение; пропустить, если теги инвалидированы после версии since."""
+
+    @abstractmethod
+    async def version(self) -> int:
+        """Текущая версия кэша (растет при каждой инвалидации)."""
+
+    @abstractmethod
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        """Удалить все записи с любым из тегов."""
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Удалить все записи."""
+
+
+class InMemoryCache(CacheBackend):
+    """LRU-кэш процесса с TTL и ограничением числа записей."""
+
+    def __init__(self, name: str, max_entries: int, ttl: float) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl
+        # key -> (expires_at, value, tags); порядок - от давно использованных к недавним
+        self._entries: OrderedDict[str, tuple[float, Any, tuple[str, ...]]] = OrderedDict()
+        self._tag_keys: dict[str, set[str]] = {}
+        self._tag_versions: dict[str, int] = {}
+        self._version = 0
+        self._cleared_at = 0
+
+        self._hits = CACHE_REQUESTS.labels(name, "hit")
+        self._misses = CACHE_REQUESTS.labels(name, "miss")
+        self._evicted_size = CACHE_EVICTIONS.labels(name, "size")
+        self._evicted_ttl = CACHE_EVICTIONS.labels(name, "ttl")
+        self._invalidated = CACHE_INVALIDATIONS.labels(name)
+        CACHE_ENTRIES.labels(name).set_function(lambda: len(self._entries))
+
+    async def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses.inc()
+            return MISSING
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            self._evicted_ttl.inc()
+            self._misses.inc()
+            return MISSING
+        self._entries.move_to_end(key)
+        self._hits.inc()
+        return entry[1]
+
+    async def set(self, key: str, value: Any, tags: Iterable[str] = (), since: int | None = None) -> None:
+        tags = tuple(tags)
+        if since is not None and (
+            since < self._cleared_at or any(self._tag_versions.get(tag, 0) > since for tag in tags)
+        ):
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self._ttl, value, tags)
+        for tag in tags:
+            self._tag_keys.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self._max_entries:
+            self._remove(next(iter(self._entries)))
+            self._evicted_size.inc()
+
+    async def version(self) -> int:
+        return self._version
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        self._version += 1
+        if len(self._tag_versions) > 4 * self._max_entries:
+            # Версии тегов нужны только текущим чтениям: сбрасываем их целиком,
+            # а незавершенные чтения отсекаем по _cleared_at
+            self._tag_versions.clear()
+            self._cleared_at = self._version
+        for tag in tags:
+            self._tag_versions[tag] = self._version
+            for key in self._tag_keys.pop(tag, ()):
+                if key in self._entries:
+                    self._remove(key)
+                    self._invalidated.inc()
+
+    async def clear(self) -> None:
+        self._version += 1
+        # Значения, прочитанные до очистки, не должны попасть в кэш
+        self._cleared_at = self._version
+        self._invalidated.inc(len(self._entries))
+        self._entries.clear()
+        self._tag_keys.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[tag]
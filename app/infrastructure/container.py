@@ -1,6 +1,16 @@
 """Контейнер инфраструктурных компонентов."""
+from app.infrastructure.db.admission import (
+    CREATE_GROUP,
+    EXPORT_GROUP,
+    LEASE_GROUP,
+    LIST_GROUP,
+    ConcurrencyLimiter,
+)
 from app.infrastructure.db.database import AsyncDatabaseHelper
+from app.infrastructure.db.notifications import PostgresReleaseNotifier, ReleaseNotifier
 from app.config import Settings
+from app.infrastructure.cache import CacheBackend, InMemoryCache
+from app.infrastructure.db.repository.cached_user import CachedUserRepository
 from app.infrastructure.db.repository.user import UserRepository
 
 class InfrastructureContainer:
@@ -10,17 +20,85 @@ class InfrastructureContainer:
         self._settings = settings
         self._async_db_helper: AsyncDatabaseHelper | None = None
         self._user_repository: UserRepository | None = None
+        self._release_notifier: ReleaseNotifier | None = None
+        self._user_cache: CacheBackend | None = None
 
     @property
     def db_helper(self) -> AsyncDatabaseHelper:
         """Получить database helper."""
         if self._async_db_helper is None:
-            self._async_db_helper = AsyncDatabaseHelper(self._settings.database_url)
+            self._async_db_helper = AsyncDatabaseHelper(
+                self._settings.database_url,
+                pool_size=self._settings.db_pool_size,
+                max_overflow=self._settings.db_max_overflow,
+                pool_timeout=self._settings.db_pool_timeout_seconds,
+                pool_recycle=self._settings.db_pool_recycle_seconds,
+                pool_pre_ping=self._settings.db_pool_pre_ping,
+                limiters=self._build_limiters(),
+            )
         return self._async_db_helper
 
+    @property
+    def user_cache(self) -> CacheBackend:
+        """Получить кэш чтений пользователей."""
+        if self._user_cache is None:
+            self._user_cache = InMemoryCache(
+                "users",
+                max_entries=self._settings.user_cache_max_entries,
+                ttl=self._settings.user_cache_ttl_seconds,
+            )
+        return self._user_cache
+
+    @property
+    def release_notifier(self) -> ReleaseNotifier:
+        """Получить рассылку событий освобождения: через LISTEN/NOTIFY для Postgres, иначе внутри процесса."""
+        if self._release_notifier is None:
+            if self.db_helper.database_url.startswith("postgresql"):
+                self._release_notifier = PostgresReleaseNotifier(self.db_helper)
+            else:
+                self._release_notifier = ReleaseNotifier()
+        return self._release_notifier
+
+    def _build_limiters(self) -> dict[str, ConcurrencyLimiter]:
+        """Лимитеры допуска к БД для групп с ненулевым лимитом.
+
+        Сумма лимитов не может превышать пул соединений: иначе группы упираются в пул,
+        а не в свои лимиты, и сессиям без группы (фоновые задачи, readiness) не
+        остается соединений.
+        """
+        limits = {
+            LEASE_GROUP: self._settings.admission_lease_limit,
+            LIST_GROUP: self._settings.admission_list_limit,
+            CREATE_GROUP: self._settings.admission_create_limit,
+            EXPORT_GROUP: self._settings.admission_export_limit,
+        }
+        pool_capacity = self._settings.db_pool_size + self._settings.db_max_overflow
+        total = sum(limit for limit in limits.values() if limit > 0)
+        if total > pool_capacity:
+            raise ValueError(
+                f"Admission limits sum to {total}, more than the DB pool "
+                f"(db_pool_size + db_max_overflow = {pool_capacity})"
+            )
+        return {
+            group: ConcurrencyLimiter(
+                group,
+                limit=limit,
+                max_queue=self._settings.admission_queue_size,
+                queue_timeout=self._settings.admission_queue_timeout_seconds,
+                retry_after=self._settings.admission_retry_after_seconds,
+            )
+            for group, limit in limits.items()
+            if limit > 0
+        }
+
     @property
     def user_repository(self) -> UserRepository:
         """Получить user repository."""
         if self._user_repository is None:
-            self._user_repository = UserRepository(self.db_helper)
+            if self._settings.user_cache_enabled:
+                self._user_repository = CachedUserRepository(
+                    self.db_helper, cache=self.user_cache, release_notifier=self.release_notifier
+                )
+            else:
+                self._user_repository = UserRepository(self.db_helper, release_notifier=self.release_notifier)
         return self._user_repository
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""Ограничение числа одновременных обращений к БД (admission control).
+
+Запросы группы сверх лимита ждут в очереди ограниченной длины не дольше queue_timeout,
+а при переполненной очереди или истекшем ожидании сразу получают отказ. Так всплеск
+нагрузки не превращается в очередь из запросов, висящих по pool_timeout в пуле.
+"""
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from app.infrastructure.metrics import registry
+
+# Группы запросов, лимитируемые раздельно
+LEASE_GROUP = "lease"
+LIST_GROUP = "list"
+CREATE_GROUP = "create"
+# Выгрузка держит слот, пока клиент читает поток: отдельная группа, чтобы медленные
+# клиенты выгрузки не занимали слоты чтения списков
+EXPORT_GROUP = "export"
+
+ADMISSION_IN_FLIGHT = registry.gauge("db_admission_in_flight", "Запросы, допущенные к БД", ("group",))
+ADMISSION_QUEUED = registry.gauge("db_admission_queued", "Запросы, ожидающие допуска к БД", ("group",))
+ADMISSION_REJECTED = registry.counter(
+    "db_admission_rejected_total", "Запросы, отклоненные контролем допуска", ("group", "reason")
+)
+
+
+class AdmissionRejectedError(Exception):
+    """Запрос не допущен к БД: лимит группы исчерпан."""
+
+    def __init__(self, group: str, reason: str, retry_after: int):
+        super().__init__(f"Admission rejected for group {group}: {reason}")
+        self.group = group
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """Лимит одновременных сессий одной группы запросов с ограниченной FIFO-очередью.
+
+    Освободившийся слот передается первому ожидающему напрямую, поэтому новые запросы
+    не обгоняют очередь.
+    """
+
+    def __init__(self, group: str, limit: int, max_queue: int, queue_timeout: float, retry_after: int):
+        self.group = group
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        ADMISSION_IN_FLIGHT.labels(group).set_function(lambda: self._active)
+        ADMISSION_QUEUED.labels(group).set_function(lambda: len(self._waiters))
+        self._rejected_full = ADMISSION_REJECTED.labels(group, "queue_full")
+        self._rejected_timeout = ADMISSION_REJECTED.labels(group, "timeout")
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        """Занять слот на время блока или выбросить AdmissionRejectedError."""
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self) -> None:
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self._rejected_full.inc()
+            raise AdmissionRejectedError(self.group, "queue full", self.retry_after)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Слот передан в том же шаге цикла, что и истек таймаут
+                return
+            self._discard(waiter)
+            self._rejected_timeout.inc()
+            raise AdmissionRejectedError(self.group, "queue timeout", self.retry_after)
+        except asyncio.CancelledError:
+            # Слот мог быть передан прямо перед отменой - возвращаем его следующему
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                self._discard(waiter)
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Слот переходит ожидающему, счетчик активных не меняется
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
@@ -1,16 +1,37 @@
 """Асинхронный хелпер для работы с БД и управлением сессиями."""
-from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import AsyncContextManager, AsyncGenerator
 
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
 
+from app.infrastructure.db.admission import ConcurrencyLimiter
+from app.infrastructure.db.pool import POOL_CHECKOUT_WAIT, PoolMonitor
+
 
 class AsyncDatabaseHelper:
     """Асинхронный хелпер для работы с БД и управлением сессиями."""
 
-    def __init__(self, database_url: str):
+    def __init__(
+        self,
+        database_url: str,
+        pool_size: int = 10,
+        max_overflow: int = 20,
+        pool_timeout: float = 30,
+        pool_recycle: int = 3600,
+        pool_pre_ping: bool = True,
+        limiters: dict[str, ConcurrencyLimiter] | None = None,
+    ):
         self.database_url = database_url.replace("postgresql://", "postgresql+asyncpg://")
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.pool_pre_ping = pool_pre_ping
+        self.pool_monitor = PoolMonitor(pool_size, max_overflow, pool_timeout)
+        # Лимиты одновременных сессий по группам запросов
+        self.limiters = limiters or {}
 
         self.engine = None
         self.async_session_factory = None
@@ -24,12 +45,13 @@ class AsyncDatabaseHelper:
         self.engine = create_async_engine(
             self.database_url,
             echo=False,
-            pool_size=10,
-            max_overflow=20,
-            pool_pre_ping=True,
-            pool_recycle=3600,
-            pool_timeout=30
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_pre_ping=self.pool_pre_ping,
+            pool_recycle=self.pool_recycle,
+            pool_timeout=self.pool_timeout,
         )
+        self.pool_monitor.attach(self.engine)
         self.async_session_factory = async_sessionmaker(
             self.engine,
             expire_on_commit=False,
@@ -37,9 +59,13 @@ class AsyncDatabaseHelper:
         )
 
     @asynccontextmanager
-    async def session_only(self) -> AsyncGenerator[AsyncSession, None]:
-        """Контекстный менеджер для работы с сессией без автоматического коммита."""
-        async with self.async_session_factory() as session:
+    async def session_only(self, group: str | None = None) -> AsyncGenerator[AsyncSession, None]:
+        """Контекстный менеджер для работы с сессией без автоматического коммита.
+
+        group - группа запросов для контроля допуска; без группы сессия не ограничивается.
+        """
+        async with self._admit(group), self.async_session_factory() as session:
+            await self._checkout(session)
             try:
                 yield session
             except Exception:
@@ -47,9 +73,10 @@ class AsyncDatabaseHelper:
                 raise
 
     @asynccontextmanager
-    async def transaction(self) -> AsyncGenerator[AsyncSession, None]:
+    async def transaction(self, group: str | None = None) -> AsyncGenerator[AsyncSession, None]:
         """Контекстный менеджер с автоматическим коммитом."""
-        async with self.async_session_factory() as session:
+        async with self._admit(group), self.async_session_factory() as session:
+            await self._checkout(session)
             try:
                 yield session
                 await session.commit()
@@ -57,10 +84,23 @@ class AsyncDatabaseHelper:
                 await session.rollback()
                 raise
 
+    def _admit(self, group: str | None) -> AsyncContextManager:
+        """Занять слот группы до обращения к пулу. Неизвестная группа не ограничивается."""
+        limiter = self.limiters.get(group) if group is not None else None
+        return limiter.acquire() if limiter is not None else nullcontext()
+
+    @staticmethod
+    async def _checkout(session: AsyncSession) -> None:
+        """Взять соединение для сессии сразу, чтобы измерить ожидание пула."""
+        start_time = time.perf_counter()
+        await session.connection()
+        POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start_time)
+
     async def close(self):
         """Закрывает соединения и пул."""
         if self.engine:
             await self.engine.dispose()
+            self.pool_monitor.detach()
             self.engine = None
             self.async_session_factory = None
 
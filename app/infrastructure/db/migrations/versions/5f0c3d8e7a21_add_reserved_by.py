@@ -0,0 +1,36 @@
+"""add_reserved_by
+
+Revision ID: 5f0c3d8e7a21
+Revises: e48a2c7f5d10
+Create Date: 2026-10-17 15:04:12.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f0c3d8e7a21'
+down_revision: Union[str, Sequence[str], None] = 'e48a2c7f5d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('reserved_by', sa.String(), nullable=True))
+    op.create_index(
+        'ix_users_reserved_by',
+        'users',
+        ['reserved_by'],
+        unique=False,
+        postgresql_where=sa.text('reserved_by IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_reserved_by', table_name='users')
+    op.drop_column('users', 'reserved_by')
@@ -0,0 +1,30 @@
+"""add_lease_expires_at
+
+Revision ID: 7c1f0b2d9a4e
+Revises: 224825a55c80
+Create Date: 2026-10-17 10:12:41.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1f0b2d9a4e'
+down_revision: Union[str, Sequence[str], None] = '224825a55c80'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('lease_expires_at', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_users_lease_expires_at'), 'users', ['lease_expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_users_lease_expires_at'), table_name='users')
+    op.drop_column('users', 'lease_expires_at')
@@ -0,0 +1,44 @@
+"""add_last_released_at
+
+Revision ID: 9a6d2e4b1c38
+Revises: 5f0c3d8e7a21
+Create Date: 2026-10-17 19:42:36.507114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a6d2e4b1c38'
+down_revision: Union[str, Sequence[str], None] = '5f0c3d8e7a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('last_released_at', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    op.create_index(
+        'ix_users_free_project_env_domain_released',
+        'users',
+        ['project_id', 'env', 'domain', 'last_released_at'],
+        unique=False,
+        postgresql_where=sa.text('locktime = 0'),
+    )
+    op.drop_index('ix_users_free_project_env_domain', table_name='users')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        'ix_users_free_project_env_domain',
+        'users',
+        ['project_id', 'env', 'domain'],
+        unique=False,
+        postgresql_where=sa.text('locktime = 0'),
+    )
+    op.drop_index('ix_users_free_project_env_domain_released', table_name='users')
+    op.drop_column('users', 'last_released_at')
@@ -0,0 +1,28 @@
+"""add_lease_token
+
+Revision ID: b3e95d6a1f27
+Revises: 7c1f0b2d9a4e
+Create Date: 2026-10-17 11:04:09.552131
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e95d6a1f27'
+down_revision: Union[str, Sequence[str], None] = '7c1f0b2d9a4e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('lease_token', sa.UUID(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'lease_token')
@@ -0,0 +1,43 @@
+"""add_users_lookup_indexes
+
+Revision ID: e48a2c7f5d10
+Revises: b3e95d6a1f27
+Create Date: 2026-10-17 12:31:57.904418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e48a2c7f5d10'
+down_revision: Union[str, Sequence[str], None] = 'b3e95d6a1f27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_users_project_env_domain',
+        'users',
+        ['project_id', 'env', 'domain', 'created_at', 'id'],
+        unique=False,
+    )
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False)
+    op.create_index(
+        'ix_users_free_project_env_domain',
+        'users',
+        ['project_id', 'env', 'domain'],
+        unique=False,
+        postgresql_where=sa.text('locktime = 0'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_free_project_env_domain', table_name='users')
+    op.drop_index('ix_users_created_at_id', table_name='users')
+    op.drop_index('ix_users_project_env_domain', table_name='users')
@@ -0,0 +1,199 @@
+"""События освобождения пользователей и изменения доступности.
+
+Репозиторий публикует событие после коммита каждой операции, вернувшей пользователей
+в пул, и подписчики процесса получают его сразу. В режиме Postgres событие
+дополнительно рассылается другим воркерам через NOTIFY на канал user_released:
+NOTIFY выполняется в самой освобождающей транзакции и доставляется при ее коммите.
+
+Изменения доступности (создания и блокировки, собранные за интервал) рассылаются
+только другим воркерам - через канал user_availability.
+"""
+import asyncio
+import json
+import logging
+from collections import Counter
+from typing import Callable, Iterable
+from uuid import UUID, uuid4
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.infrastructure.db.database import AsyncDatabaseHelper
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "user_released"
+DELTAS_CHANNEL = "user_availability"
+
+# Ключ фильтра освобожденного пользователя: (project_id, env, domain)
+ReleaseKey = tuple[UUID, str, str]
+ReleaseCallback = Callable[[dict[ReleaseKey, int]], None]
+# Изменения числа свободных и заблокированных пользователей по ключу фильтра
+AvailabilityDeltas = dict[ReleaseKey, tuple[int, int]]
+DeltasCallback = Callable[[AvailabilityDeltas], None]
+
+# Payload NOTIFY ограничен 8000 байт, ключей в одном сообщении - не больше этого числа
+_KEYS_PER_PAYLOAD = 64
+
+
+def _value(member) -> str:
+    return getattr(member, "value", member)
+
+
+def release_keys(users: Iterable[dict]) -> dict[ReleaseKey, int]:
+    """Сколько пользователей освобождено по каждому ключу фильтра."""
+    return dict(Counter((user["project_id"], _value(user["env"]), _value(user["domain"])) for user in users))
+
+
+class ReleaseNotifier:
+    """Рассылка событий освобождения подписчикам внутри процесса."""
+
+    def __init__(self) -> None:
+        self._subscribers: list[ReleaseCallback] = []
+        self._delta_subscribers: list[DeltasCallback] = []
+        self._remote_subscribers: list[ReleaseCallback] = []
+        # Метка процесса, чтобы не обрабатывать собственные NOTIFY повторно
+        self.origin = uuid4().hex
+
+    def subscribe(self, callback: ReleaseCallback) -> None:
+        self._subscribers.append(callback)
+
+    def subscribe_remote(self, callback: ReleaseCallback) -> None:
+        """Получать только освобождения, сделанные другими воркерами."""
+        self._remote_subscribers.append(callback)
+
+    def subscribe_deltas(self, callback: DeltasCallback) -> None:
+        """Получать изменения доступности от других воркеров."""
+        self._delta_subscribers.append(callback)
+
+    async def start(self) -> None:
+        """Начать прием событий других воркеров (локальной рассылке не нужно)."""
+
+    async def stop(self) -> None:
+        """Прекратить прием событий других воркеров."""
+
+    async def announce(self, session: AsyncSession, users: Iterable[dict]) -> None:
+        """Сообщить другим воркерам об освобождении внутри освобождающей транзакции (до коммита)."""
+
+    async def publish(self, users: Iterable[dict]) -> None:
+        """Сообщить об освобождении подписчикам процесса. Вызывается после коммита."""
+        released = release_keys(users)
+        if released:
+            self._dispatch(released)
+
+    async def publish_deltas(self, deltas: AvailabilityDeltas) -> None:
+        """Разослать изменения доступности другим воркерам (внутри процесса они уже учтены)."""
+
+    def _dispatch(self, released: dict[ReleaseKey, int]) -> None:
+        self._notify(self._subscribers, released)
+
+    @staticmethod
+    def _notify(subscribers: list[Callable], event: dict) -> None:
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Notification subscriber failed")
+
+
+class PostgresReleaseNotifier(ReleaseNotifier):
+    """Рассылка событий освобождения между воркерами через LISTEN/NOTIFY.
+
+    Освобождения рассылаются pg_notify в освобождающей транзакции, изменения
+    доступности - отдельной транзакцией из фоновой задачи. Прием идет по отдельному
+    соединению asyncpg, которое переподключается после обрыва.
+    """
+
+    def __init__(self, db_helper: AsyncDatabaseHelper, reconnect_delay: float = 1.0) -> None:
+        super().__init__()
+        self._db_helper = db_helper
+        self._reconnect_delay = reconnect_delay
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def announce(self, session: AsyncSession, users: Iterable[dict]) -> None:
+        released = release_keys(users)
+        if released:
+            await self._send(session, CHANNEL, self._encode(released))
+
+    async def publish_deltas(self, deltas: AvailabilityDeltas) -> None:
+        if deltas:
+            async with self._db_helper.transaction() as session:
+                await self._send(session, DELTAS_CHANNEL, self._encode_deltas(deltas))
+
+    @staticmethod
+    async def _send(session: AsyncSession, channel: str, payloads: list[str]) -> None:
+        for payload in payloads:
+            await session.execute(select(func.pg_notify(channel, payload)))
+
+    def _encode(self, released: dict[ReleaseKey, int]) -> list[str]:
+        items = [[str(project_id), env, domain, count] for (project_id, env, domain), count in released.items()]
+        return self._payloads("released", items)
+
+    def _encode_deltas(self, deltas: AvailabilityDeltas) -> list[str]:
+        items = [
+            [str(project_id), env, domain, free, locked]
+            for (project_id, env, domain), (free, locked) in deltas.items()
+        ]
+        return self._payloads("deltas", items)
+
+    def _payloads(self, field: str, items: list[list]) -> list[str]:
+        return [
+            json.dumps({"origin": self.origin, field: items[i:i + _KEYS_PER_PAYLOAD]})
+            for i in range(0, len(items), _KEYS_PER_PAYLOAD)
+        ]
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+            if data["origin"] == self.origin:
+                return
+            if channel == DELTAS_CHANNEL:
+                subscribers = self._delta_subscribers
+                event = {
+                    (UUID(project_id), env, domain): (free, locked)
+                    for project_id, env, domain, free, locked in data["deltas"]
+                }
+            else:
+                subscribers = self._subscribers + self._remote_subscribers
+                event = {(UUID(project_id), env, domain): count for project_id, env, domain, count in data["released"]}
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Malformed {channel} payload: {payload!r}")
+            return
+        self._notify(subscribers, event)
+
+    async def _listen(self) -> None:
+        import asyncpg
+
+        dsn = self._db_helper.database_url.replace("postgresql+asyncpg://", "postgresql://")
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(CHANNEL, self._on_notification)
+                await connection.add_listener(DELTAS_CHANNEL, self._on_notification)
+                await lost.wait()
+                logger.warning(f"{CHANNEL} listener connection lost")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"{CHANNEL} listener failed: {e}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(self._reconnect_delay)
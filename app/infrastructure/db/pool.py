@@ -0,0 +1,77 @@
+"""Наблюдение за пулом соединений через события SQLAlchemy."""
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.infrastructure.metrics import registry
+
+POOL_CHECKED_OUT = registry.gauge("db_pool_checked_out", "Соединения, выданные из пула")
+POOL_CHECKED_IN = registry.gauge("db_pool_checked_in", "Свободные соединения в пуле")
+POOL_OVERFLOW = registry.gauge("db_pool_overflow", "Соединения сверх pool_size, открытые в данный момент")
+POOL_SIZE = registry.gauge("db_pool_size", "Размер пула (pool_size)")
+POOL_CONNECTIONS = registry.counter(
+    "db_pool_connections_total", "События жизненного цикла соединений пула", ("event",)
+)
+POOL_CHECKOUT_WAIT = registry.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Время получения соединения сессией, включая ожидание в очереди пула и pre-ping",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+class PoolMonitor:
+    """Счетчики пула одного движка.
+
+    Текущее заполнение берется у самого пула, а события connect/close/invalidate/checkout
+    считаются обработчиками событий - по ним видна текучка соединений.
+    """
+
+    _EVENTS = ("connect", "close", "invalidate", "checkout", "checkin")
+
+    def __init__(self, pool_size: int, max_overflow: int, pool_timeout: float):
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.events = dict.fromkeys(self._EVENTS, 0)
+        self._pool = None
+
+    def attach(self, engine: AsyncEngine) -> None:
+        """Подписаться на события пула движка и отдавать его состояние в метрики."""
+        self._pool = engine.sync_engine.pool
+        for name in self._EVENTS:
+            event.listen(engine.sync_engine, name, self._listener(name))
+
+        POOL_CHECKED_OUT.set_function(lambda: self.snapshot()["checked_out"])
+        POOL_CHECKED_IN.set_function(lambda: self.snapshot()["checked_in"])
+        POOL_OVERFLOW.set_function(lambda: self.snapshot()["overflow"])
+        POOL_SIZE.set(self.pool_size)
+
+    def detach(self) -> None:
+        """Отвязаться от пула после dispose движка."""
+        self._pool = None
+
+    def _listener(self, name: str):
+        counter = POOL_CONNECTIONS.labels(name)
+
+        def listener(*args) -> None:
+            self.events[name] += 1
+            counter.inc()
+
+        return listener
+
+    def snapshot(self) -> dict:
+        """Текущее состояние пула и накопленные счетчики событий."""
+        pool = self._pool
+        checked_out = pool.checkedout() if pool is not None and hasattr(pool, "checkedout") else 0
+        checked_in = pool.checkedin() if pool is not None and hasattr(pool, "checkedin") else 0
+        # QueuePool.overflow() отрицателен, пока пул не заполнен до pool_size
+        overflow = max(pool.overflow(), 0) if pool is not None and hasattr(pool, "overflow") else 0
+        return {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "checked_out": checked_out,
+            "checked_in": checked_in,
+            "overflow": overflow,
+            "saturated": checked_out >= self.pool_size + self.max_overflow,
+            "events": dict(self.events),
+        }
@@ -0,0 +1,169 @@
+"""Репозиторий пользователей с read-through кэшем чтений."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+from itertools import product
+from typing import Any, Iterable
+from uuid import UUID
+
+from app.infrastructure.cache import MISSING, CacheBackend
+from app.infrastructure.db.database import AsyncDatabaseHelper
+from app.infrastructure.db.notifications import ReleaseKey, ReleaseNotifier
+from app.infrastructure.db.repository.user import UserRepository
+
+
+def _value(member) -> Any:
+    return getattr(member, "value", member)
+
+
+def _bucket_tag(project_id, env, domain) -> str:
+    return f"bucket:{project_id}:{_value(env)}:{_value(domain)}"
+
+
+def _user_tag(user_id: UUID) -> str:
+    return f"user:{user_id}"
+
+
+def _released_tag(project_id, env, domain) -> str:
+    return f"released:{project_id}:{_value(env)}:{_value(domain)}"
+
+
+def _filter_tags(project_id, env, domain) -> set[str]:
+    """Теги всех 8 фильтров, под которые попадает пользователь (None - любое значение)."""
+    return {
+        _bucket_tag(*key) for key in product((project_id, None), (_value(env), None), (_value(domain), None))
+    }
+
+
+class CachedUserRepository(UserRepository):
+    """UserRepository, кэширующий get_user и list_users.
+
+    Страница списка помечается тегом своего фильтра (project_id, env, domain, где
+    None - любое значение), пользователь - тегом своего id. Изменение пользователя
+    инвалидирует его id и все 8 фильтров, под которые он попадает, поэтому
+    сбрасываются только затронутые страницы.
+
+    Освобождения в других воркерах приходят через release_notifier событиями по
+    фильтрам, без id пользователей: они сбрасывают страницы фильтров и всех
+    закэшированных пользователей этого фильтра. Создания и блокировки в других
+    воркерах кэш процесса не видит - их устаревание ограничено TTL кэша.
+    """
+
+    def __init__(
+        self,
+        db_helper: AsyncDatabaseHelper,
+        cache: CacheBackend,
+        release_notifier: ReleaseNotifier | None = None,
+    ) -> None:
+        super().__init__(db_helper, release_notifier=release_notifier)
+        self._cache = cache
+        self._invalidations: set[asyncio.Task] = set()
+        if release_notifier is not None:
+            release_notifier.subscribe_remote(self._on_released_elsewhere)
+
+    async def get_user(self, user_id: UUID) -> dict:
+        key = _user_tag(user_id)
+        cached = await self._cache.get(key)
+        if cached is not MISSING:
+            return cached
+
+        since = await self._cache.version()
+        user = await super().get_user(user_id)
+        tags = (key, _released_tag(user["project_id"], user["env"], user["domain"]))
+        await self._cache.set(key, user, tags=tags, since=since)
+        return user
+
+    async def list_users(
+        self,
+        project_id: UUID | None = None,
+        env: str | None = None,
+        domain: str | None = None,
+        locked: bool | None = None,
+        after: tuple[datetime, UUID] | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        after_key = f"{after[0].isoformat()}|{after[1]}" if after else ""
+        key = f"users:{project_id}:{_value(env)}:{_value(domain)}:{locked}:{after_key}:{limit}"
+        cached = await self._cache.get(key)
+        if cached is not MISSING:
+            return list(cached)
+
+        since = await self._cache.version()
+        users = await super().list_users(project_id, env, domain, locked, after, limit)
+        await self._cache.set(key, tuple(users), tags=(_bucket_tag(project_id, env, domain),), since=since)
+        return users
+
+    async def create_user(self, user_data: dict) -> dict:
+        user = await super().create_user(user_data)
+        await self._invalidate([user])
+        return user
+
+    async def bulk_create_users(self, users: list[dict]) -> list[UUID]:
+        created = await super().bulk_create_users(users)
+        created_ids = set(created)
+        await self._invalidate(user for user in users if user["id"] in created_ids)
+        return created
+
+    async def acquire_lock(self, user_id: UUID, ttl: int | None = None) -> tuple[dict, bool]:
+        user, already_locked = await super().acquire_lock(user_id, ttl=ttl)
+        if not already_locked:
+            await self._invalidate([user])
+        return user, already_locked
+
+    async def acquire_locks(
+        self, user_ids: list[UUID], ttl: int | None = None
+    ) -> tuple[list[tuple[dict, bool]], list[UUID]]:
+        results, not_found = await super().acquire_locks(user_ids, ttl=ttl)
+        await self._invalidate(user for user, already_locked in results if not already_locked)
+        return results, not_found
+
+    async def lease_user(self, *args, **kwargs) -> dict | None:
+        user = await super().lease_user(*args, **kwargs)
+        if user is not None:
+            await self._invalidate([user])
+        return user
+
+    async def lease_users(self, *args, **kwargs) -> list[dict]:
+        users = await super().lease_users(*args, **kwargs)
+        await self._invalidate(users)
+        return users
+
+    async def reserve_users(self, *args, **kwargs) -> list[dict]:
+        users = await super().reserve_users(*args, **kwargs)
+        await self._invalidate(users)
+        return users
+
+    async def confirm_reserved(self, reserved_by: str, leases: list[dict]) -> None:
+        await super().confirm_reserved(reserved_by, leases)
+        await self._invalidate(leases)
+
+    async def renew_leases(self, leases: list[tuple[UUID, UUID]], ttl: int | None = None) -> list[dict]:
+        renewed = await super().renew_leases(leases, ttl=ttl)
+        await self._invalidate(renewed)
+        return renewed
+
+    async def _notify_released(self, users: list[dict]) -> None:
+        # Через этот метод проходят все освобождения: release_lock, release_users,
+        # release_reserved и reclaim_expired. Кэш сбрасывается до пробуждения ожидающих
+        await self._invalidate(users)
+        await super()._notify_released(users)
+
+    def _on_released_elsewhere(self, released: dict[ReleaseKey, int]) -> None:
+        """Сбросить страницы фильтров и пользователей фильтров, освобожденных другим воркером."""
+        tags = set()
+        for key in released:
+            tags.add(_released_tag(*key))
+            tags.update(_filter_tags(*key))
+        task = asyncio.get_running_loop().create_task(self._cache.invalidate(tags))
+        self._invalidations.add(task)
+        task.add_done_callback(self._invalidations.discard)
+
+    async def _invalidate(self, users: Iterable[dict]) -> None:
+        """Сбросить записи кэша, которые могли измениться вместе с пользователями."""
+        tags = set()
+        for user in users:
+            tags.add(_user_tag(user["id"]))
+            tags.update(_filter_tags(user["project_id"], user["env"], user["domain"]))
+        if tags:
+            await self._cache.invalidate(tags)
@@ -1,13 +1,29 @@
 from __future__ import annotations
 
+import logging
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
-from uuid import UUID
+from typing import AsyncIterator
+from uuid import UUID, uuid4
 
-from sqlalchemy import select
+from sqlalchemy import Select, bindparam, func, insert, literal_column, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.infrastructure.db.admission import CREATE_GROUP, EXPORT_GROUP, LEASE_GROUP, LIST_GROUP
 from app.infrastructure.db.database import AsyncDatabaseHelper
+from app.infrastructure.db.notifications import ReleaseKey, ReleaseNotifier
 from app.infrastructure.db.schemas import User as UserORM
 
+logger = logging.getLogger(__name__)
+
+# Условия свободы/занятости пользователя. Ноль рендерится литералом, а не параметром:
+# иначе планировщик Postgres на подготовленных (generic) планах не сможет доказать
+# совпадение с предикатом частичного индекса WHERE locktime = 0 и не использует его.
+_IS_FREE = UserORM.locktime == literal_column("0")
+_IS_LOCKED = UserORM.locktime != literal_column("0")
+
+
 class UserRepositoryError(Exception):
     """Базовая ошибка репозитория."""
 
@@ -19,64 +35,502 @@ class UserNotFoundError(UserRepositoryError):
 class UserRepository:
     """Простая обертка над запросами к таблице пользователей."""
 
-    def __init__(self, db_helper: AsyncDatabaseHelper) -> None:
+    # Колонки, которые возвращаются Core-запросами через RETURNING
+    _columns = (
+        UserORM.id,
+        UserORM.created_at,
+        UserORM.login,
+        UserORM.password,
+        UserORM.project_id,
+        UserORM.env,
+        UserORM.domain,
+        UserORM.locktime,
+        UserORM.lease_expires_at,
+        UserORM.lease_token,
+    )
+
+    def __init__(self, db_helper: AsyncDatabaseHelper, release_notifier: ReleaseNotifier | None = None) -> None:
         self._db_helper = db_helper
+        # Получает освобожденных пользователей после коммита
+        self._release_notifier = release_notifier
+        # Версия данных таблицы, видимая этому процессу: растет после каждой записи
+        # и после освобождений в других воркерах. Метка процесса отличает версии
+        # после перезапуска, когда счетчик начинается заново.
+        self._version = 0
+        self._version_origin = uuid4().hex[:8]
+        if release_notifier is not None:
+            release_notifier.subscribe(self._on_released)
+
+    @property
+    def version(self) -> str:
+        """Текущая версия данных (меняется при любом изменении, сделанном через этот процесс)."""
+        return f"{self._version_origin}-{self._version}"
 
     async def create_user(self, user_data: dict) -> dict:
-        """Создать пользователя."""
-        async with self._db_helper.transaction() as session:
-            user = UserORM(**user_data)
-            session.add(user)
-            await session.flush()
-            await session.refresh(user)
-            return self._to_dict(user)
-
-    async def list_users(self) -> list[dict]:
-        """Получить всех пользователей."""
+        """Создать пользователя одним INSERT ... RETURNING."""
+        stmt = insert(UserORM).values(**user_data).returning(*self._columns)
+        async with self._write(CREATE_GROUP) as session:
+            row = (await session.execute(stmt)).one()
+            return self._row_to_dict(row)
+
+    async def bulk_create_users(self, users: list[dict]) -> list[UUID]:
+        """Создать пачку пользователей многострочным INSERT ... RETURNING.
+
+        Строки с уже существующим id пропускаются (ON CONFLICT DO NOTHING).
+        Возвращает id реально вставленных строк.
+        """
+        dialect_insert = postgresql.insert if self._db_helper.engine.dialect.name == "postgresql" else sqlite.insert
+        stmt = dialect_insert(UserORM).on_conflict_do_nothing(index_elements=[UserORM.id]).returning(UserORM.id)
+        async with self._write(CREATE_GROUP) as session:
+            result = await session.execute(stmt, users)
+            return list(result.scalars().all())
+
+    async def get_user(self, user_id: UUID) -> dict:
+        """Получить пользователя по id."""
+        async with self._db_helper.session_only(LIST_GROUP) as session:
+            return await self._get_row(session, user_id)
+
+    async def list_users(
+        self,
+        project_id: UUID | None = None,
+        env: str | None = None,
+        domain: str | None = None,
+        locked: bool | None = None,
+        after: tuple[datetime, UUID] | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        """Получить пользователей по фильтру в порядке (created_at, id).
+
+        after - ключ последней строки предыдущей страницы (keyset-пагинация).
+        """
+        stmt = (
+            select(*self._columns)
+            .where(*self._filter_clauses(project_id, env, domain, locked))
+            .order_by(UserORM.created_at, UserORM.id)
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(UserORM.created_at, UserORM.id) > tuple_(*after))
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        async with self._db_helper.session_only(LIST_GROUP) as session:
+            result = await session.execute(stmt)
+            return [self._row_to_dict(row) for row in result.all()]
+
+    async def iter_users(
+        self,
+        project_id: UUID | None = None,
+        env: str | None = None,
+        domain: str | None = None,
+        locked: bool | None = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[dict]:
+        """Потоково отдать пользователей по фильтру через серверный курсор.
+
+        В памяти одновременно держится не больше batch_size строк. Сессия занимает
+        слот группы выгрузки, пока поток не дочитан.
+        """
+        stmt = (
+            select(*self._columns)
+            .where(*self._filter_clauses(project_id, env, domain, locked))
+            .execution_options(yield_per=batch_size)
+        )
+        async with self._db_helper.session_only(EXPORT_GROUP) as session:
+            result = await session.stream(stmt)
+            async for row in result:
+                yield self._row_to_dict(row)
+
+    async def count_by_bucket(self) -> list[dict]:
+        """Число свободных и заблокированных пользователей по (project_id, env, domain) одним GROUP BY."""
+        stmt = select(
+            UserORM.project_id,
+            UserORM.env,
+            UserORM.domain,
+            func.count().filter(_IS_FREE).label("free"),
+            func.count().filter(_IS_LOCKED).label("locked"),
+        ).group_by(UserORM.project_id, UserORM.env, UserORM.domain)
+        # Без группы допуска: сверка идет из фоновой задачи
         async with self._db_helper.session_only() as session:
-            result = await session.execute(select(UserORM))
-            return [self._to_dict(user) for user in result.scalars().all()]
+            result = await session.execute(stmt)
+            return [self._row_to_dict(row) for row in result.all()]
 
-    async def acquire_lock(self, user_id: UUID) -> tuple[dict, bool]:
-        """Заблокировать пользователя"""
-        async with self._db_helper.transaction() as session:
-            stmt = select(UserORM).where(UserORM.id == user_id).with_for_update()
-            user = (await session.execute(stmt)).scalar_one_or_none()
-            if not user:
-                raise UserNotFoundError()
+    async def acquire_lock(self, user_id: UUID, ttl: int | None = None) -> tuple[dict, bool]:
+        """Заблокировать пользователя.
 
-            already_locked = user.locktime != 0
-            if not already_locked:
-                user.locktime = int(datetime.now(timezone.utc).timestamp())
-                session.add(user)
+        Блокировка делается одним UPDATE ... RETURNING; строка читается отдельно
+        только если UPDATE ничего не изменил (пользователь занят или не существует).
+        """
+        stmt = (
+            update(UserORM)
+            .where(UserORM.id == user_id, _IS_FREE)
+            .values(**self._lock_values(ttl))
+            .returning(*self._columns)
+            .execution_options(synchronize_session=False)
+        )
+        async with self._write(LEASE_GROUP) as session:
+            row = (await session.execute(stmt)).one_or_none()
+            if row:
+                return self._row_to_dict(row), False
 
-            return self._to_dict(user), already_locked
+            return await self._get_row(session, user_id), True
 
+    async def acquire_locks(
+        self, user_ids: list[UUID], ttl: int | None = None
+    ) -> tuple[list[tuple[dict, bool]], list[UUID]]:
+        """Заблокировать пачку пользователей по id одним UPDATE.
+
+        Возвращает пары (пользователь, already_locked) и id, которых нет в таблице.
+        """
+        stmt = (
+            update(UserORM)
+            .where(UserORM.id.in_(user_ids), _IS_FREE)
+            .values(**self._lock_values(ttl))
+            .returning(*self._columns)
+            .execution_options(synchronize_session=False)
+        )
+        async with self._write(LEASE_GROUP) as session:
+            locked = [self._row_to_dict(row) for row in (await session.execute(stmt)).all()]
+            results = [(user, False) for user in locked]
+
+            # Остальные id либо уже заблокированы, либо не существуют
+            remaining = set(user_ids) - {user["id"] for user in locked}
+            if remaining:
+                rows = (await session.execute(select(*self._columns).where(UserORM.id.in_(remaining)))).all()
+                results.extend((self._row_to_dict(row), True) for row in rows)
+                remaining -= {row.id for row in rows}
+
+            return results, [user_id for user_id in user_ids if user_id in remaining]
+
+    async def lease_user(
+        self,
+        project_id: UUID | None = None,
+        env: str | None = None,
+        domain: str | None = None,
+        ttl: int | None = None,
+    ) -> dict | None:
+        """Атомарно заблокировать любого свободного пользователя по фильтру.
+
+        Кандидат выбирается подзапросом с FOR UPDATE SKIP LOCKED, поэтому
+        конкурирующие воркеры не ждут друг друга и не получают одну и ту же строку.
+        Возвращает None, если свободных пользователей нет.
+        """
+        candidate = self._free_candidates(1, project_id, env, domain).scalar_subquery()
+        stmt = (
+            update(UserORM)
+            .where(UserORM.id == candidate, _IS_FREE)
+            .values(**self._lock_values(ttl))
+            .returning(*self._columns)
+            .execution_options(synchronize_session=False)
+        )
+        async with self._write(LEASE_GROUP) as session:
+            row = (await session.execute(stmt)).one_or_none()
+            return self._row_to_dict(row) if row else None
+
+    async def lease_users(
+        self,
+        count: int,
+        project_id: UUID | None = None,
+        env: str | None = None,
+        domain: str | None = None,
+        ttl: int | None = None,
+    ) -> list[dict]:
+        """Атомарно заблокировать до count свободных пользователей по фильтру одним запросом."""
+        candidates = self._free_candidates(count, project_id, env, domain)
+        stmt = (
+            update(UserORM)
+            .where(UserORM.id.in_(candidates), _IS_FREE)
+            .values(**self._lock_values(ttl))
+            .returning(*self._columns)
+            .execution_options(synchronize_session=False)
+        )
+        async with self._write(LEASE_GROUP) as session:
+            rows = (await session.execute(stmt)).all()
+            return [self._row_to_dict(row) for row in rows]
+
+    async def reserve_users(
+        self,
+        count: int,
+        reserved_by: str,
+        project_id: UUID | None = None,
+        env: str | None = None,
+        domain: str | None = None,
+        ttl: int | None = None,
+    ) -> list[dict]:
+        """Зарезервировать до count свободных пользователей за воркером одним запросом.
+
+        Строки блокируются как при аренде и помечаются reserved_by; ttl ограничивает
+        время жизни резерва, чтобы после падения воркера его резерв освободил reaper.
+        """
+        candidates = self._free_candidates(count, project_id, env, domain)
+        stmt = (
+            update(UserORM)
+            .where(UserORM.id.in_(candidates), _IS_FREE)
+            .values(**self._lock_values(ttl, reserved_by=reserved_by))
+            .returning(*self._columns)
+            .execution_options(synchronize_session=False)
+        )
+        async with self._write(LEASE_GROUP) as session:
+            rows = (await session.execute(stmt)).all()
+            return [self._row_to_dict(row) for row in rows]
+
+    async def confirm_reserved(self, reserved_by: str, leases: list[dict]) -> None:
+        """Записать аренды, выданные из резерва воркера.
+
+        leases - словари с id, locktime и lease_expires_at. Обновляются только строки,
+        все еще зарезервированные этим воркером: если аренду успели освободить,
+        запись пропускается.
+        """
+        table = UserORM.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"), table.c.reserved_by == reserved_by)
+            .values(
+                reserved_by=None,
+                locktime=bindparam("b_locktime"),
+                lease_expires_at=bindparam("b_lease_expires_at"),
+            )
+        )
+        params = [
+            {"b_id": lease["id"], "b_locktime": lease["locktime"], "b_lease_expires_at": lease["lease_expires_at"]}
+            for lease in leases
+        ]
+        # Без группы допуска: подтверждение нельзя отбрасывать при перегрузке
+        async with self._write() as session:
+            await session.execute(stmt, params)
+
+    async def release_reserved(self, reserved_by: str, user_ids: list[UUID] | None = None) -> int:
+        """Вернуть в пул зарезервированных воркером пользователей (всех или только user_ids)."""
+        stmt = (
+            update(UserORM)
+            .where(UserORM.reserved_by == reserved_by)
+            .values(**self._unlock_values(used=False))
+            .execution_options(synchronize_session=False)
+        )
+        if user_ids is not None:
+            stmt = stmt.where(UserORM.id.in_(user_ids))
+        stmt = stmt.returning(UserORM.id, UserORM.project_id, UserORM.env, UserORM.domain)
+        async with self._write() as session:
+            released = [self._row_to_dict(row) for row in (await session.execute(stmt)).all()]
+            await self._announce_released(session, released)
+        await self._notify_released(released)
+        return len(released)
 
     async def release_lock(self, user_id: UUID) -> tuple[dict, bool]:
-        """Разблокировать пользователя."""
-        async with self._db_helper.transaction() as session:
-            stmt = select(UserORM).where(UserORM.id == user_id).with_for_update()
-            user = (await session.execute(stmt)).scalar_one_or_none()
-            if not user:
-                raise UserNotFoundError()
-
-            already_unlocked = user.locktime == 0
-            if not already_unlocked:
-                user.locktime = 0
-                session.add(user)
-
-            return self._to_dict(user), already_unlocked
-
-    def _to_dict(self, user: UserORM) -> dict:
-        """Маппер UserORM в словарь."""
+        """Разблокировать пользователя.
+
+        Строки в резерве воркера не освобождаются: аренду, выданную из памяти, воркер
+        еще не записал, и ее освобождение ReservationPool применяет после записи.
+        """
+        stmt = (
+            update(UserORM)
+            .where(UserORM.id == user_id, _IS_LOCKED, UserORM.reserved_by.is_(None))
+            .values(**self._unlock_values())
+            .returning(*self._columns)
+            .execution_options(synchronize_session=False)
+        )
+        async with self._write(LEASE_GROUP) as session:
+            row = (await session.execute(stmt)).one_or_none()
+            if not row:
+                return await self._get_row(session, user_id), True
+            user = self._row_to_dict(row)
+            await self._announce_released(session, [user])
+
+        await self._notify_released([user])
+        return user, False
+
+    async def release_users(self, user_ids: list[UUID]) -> tuple[list[tuple[dict, bool]], list[UUID]]:
+        """Разблокировать пачку пользователей в одной транзакции.
+
+        Возвращает пары (пользователь, already_unlocked) и id, которых нет в таблице.
+        Строки в резерве воркера, как и в release_lock, не освобождаются.
+        """
+        stmt = (
+            update(UserORM)
+            .where(UserORM.id.in_(user_ids), _IS_LOCKED, UserORM.reserved_by.is_(None))
+            .values(**self._unlock_values())
+            .returning(*self._columns)
+            .execution_options(synchronize_session=False)
+        )
+        async with self._write(LEASE_GROUP) as session:
+            released = [self._row_to_dict(row) for row in (await session.execute(stmt)).all()]
+            results = [(user, False) for user in released]
+
+            # Остальные id либо уже были разблокированы, либо не существуют
+            remaining = set(user_ids) - {user["id"] for user in released}
+            if remaining:
+                rows = (await session.execute(select(*self._columns).where(UserORM.id.in_(remaining)))).all()
+                results.extend((self._row_to_dict(row), True) for row in rows)
+                remaining -= {row.id for row in rows}
+            await self._announce_released(session, released)
+
+        await self._notify_released(released)
+        return results, [user_id for user_id in user_ids if user_id in remaining]
+
+    async def renew_leases(self, leases: list[tuple[UUID, UUID]], ttl: int | None = None) -> list[dict]:
+        """Продлить аренды одним UPDATE.
+
+        Продлеваются только строки, где пара (id, lease_token) совпадает с текущей арендой,
+        поэтому чужую или уже освобожденную аренду продлить нельзя. Без ttl время истечения
+        не меняется, а запрос только подтверждает, что аренда все еще принадлежит клиенту.
+        Вместе с id и временем истечения возвращаются project_id, env и domain.
+        """
+        expires_at = self._now() + ttl if ttl else UserORM.lease_expires_at
+        stmt = (
+            update(UserORM)
+            .where(tuple_(UserORM.id, UserORM.lease_token).in_(leases), _IS_LOCKED)
+            .values(lease_expires_at=expires_at)
+            .returning(UserORM.id, UserORM.lease_expires_at, UserORM.project_id, UserORM.env, UserORM.domain)
+            .execution_options(synchronize_session=False)
+        )
+        async with self._write(LEASE_GROUP) as session:
+            rows = (await session.execute(stmt)).all()
+            return [self._row_to_dict(row) for row in rows]
+
+    async def reclaim_expired(self, limit: int) -> list[dict]:
+        """Снять блокировку с пользователей, у которых истекла аренда.
+
+        За один вызов обрабатывается не больше limit строк: кандидаты берутся
+        диапазоном по индексу lease_expires_at, занятые другими транзакциями пропускаются.
+        """
+        now = self._now()
+        candidates = (
+            select(UserORM.id)
+            .where(UserORM.lease_expires_at <= now)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(UserORM)
+            .where(UserORM.id.in_(candidates), UserORM.lease_expires_at <= now)
+            .values(**self._unlock_values())
+            .returning(*self._columns)
+            .execution_options(synchronize_session=False)
+        )
+        async with self._write() as session:
+            reclaimed = [self._row_to_dict(row) for row in (await session.execute(stmt)).all()]
+            await self._announce_released(session, reclaimed)
+        await self._notify_released(reclaimed)
+        return reclaimed
+
+    @asynccontextmanager
+    async def _write(self, group: str | None = None) -> AsyncIterator[AsyncSession]:
+        """Транзакция записи; версия данных увеличивается после ее завершения.
+
+        Версия растет и при ошибке: лишняя смена версии безопасна, а пропущенная - нет.
+        """
+        try:
+            async with self._db_helper.transaction(group) as session:
+                yield session
+        finally:
+            self._version += 1
+
+    def _on_released(self, released: dict[ReleaseKey, int]) -> None:
+        self._version += 1
+
+    async def _announce_released(self, session: AsyncSession, users: list[dict]) -> None:
+        """Сообщить другим воркерам об освобожденных пользователях в той же транзакции.
+
+        NOTIFY доставляется при коммите, без отдельного соединения и без потери события.
+        """
+        if self._release_notifier is not None and users:
+            await self._release_notifier.announce(session, users)
+
+    async def _notify_released(self, users: list[dict]) -> None:
+        """Сообщить подписчикам процесса об освобожденных пользователях.
+
+        Операция уже закоммичена, поэтому ошибка не пробрасывается.
+        """
+        if self._release_notifier is None or not users:
+            return
+        try:
+            await self._release_notifier.publish(users)
+        except Exception:
+            logger.exception("Failed to publish released users")
+
+    async def _get_row(self, session: AsyncSession, user_id: UUID) -> dict:
+        """Прочитать пользователя по id без блокировки строки."""
+        row = (await session.execute(select(*self._columns).where(UserORM.id == user_id))).one_or_none()
+        if row is None:
+            raise UserNotFoundError()
+        return self._row_to_dict(row)
+
+    @classmethod
+    def _free_candidates(
+        cls,
+        limit: int,
+        project_id: UUID | None = None,
+        env: str | None = None,
+        domain: str | None = None,
+    ) -> Select:
+        """Подзапрос id свободных пользователей по фильтру (идет по частичному индексу).
+
+        При заданных project_id, env и domain первыми берутся пользователи, освобожденные
+        раньше всех (ротация LRU): этот порядок дает сам индекс, без сортировки. При
+        неполном фильтре ORDER BY потребовал бы сортировки всех свободных строк, поэтому
+        строки берутся в порядке индекса - внутри каждой группы это тоже LRU.
+        """
+        stmt = select(UserORM.id).where(_IS_FREE, *cls._filter_clauses(project_id, env, domain))
+        if project_id is not None and env is not None and domain is not None:
+            stmt = stmt.order_by(UserORM.last_released_at)
+        return stmt.limit(limit).with_for_update(skip_locked=True)
+
+    @staticmethod
+    def _filter_clauses(
+        project_id: UUID | None = None,
+        env: str | None = None,
+        domain: str | None = None,
+        locked: bool | None = None,
+    ) -> list:
+        """Условия WHERE для фильтра по проекту, окружению, домену и состоянию блокировки."""
+        clauses = []
+        if project_id is not None:
+            clauses.append(UserORM.project_id == project_id)
+        if env is not None:
+            clauses.append(UserORM.env == env)
+        if domain is not None:
+            clauses.append(UserORM.domain == domain)
+        if locked is not None:
+            clauses.append(_IS_LOCKED if locked else _IS_FREE)
+        return clauses
+
+    @staticmethod
+    def _now() -> int:
+        """Текущее время в секундах (значение для locktime)."""
+        return int(datetime.now(timezone.utc).timestamp())
+
+    def _lock_values(self, ttl: int | None = None, reserved_by: str | None = None) -> dict:
+        """Значения колонок для блокировки; при заданном ttl аренда истекает через ttl секунд."""
+        now = self._now()
         return {
-            "id": user.id,
-            "created_at": user.created_at,
-            "login": user.login,
-            "password": user.password,
-            "project_id": user.project_id,
-            "env": user.env,
-            "domain": user.domain,
-            "locktime": user.locktime,
-        }
\ No newline at end of file
+            "locktime": now,
+            "lease_expires_at": now + ttl if ttl else None,
+            "lease_token": self._new_token(),
+            "reserved_by": reserved_by,
+        }
+
+    def _new_token(self):
+        """Выражение нового токена аренды, вычисляемое в БД для каждой строки UPDATE.
+
+        Значение из Python было бы общим для всех строк пакетной блокировки,
+        а в один пакет коалесцер собирает аренды разных клиентов.
+        """
+        if self._db_helper.engine.dialect.name == "postgresql":
+            return func.gen_random_uuid()
+        # SQLite хранит UUID как 32 hex-символа
+        return func.lower(func.hex(func.randomblob(16)))
+
+    @classmethod
+    def _unlock_values(cls, used: bool = True) -> dict:
+        """Значения колонок для снятия блокировки.
+
+        used=False - пользователь не выдавался клиенту, его место в очереди ротации не меняется.
+        """
+        values = {"locktime": 0, "lease_expires_at": None, "lease_token": None, "reserved_by": None}
+        if used:
+            values["last_released_at"] = cls._now()
+        return values
+
+    @staticmethod
+    def _row_to_dict(row) -> dict:
+        """Маппер строки Core-запроса в словарь."""
+        return dict(row._mapping)
@@ -3,7 +3,7 @@ from datetime import datetime
 from enum import Enum
 from uuid import uuid4
 
-from sqlalchemy import Column, DateTime, Integer, String, Enum as SQLAlchemyEnum
+from sqlalchemy import Column, DateTime, Index, Integer, String, text, Enum as SQLAlchemyEnum
 # Быстрее чем UUID из алхимии
 from sqlalchemy.dialects.postgresql import UUID as PostgresUUID
 
@@ -22,6 +22,30 @@ class Domain(str, Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Фильтрованный список с keyset-пагинацией по (created_at, id)
+        Index("ix_users_project_env_domain", "project_id", "env", "domain", "created_at", "id"),
+        # Нефильтрованный список в порядке (created_at, id)
+        Index("ix_users_created_at_id", "created_at", "id"),
+        # Поиск свободного пользователя при аренде: в индексе только строки с locktime = 0,
+        # внутри фильтра - в порядке last_released_at (дольше всех не использовавшиеся первыми)
+        Index(
+            "ix_users_free_project_env_domain_released",
+            "project_id",
+            "env",
+            "domain",
+            "last_released_at",
+            postgresql_where=text("locktime = 0"),
+            sqlite_where=text("locktime = 0"),
+        ),
+        # Резервы воркеров: в индексе только зарезервированные строки
+        Index(
+            "ix_users_reserved_by",
+            "reserved_by",
+            postgresql_where=text("reserved_by IS NOT NULL"),
+            sqlite_where=text("reserved_by IS NOT NULL"),
+        ),
+    )
 
     id = Column(PostgresUUID, primary_key=True, default=uuid4)
     created_at = Column(DateTime, default=datetime.now)
@@ -30,4 +54,12 @@ class User(Base):
     project_id = Column(PostgresUUID, nullable=False)
     env = Column(SQLAlchemyEnum(Env), nullable=False)
     domain = Column(SQLAlchemyEnum(Domain), nullable=False)
-    locktime = Column(Integer, nullable=False, default=0)
\ No newline at end of file
+    locktime = Column(Integer, nullable=False, default=0)
+    # Время истечения аренды (unix timestamp), NULL - аренда бессрочная
+    lease_expires_at = Column(Integer, nullable=True, index=True)
+    # Токен текущей аренды, меняется при каждой блокировке
+    lease_token = Column(PostgresUUID, nullable=True)
+    # Воркер, зарезервировавший пользователя для раздачи из памяти; NULL - не в резерве
+    reserved_by = Column(String, nullable=True)
+    # Время последнего освобождения (unix timestamp), 0 - пользователя еще не арендовали
+    last_released_at = Column(Integer, nullable=False, default=0, server_default=text("0"))
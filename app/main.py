@@ -1,12 +1,14 @@
 """Точка входа в основное приложение."""
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 
 from app.presentation.api import router as all_routers
-from app.presentation.middleware import LoggingMiddleware
+from app.presentation.middleware import LoggingMiddleware, MetricsMiddleware, start_log_listener, stop_log_listener
 from app.application.container import ServicesContainer
 from app.infrastructure.container import InfrastructureContainer
+from app.infrastructure.db.admission import AdmissionRejectedError
 from app.config import get_settings
 
 settings = get_settings()
@@ -17,25 +19,73 @@ async def lifespan(app: FastAPI):
     """Обработчик событий жизненного цикла FastAPI."""
     # Startup
 
+    # Логи запросов пишутся из отдельного потока
+    start_log_listener()
+
     # Создаем контейнер инфраструктуры
     app.state.infra = InfrastructureContainer(settings=settings)
     await app.state.infra.db_helper.connect()
+    # События освобождения пользователей от других воркеров
+    await app.state.infra.release_notifier.start()
 
     # Билдим образ контейнера сервисов
     app.state.service_container = ServicesContainer(settings=settings, infra=app.state.infra)
 
+    # Запускаем фоновую очистку истекших аренд
+    app.state.service_container.lease_reaper.start()
+
+    # Сверка счетчиков доступности с БД и поток их изменений
+    app.state.service_container.availability.start()
+    app.state.service_container.availability_feed.start()
+
+    # Резервы пользователей воркера (если включены)
+    reservation_pool = app.state.service_container.reservation_pool
+    if reservation_pool is not None:
+        reservation_pool.start()
+
     yield
 
     # Shutdown
 
+    # Возвращаем неиспользованный резерв до закрытия соединений
+    if reservation_pool is not None:
+        await reservation_pool.stop()
+
+    await app.state.service_container.lease_reaper.stop()
+
+    await app.state.service_container.availability_feed.stop()
+    await app.state.service_container.availability.stop()
+
+    await app.state.infra.release_notifier.stop()
+
     # Закрываем соединения
     await app.state.infra.db_helper.close()
 
+    stop_log_listener()
+
 
 app = FastAPI(title=settings.app_name, version="0.1.0", lifespan=lifespan)
 
 # Добавляем middleware
-app.add_middleware(LoggingMiddleware, log_level=settings.log_level)
+app.add_middleware(
+    LoggingMiddleware,
+    log_level=settings.log_level,
+    sample_rate=settings.access_log_sample_rate,
+    slow_threshold=settings.access_log_slow_threshold_seconds,
+)
+# Метрики добавляются последними, чтобы время ответа включало логирование
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(AdmissionRejectedError)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejectedError) -> JSONResponse:
+    """Быстрый отказ при перегрузке БД: клиент повторяет запрос после Retry-After."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Service overloaded, retry later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 
 # Подключаем предварительно собранные роуты
 app.include_router(all_routers)
@@ -1,3 +1,5 @@
+from typing import Any
+
 from fastapi import APIRouter, HTTPException, Request, status
 from sqlalchemy import text
 
@@ -72,3 +74,22 @@ async def readiness(request: Request) -> dict[str, str]:
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Проверка готовности приложения прошла с ошибкой: {str(e)}"
         )
+
+
+@router.get("/pool")
+async def pool(request: Request) -> dict[str, Any]:
+    """Состояние пула соединений с БД"""
+    if not hasattr(request.app.state, "infra") or request.app.state.infra.db_helper.engine is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database not connected"
+        )
+
+    db_helper = request.app.state.infra.db_helper
+    return {
+        **db_helper.pool_monitor.snapshot(),
+        "admission": {
+            group: {"limit": limiter.limit, "active": limiter.active, "queued": limiter.queued}
+            for group, limiter in db_helper.limiters.items()
+        },
+    }
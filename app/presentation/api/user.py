@@ -1,30 +1,206 @@
+import json
+from dataclasses import asdict
+from typing import Any, AsyncIterator
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, status
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 
 from app.application.container import ServicesContainer
 from app.dependencies import get_services
-from app.presentation.schemas import LockResponse, UnlockResponse, UserCreate, UserRead
+from app.presentation.responses import FastJSONResponse
+from app.presentation.schemas import (
+    AvailabilityParams,
+    AvailabilityResponse,
+    BulkCreateFailure,
+    BulkCreateResponse,
+    LeaseBatchRequest,
+    LeaseBatchResponse,
+    LeaseWaitRequest,
+    LockOperation,
+    LockResponse,
+    ReleaseBatchRequest,
+    ReleaseBatchResponse,
+    RenewedLease,
+    RenewRequest,
+    RenewResponse,
+    UnlockOperation,
+    UnlockResponse,
+    UserCreate,
+    UserFilterParams,
+    UserListParams,
+    UserLease,
+    UserPage,
+    UserRead,
+)
 
 router = APIRouter()
 
+# Сколько строк NDJSON склеивать в один чанк ответа
+EXPORT_CHUNK_ROWS = 500
+# Сколько строк импорта валидировать и вставлять за один INSERT
+BULK_CREATE_CHUNK_ROWS = 1000
+
 
 @router.post("/create_user", response_model=UserRead, status_code=status.HTTP_201_CREATED)
 async def create_user(user: UserCreate, services: ServicesContainer = Depends(get_services)) -> UserRead:
     return await services.user_service.create_user(user)
 
 
-@router.get("/get_users", response_model=list[UserRead], status_code=status.HTTP_200_OK)
-async def get_users(services: ServicesContainer = Depends(get_services)) -> list[UserRead]:
-    return await services.user_service.get_users()
+@router.post("/bulk_create", response_model=BulkCreateResponse, status_code=status.HTTP_200_OK)
+async def bulk_create(request: Request, services: ServicesContainer = Depends(get_services)) -> BulkCreateResponse:
+    """Массово создать пользователей из JSON-массива или NDJSON (Content-Type: application/x-ndjson).
+
+    NDJSON читается потоково и обрабатывается пачками, не дожидаясь конца тела запроса.
+    """
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        chunks = _ndjson_chunks(request)
+    else:
+        chunks = _json_array_chunks(await _read_json_array(request))
+
+    result = await services.user_service.bulk_create_users(chunks)
+    return BulkCreateResponse(
+        created=result.created,
+        failures=[BulkCreateFailure(index=f.index, error=f.error) for f in result.failures],
+    )
+
+
+@router.get("/get_user", response_model=UserRead, response_class=FastJSONResponse, status_code=status.HTTP_200_OK)
+async def get_user(user_id: UUID, request: Request, services: ServicesContainer = Depends(get_services)) -> Response:
+    etag = services.user_service.users_etag()
+    if _etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    user = await services.user_service.get_user(user_id)
+    return FastJSONResponse(user, headers={"ETag": etag})
+
+
+@router.get("/get_users", response_model=UserPage, response_class=FastJSONResponse, status_code=status.HTTP_200_OK)
+async def get_users(
+    request: Request, params: UserListParams = Depends(), services: ServicesContainer = Depends(get_services)
+) -> Response:
+    """Страница пользователей. Ответ с ETag; при совпадении If-None-Match - 304 без запроса к БД.
+
+    Строки уже проверены сервисом, поэтому страница сериализуется сразу, без проверки по response_model.
+    """
+    etag = services.user_service.users_etag()
+    if _etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    page = await services.user_service.get_users(params, params.cursor, params.limit)
+    return FastJSONResponse({"items": page.items, "next_cursor": page.next_cursor}, headers={"ETag": etag})
+
+
+@router.get("/availability", response_model=AvailabilityResponse, status_code=status.HTTP_200_OK)
+async def availability(
+    params: AvailabilityParams = Depends(), services: ServicesContainer = Depends(get_services)
+) -> AvailabilityResponse:
+    """Число свободных и заблокированных пользователей по (project_id, env, domain) без обращения к БД."""
+    summary = services.user_service.get_availability(params)
+    return AvailabilityResponse(
+        buckets=[asdict(bucket) for bucket in summary.buckets], reconciled_at=summary.reconciled_at
+    )
+
+
+@router.get("/availability/stream", response_class=StreamingResponse, status_code=status.HTTP_200_OK)
+async def availability_stream(
+    project_id: list[UUID] | None = Query(default=None), services: ServicesContainer = Depends(get_services)
+) -> StreamingResponse:
+    """Поток изменений доступности (Server-Sent Events) по проектам project_id (без них - по всем).
+
+    Первое событие - полный снимок, дальше - только изменившиеся фильтры, не чаще
+    availability_stream_interval_seconds. Между событиями отправляется keep-alive.
+    """
+    events = services.user_service.stream_availability(project_id)
+    # Первое событие читается до отправки заголовков, чтобы отказ вернулся как 503
+    first = await anext(events)
+
+    async def sse() -> AsyncIterator[bytes]:
+        buckets = first
+        try:
+            while True:
+                if buckets:
+                    yield b"event: availability\ndata: " + orjson.dumps({"buckets": buckets}) + b"\n\n"
+                else:
+                    yield b": keep-alive\n\n"
+                buckets = await anext(events)
+        finally:
+            # Клиент отключился - снимаем подписку сразу, не дожидаясь сборщика мусора
+            await events.aclose()
+
+    return StreamingResponse(
+        sse(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/export", response_class=StreamingResponse, status_code=status.HTTP_200_OK)
+async def export_users(
+    params: UserFilterParams = Depends(), services: ServicesContainer = Depends(get_services)
+) -> StreamingResponse:
+    """Выгрузить пользователей по фильтру в формате NDJSON, не держа всю таблицу в памяти."""
+    users = services.user_service.export_users(params)
+    # Первая строка читается до отправки заголовков: отказ в допуске к БД
+    # вернется клиенту как 503, а не как оборванный поток
+    first = await anext(users, None)
+
+    async def ndjson() -> AsyncIterator[str]:
+        if first is None:
+            return
+        lines = [first.model_dump_json()]
+        async for user in users:
+            lines.append(user.model_dump_json())
+            if len(lines) >= EXPORT_CHUNK_ROWS:
+                yield "\n".join(lines) + "\n"
+                lines.clear()
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 
 @router.post("/acquire_lock", response_model=LockResponse, status_code=status.HTTP_200_OK)
-async def acquire_lock(user_id: UUID, services: ServicesContainer = Depends(get_services)) -> LockResponse:
-    operation = await services.user_service.acquire_lock(user_id)
+async def acquire_lock(
+    user_id: UUID,
+    ttl: int | None = Query(default=None, gt=0),
+    services: ServicesContainer = Depends(get_services),
+) -> LockResponse:
+    operation = await services.user_service.acquire_lock(user_id, ttl)
     if operation.already_locked:
         return LockResponse(message="Данный юзер уже был заблокирован")
-    return LockResponse(message=f"Юзер {user_id} заблокирован", locktime=operation.user.locktime)
+    return LockResponse(
+        message=f"Юзер {user_id} заблокирован",
+        locktime=operation.user.locktime,
+        lease_expires_at=operation.user.lease_expires_at,
+        lease_token=operation.user.lease_token,
+    )
+
+
+@router.post("/lease", response_model=UserLease, status_code=status.HTTP_200_OK)
+async def lease(request: LeaseWaitRequest, services: ServicesContainer = Depends(get_services)) -> UserLease:
+    return await services.user_service.lease_user(request, request.ttl, request.wait)
+
+
+@router.post("/lease_batch", response_model=LeaseBatchResponse, status_code=status.HTTP_200_OK)
+async def lease_batch(
+    request: LeaseBatchRequest, services: ServicesContainer = Depends(get_services)
+) -> LeaseBatchResponse:
+    operations = await services.user_service.lease_users(request, request.count, request.ttl)
+    return LeaseBatchResponse(
+        results=[LockOperation(user=op.user.model_dump(), already_locked=op.already_locked) for op in operations]
+    )
+
+
+@router.post("/renew", response_model=RenewResponse, status_code=status.HTTP_200_OK)
+async def renew(request: RenewRequest, services: ServicesContainer = Depends(get_services)) -> RenewResponse:
+    operation = await services.user_service.renew_leases(
+        [(lease.user_id, lease.lease_token) for lease in request.leases], request.ttl
+    )
+    return RenewResponse(
+        renewed=[
+            RenewedLease(user_id=lease.user_id, lease_expires_at=lease.lease_expires_at)
+            for lease in operation.renewed
+        ],
+        lost=operation.lost,
+    )
 
 
 @router.post("/release_lock", response_model=UnlockResponse, status_code=status.HTTP_200_OK)
@@ -32,4 +208,69 @@ async def release_lock(user_id: UUID, services: ServicesContainer = Depends(get_
     operation = await services.user_service.release_lock(user_id)
     if operation.already_unlocked:
         return UnlockResponse(message="Данный юзер уже был разблокирован", locktime=operation.user.locktime)
-    return UnlockResponse(message=f"Юзер {operation.user.id} разблокирован", locktime=operation.user.locktime)
\ No newline at end of file
+    return UnlockResponse(message=f"Юзер {operation.user.id} разблокирован", locktime=operation.user.locktime)
+
+
+@router.post("/release_batch", response_model=ReleaseBatchResponse, status_code=status.HTTP_200_OK)
+async def release_batch(
+    request: ReleaseBatchRequest, services: ServicesContainer = Depends(get_services)
+) -> ReleaseBatchResponse:
+    operation = await services.user_service.release_users(request.user_ids)
+    return ReleaseBatchResponse(
+        results=[
+            UnlockOperation(user=op.user.model_dump(), already_unlocked=op.already_unlocked)
+            for op in operation.results
+        ],
+        not_found=operation.not_found,
+    )
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Совпадает ли ETag с If-None-Match (слабое сравнение, как требует RFC 9110 для GET)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag.removeprefix("W/") for tag in header.split(","))
+
+
+async def _read_json_array(request: Request) -> list[Any]:
+    try:
+        rows = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid JSON body")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Expected JSON array")
+    return rows
+
+
+async def _json_array_chunks(rows: list[Any]) -> AsyncIterator[list[Any]]:
+    for start in range(0, len(rows), BULK_CREATE_CHUNK_ROWS):
+        yield rows[start:start + BULK_CREATE_CHUNK_ROWS]
+
+
+async def _ndjson_chunks(request: Request) -> AsyncIterator[list[Any]]:
+    chunk: list[Any] = []
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                chunk.append(_parse_ndjson_line(line))
+            if len(chunk) >= BULK_CREATE_CHUNK_ROWS:
+                yield chunk
+                chunk = []
+    if buffer.strip():
+        chunk.append(_parse_ndjson_line(buffer))
+    if chunk:
+        yield chunk
+
+
+def _parse_ndjson_line(line: bytes) -> Any:
+    # Невалидный JSON передаем как есть: строка не пройдет валидацию и попадет в failures
+    try:
+        return json.loads(line)
+    except ValueError:
+        return line.decode(errors="replace")
@@ -1,3 +1,4 @@
-from app.presentation.middleware.logger import LoggingMiddleware
+from app.presentation.middleware.logger import LoggingMiddleware, start_log_listener, stop_log_listener
+from app.presentation.middleware.metrics import MetricsMiddleware
 
-__all__ = ["LoggingMiddleware"]
\ No newline at end of file
+__all__ = ["LoggingMiddleware", "MetricsMiddleware", "start_log_listener", "stop_log_listener"]
@@ -1,97 +1,185 @@
-"""Middleware для логирования HTTP запросов."""
+"""Middleware для логирования HTTP запросов.
+
+Записи не форматируются и не пишутся в event loop: middleware кладет их в очередь,
+а QueueListener в отдельном потоке сериализует JSON и передает записи обработчикам
+корневого логгера.
+"""
+import atexit
 import json
 import logging
+import queue
+import random
 import time
 import uuid
-from typing import Callable
+from logging.handlers import QueueHandler, QueueListener
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_listener: QueueListener | None = None
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware для логирования HTTP запросов и ответов."""
 
-    def __init__(self, app: ASGIApp, log_level: str = None):
-        super().__init__(app)
-        # Используем настройки из конфига, если не передан log_level
-        self.log_level = getattr(logging, (log_level or get_settings().log_level).upper())
+class _JsonPayload:
+    """Данные записи, которые сериализуются в JSON только при форматировании."""
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Генерируем уникальный ID для трейсинга запроса
-        request_id = str(uuid.uuid4())
+    __slots__ = ("data",)
 
-        # Логируем начало запроса
-        start_time = time.time()
+    def __init__(self, data: dict):
+        self.data = data
 
-        # Подготавливаем данные для логирования
-        log_data = {
-            "request_id": request_id,
-            "method": request.method,
-            "url": str(request.url),
-            "client_ip": self._get_client_ip(request),
-            "user_agent": request.headers.get("user-agent", ""),
-            "timestamp": time.time()
-        }
+    def __str__(self) -> str:
+        return json.dumps(self.data, default=str)
 
-        # Логируем входящий запрос
-        logger.info(f"Request started: {json.dumps(log_data, default=str)}")
 
-        try:
-            # Обрабатываем запрос
-            response = await call_next(request)
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler, который не форматирует запись в вызывающем потоке.
+
+    Стандартный prepare() вызывает format() до постановки в очередь, то есть в event loop.
+    Очередь внутрипроцессная, поэтому запись можно передать как есть.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _RootForwardHandler(logging.Handler):
+    """Передает запись обработчикам корневого логгера (как при обычном propagate)."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        logging.getLogger().callHandlers(record)
+
+
+def start_log_listener() -> None:
+    """Запустить поток, обрабатывающий записи логов запросов. Повторный вызов ничего не делает."""
+    global _listener
+    if _listener is not None:
+        return
+
+    if not any(isinstance(handler, _DeferredQueueHandler) for handler in logger.handlers):
+        logger.addHandler(_DeferredQueueHandler(_log_queue))
+        logger.propagate = False
 
-            # Вычисляем время выполнения
-            process_time = time.time() - start_time
+    _listener = QueueListener(_log_queue, _RootForwardHandler())
+    _listener.start()
 
-            # Логируем успешный ответ
-            response_log_data = {
-                "request_id": request_id,
-                "status_code": response.status_code,
-                "process_time": round(process_time, 4),
-                "timestamp": time.time()
-            }
 
-            if response.status_code >= 400:
-                logger.warning(f"Request completed with warning: {json.dumps(response_log_data, default=str)}")
-            else:
-                logger.info(f"Request completed successfully: {json.dumps(response_log_data, default=str)}")
+def stop_log_listener() -> None:
+    """Дописать накопленные записи и остановить поток логирования."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
 
-            # Добавляем request_id в заголовки ответа для трейсинга
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Process-Time"] = str(process_time)
 
-            return response
+atexit.register(stop_log_listener)
 
+
+class LoggingMiddleware:
+    """ASGI middleware для логирования HTTP запросов и ответов.
+
+    На каждый запрос пишется одна запись с итогом. Заголовки X-Request-ID
+    и X-Process-Time добавляются в ответ. Ошибки (4xx/5xx) и медленные запросы
+    логируются всегда, успешные - с вероятностью sample_rate.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        log_level: str = None,
+        sample_rate: float | None = None,
+        slow_threshold: float | None = None,
+    ):
+        self.app = app
+        settings = get_settings()
+        # Используем настройки из конфига, если параметры не переданы
+        self.log_level = getattr(logging, (log_level or settings.log_level).upper())
+        self.sample_rate = settings.access_log_sample_rate if sample_rate is None else sample_rate
+        self.slow_threshold = (
+            settings.access_log_slow_threshold_seconds if slow_threshold is None else slow_threshold
+        )
+        logger.setLevel(self.log_level)
+        start_log_listener()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Генерируем уникальный ID для трейсинга запроса
+        request_id = str(uuid.uuid4())
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Добавляем request_id в заголовки ответа для трейсинга
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Request-ID", request_id)
+                headers.append("X-Process-Time", str(time.perf_counter() - start_time))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            # Логируем ошибку
-            process_time = time.time() - start_time
-            error_log_data = {
-                "request_id": request_id,
-                "error": str(e),
-                "error_type": type(e).__name__,
-                "process_time": round(process_time, 4),
-                "timestamp": time.time()
-            }
-
-            logger.error(f"Request failed: {json.dumps(error_log_data, default=str)}")
+            if logger.isEnabledFor(logging.ERROR):
+                log_data = self._log_data(scope, request_id, status_code, time.perf_counter() - start_time)
+                log_data["error"] = str(e)
+                log_data["error_type"] = type(e).__name__
+                logger.error("Request failed: %s", _JsonPayload(log_data))
             raise
 
-    def _get_client_ip(self, request: Request) -> str:
+        process_time = time.perf_counter() - start_time
+        if status_code >= 400:
+            level, message = logging.WARNING, "Request completed with warning: %s"
+        elif process_time >= self.slow_threshold:
+            level, message = logging.WARNING, "Request completed slowly: %s"
+        else:
+            level, message = logging.INFO, "Request completed: %s"
+
+        # Данные записи собираются, только если запись действительно будет записана
+        if not logger.isEnabledFor(level) or (level == logging.INFO and not self._sampled()):
+            return
+        logger.log(level, message, _JsonPayload(self._log_data(scope, request_id, status_code, process_time)))
+
+    def _sampled(self) -> bool:
+        """Решить, логировать ли успешный запрос."""
+        if self.sample_rate >= 1:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _log_data(self, scope: Scope, request_id: str, status_code: int, process_time: float) -> dict:
+        """Собрать данные записи о запросе."""
+        headers = Headers(scope=scope)
+        query_string = scope.get("query_string", b"").decode("latin-1")
+        return {
+            "request_id": request_id,
+            "method": scope["method"],
+            "url": f"{scope['path']}?{query_string}" if query_string else scope["path"],
+            "client_ip": self._get_client_ip(scope, headers),
+            "user_agent": headers.get("user-agent", ""),
+            "status_code": status_code,
+            "process_time": round(process_time, 4),
+            "timestamp": time.time(),
+        }
+
+    def _get_client_ip(self, scope: Scope, headers: Headers) -> str:
         """Получает реальный IP клиента с учетом прокси."""
         # Проверяем заголовки прокси
-        forwarded_for = request.headers.get("x-forwarded-for")
+        forwarded_for = headers.get("x-forwarded-for")
         if forwarded_for:
             return forwarded_for.split(",")[0].strip()
 
-        real_ip = request.headers.get("x-real-ip")
+        real_ip = headers.get("x-real-ip")
         if real_ip:
             return real_ip
 
-        return request.client.host if request.client else "unknown"
-
+        client = scope.get("client")
+        return client[0] if client else "unknown"
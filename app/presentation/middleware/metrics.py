@@ -0,0 +1,86 @@
+"""Middleware для сбора метрик HTTP запросов."""
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.infrastructure.metrics import registry
+
+REQUESTS_TOTAL = registry.counter(
+    "http_requests_total", "Количество HTTP запросов", ("method", "route", "status")
+)
+REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "Время обработки HTTP запросов", ("method", "route")
+)
+
+# Метка для запросов, не попавших ни в один роут (404, 405 на уровне роутера)
+UNMATCHED_ROUTE = "unmatched"
+
+_STATUS_CLASSES = ("1xx", "1xx", "2xx", "3xx", "4xx", "5xx")
+
+
+class _RouteSeries:
+    """Серии метрик одной пары (метод, шаблон роута)."""
+
+    __slots__ = ("method", "route", "requests", "duration")
+
+    def __init__(self, method: str, route: str):
+        self.method = method
+        self.route = route
+        # Счетчики по классам статусов создаются при первом ответе с этим классом
+        self.requests = [None] * len(_STATUS_CLASSES)
+        self.duration = REQUEST_DURATION.labels(method, route)
+
+    def observe(self, status_code: int, duration: float) -> None:
+        status_class = min(max(status_code // 100, 1), 5)
+        counter = self.requests[status_class]
+        if counter is None:
+            counter = self.requests[status_class] = REQUESTS_TOTAL.labels(
+                self.method, self.route, _STATUS_CLASSES[status_class]
+            )
+        counter.inc()
+        self.duration.observe(duration)
+
+
+class MetricsMiddleware:
+    """ASGI middleware, считающий запросы и время ответа по шаблонам роутов.
+
+    Шаблон берется из scope["route"], который роутер заполняет при сопоставлении,
+    поэтому метки не зависят от значений path-параметров. Серии кэшируются по
+    шаблону и методу: на запрос приходится два поиска в словаре и два инкремента.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._series: dict[str, dict[str, _RouteSeries]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._get_series(scope).observe(status_code, time.perf_counter() - start_time)
+
+    def _get_series(self, scope: Scope) -> _RouteSeries:
+        route = scope.get("route")
+        path = getattr(route, "path", None) or UNMATCHED_ROUTE
+        method = scope["method"]
+
+        by_method = self._series.get(path)
+        if by_method is None:
+            by_method = self._series[path] = {}
+        series = by_method.get(method)
+        if series is None:
+            series = by_method[method] = _RouteSeries(method, path)
+        return series
@@ -0,0 +1,25 @@
+"""Быстрая сериализация ответов."""
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def _default(obj: Any) -> Any:
+    # Схемы ответов без алиасов и своих сериализаторов: поля модели совпадают с JSON-представлением
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class FastJSONResponse(ORJSONResponse):
+    """JSON-ответ через orjson, принимающий модели pydantic без model_dump.
+
+    Эндпоинт, вернувший такой ответ, минует проверку по response_model: модели
+    сериализуются один раз, без повторной валидации. Подходит только для данных,
+    которые уже прошли проверку (строки из БД).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default)
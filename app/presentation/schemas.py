@@ -38,15 +38,147 @@ class UserRead(BaseModel):
     env: Env
     domain: Domain
     locktime: int
+    lease_expires_at: int | None = None
+
+
+class UserLease(UserRead):
+    """Схема арендованного пользователя с токеном аренды."""
+    lease_token: UUID | None = None
+
+
+class BulkCreateFailure(BaseModel):
+    """Схема ошибки создания одной строки при массовом импорте."""
+    index: int
+    error: str
+
+
+class BulkCreateResponse(BaseModel):
+    """Схема ответа массового импорта пользователей."""
+    created: list[UUID]
+    failures: list[BulkCreateFailure]
+
+
+class UserFilterParams(BaseModel):
+    """Схема параметров фильтрации пользователей."""
+    project_id: UUID | None = None
+    env: Env | None = None
+    domain: Domain | None = None
+    locked: bool | None = None
+
+
+class UserListParams(UserFilterParams):
+    """Схема параметров запроса списка пользователей."""
+    cursor: str | None = None
+    limit: int = Field(default=100, gt=0, le=1000)
+
+
+class UserPage(BaseModel):
+    """Схема страницы пользователей."""
+    items: list[UserRead]
+    next_cursor: str | None = None
+
+
+class LeaseRequest(BaseModel):
+    """Схема запроса на захват любого свободного пользователя."""
+    project_id: UUID | None = None
+    env: Env | None = None
+    domain: Domain | None = None
+    ttl: int | None = Field(default=None, gt=0)
+
+
+class LeaseWaitRequest(LeaseRequest):
+    """Схема запроса на захват с ожиданием освобождения пользователя."""
+    wait: float | None = Field(default=None, gt=0, le=60)  # сколько секунд ждать, если свободных нет
+
+
+class LeaseBatchRequest(LeaseRequest):
+    """Схема запроса на захват пачки свободных пользователей."""
+    count: int = Field(gt=0, le=1000)
+
+
+class ReleaseBatchRequest(BaseModel):
+    """Схема запроса на разблокировку пачки пользователей."""
+    user_ids: list[UUID] = Field(min_length=1, max_length=1000)
+
+
+class LeaseRef(BaseModel):
+    """Схема ссылки на аренду пользователя."""
+    user_id: UUID
+    lease_token: UUID
+
+
+class RenewRequest(BaseModel):
+    """Схема запроса на продление аренд."""
+    leases: list[LeaseRef] = Field(min_length=1, max_length=1000)
+    ttl: int | None = Field(default=None, gt=0)
+
+
+class RenewedLease(BaseModel):
+    """Схема продленной аренды."""
+    user_id: UUID
+    lease_expires_at: int | None
+
+
+class RenewResponse(BaseModel):
+    """Схема ответа для продления аренд."""
+    renewed: list[RenewedLease]
+    lost: list[UUID]
+
+
+class LockOperation(BaseModel):
+    """Схема результата блокировки одного пользователя."""
+    user: UserLease
+    already_locked: bool
+
+
+class UnlockOperation(BaseModel):
+    """Схема результата разблокировки одного пользователя."""
+    user: UserRead
+    already_unlocked: bool
+
+
+class LeaseBatchResponse(BaseModel):
+    """Схема ответа для пакетного захвата пользователей."""
+    results: list[LockOperation]
+
+
+class ReleaseBatchResponse(BaseModel):
+    """Схема ответа для пакетной разблокировки пользователей."""
+    results: list[UnlockOperation]
+    not_found: list[UUID]
 
 
 class LockResponse(BaseModel):
     """Схема ответа для блокировки пользователя."""
     message: str
     locktime: int | None = None
+    lease_expires_at: int | None = None
+    lease_token: UUID | None = None
 
 
 class UnlockResponse(BaseModel):
     """Схема ответа для разблокировки пользователя."""
     message: str
     locktime: int
+
+
+class AvailabilityParams(BaseModel):
+    """Схема параметров запроса сводки доступности."""
+    project_id: UUID | None = None
+    env: Env | None = None
+    domain: Domain | None = None
+
+
+class AvailabilityBucket(BaseModel):
+    """Схема числа свободных и заблокированных пользователей одного фильтра."""
+    project_id: UUID
+    env: Env
+    domain: Domain
+    free: int
+    locked: int
+
+
+class AvailabilityResponse(BaseModel):
+    """Схема сводки доступности пользователей."""
+    buckets: list[AvailabilityBucket]
+    reconciled_at: float  # время последней сверки с БД, unix timestamp
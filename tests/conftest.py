@@ -1,4 +1,5 @@
 """Общие фикстуры для тестов."""
+import os
 from datetime import datetime
 from typing import AsyncGenerator
 from uuid import uuid4
@@ -51,6 +52,68 @@ async def mock_db_helper() -> AsyncGenerator[AsyncDatabaseHelper, None]:
     await helper.close()
 
 
+@pytest.fixture
+async def users_table(mock_db_helper) -> AsyncDatabaseHelper:
+    """Хелпер in-memory SQLite с созданной таблицей пользователей."""
+    from app.infrastructure.db.schemas import User as UserORM
+
+    async with mock_db_helper.engine.begin() as conn:
+        await conn.run_sync(UserORM.metadata.create_all)
+    return mock_db_helper
+
+
+@pytest.fixture
+def repository(users_table) -> UserRepository:
+    """UserRepository над in-memory SQLite с таблицей пользователей."""
+    return UserRepository(users_table)
+
+
+@pytest.fixture
+def create_users(test_user_data: dict):
+    """Создать count свободных пользователей по test_user_data с новыми id; возвращает их строки."""
+    async def create(repository: UserRepository, count: int = 1, **overrides) -> list[dict]:
+        return [
+            await repository.create_user(
+                {**test_user_data, "id": uuid4(), "locktime": 0, "created_at": datetime.now(), **overrides}
+            )
+            for _ in range(count)
+        ]
+
+    return create
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+async def dialect_db_helper(request) -> AsyncGenerator[AsyncDatabaseHelper, None]:
+    """Хелпер БД для бенчмарков и проверки планов запросов на разных диалектах.
+
+    SQLite прогоняется всегда, Postgres - только если задан TEST_POSTGRES_URL.
+    Таблицы создаются заново и удаляются после теста.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from app.infrastructure.db.schemas import User as UserORM
+
+    if request.param == "sqlite":
+        helper = AsyncDatabaseHelper("sqlite+aiosqlite:///:memory:")
+        helper.engine = create_async_engine(helper.database_url, echo=False)
+        helper.async_session_factory = async_sessionmaker(helper.engine, expire_on_commit=False)
+    else:
+        database_url = os.environ.get("TEST_POSTGRES_URL")
+        if not database_url:
+            pytest.skip("TEST_POSTGRES_URL не задан")
+        helper = AsyncDatabaseHelper(database_url)
+        await helper.connect()
+
+    async with helper.engine.begin() as conn:
+        await conn.run_sync(UserORM.metadata.drop_all)
+        await conn.run_sync(UserORM.metadata.create_all)
+
+    yield helper
+
+    async with helper.engine.begin() as conn:
+        await conn.run_sync(UserORM.metadata.drop_all)
+    await helper.close()
+
+
 @pytest.fixture
 def mock_user_repository(mock_db_helper) -> UserRepository:
     """Мок для UserRepository."""
@@ -133,6 +196,41 @@ def client(mock_services_container: ServicesContainer) -> TestClient:
             delattr(app.state, "infra")
 
 
+@pytest.fixture
+def db_client(test_settings: Settings) -> TestClient:
+    """Тестовый клиент FastAPI с общей in-memory SQLite.
+
+    Lifespan не запускается: фоновые задачи и подключение к Postgres не нужны.
+    """
+    import asyncio
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.infrastructure.db.schemas import User as UserORM
+
+    infra = InfrastructureContainer(test_settings)
+    helper = infra.db_helper
+    # Одно соединение на все запросы, иначе у каждого своя пустая in-memory БД
+    helper.database_url = "sqlite+aiosqlite://"
+    helper.engine = create_async_engine(helper.database_url, poolclass=StaticPool)
+    helper.async_session_factory = async_sessionmaker(helper.engine, expire_on_commit=False)
+
+    async def create_tables():
+        async with helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+    asyncio.run(create_tables())
+
+    original_state = getattr(app.state, "service_container", None)
+    original_infra = getattr(app.state, "infra", None)
+    app.state.infra = infra
+    app.state.service_container = ServicesContainer(settings=test_settings, infra=infra)
+    try:
+        yield TestClient(app)
+    finally:
+        app.state.service_container = original_state
+        app.state.infra = original_infra
+
+
 @pytest.fixture
 async def db_session(mock_db_helper: AsyncDatabaseHelper) -> AsyncGenerator[AsyncSession, None]:
     """Сессия БД для тестов."""
@@ -0,0 +1,138 @@
+"""Тесты для контроля допуска к БД."""
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from app.infrastructure.db.admission import AdmissionRejectedError, ConcurrencyLimiter
+from app.infrastructure.db.repository.user import UserRepository
+
+
+def _limiter(limit=1, max_queue=1, queue_timeout=1.0) -> ConcurrencyLimiter:
+    return ConcurrencyLimiter("test", limit=limit, max_queue=max_queue, queue_timeout=queue_timeout, retry_after=2)
+
+
+class TestConcurrencyLimiter:
+    """Тесты для ConcurrencyLimiter."""
+
+    @pytest.mark.asyncio
+    async def test_queue_full_rejected_immediately(self):
+        """Тест, что при заполненной очереди запрос сразу получает отказ."""
+        limiter = _limiter(limit=1, max_queue=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.acquire():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+
+        assert (limiter.active, limiter.queued) == (1, 1)
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            async with limiter.acquire():
+                pass
+        assert exc_info.value.retry_after == 2
+        assert exc_info.value.reason == "queue full"
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+        assert (limiter.active, limiter.queued) == (0, 0)
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self):
+        """Тест, что ожидание в очереди ограничено queue_timeout."""
+        limiter = _limiter(limit=1, max_queue=5, queue_timeout=0.01)
+
+        async with limiter.acquire():
+            with pytest.raises(AdmissionRejectedError) as exc_info:
+                async with limiter.acquire():
+                    pass
+
+        assert exc_info.value.reason == "queue timeout"
+        assert (limiter.active, limiter.queued) == (0, 0)
+
+    @pytest.mark.asyncio
+    async def test_fifo_handoff(self):
+        """Тест, что освободившийся слот достается ожидающим по порядку."""
+        limiter = _limiter(limit=1, max_queue=5)
+        order = []
+
+        async def worker(name):
+            async with limiter.acquire():
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*(worker(i) for i in range(4)))
+
+        assert order == [0, 1, 2, 3]
+        assert limiter.active == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_frees_queue(self):
+        """Тест, что отмененный ожидающий не занимает место в очереди и слот."""
+        limiter = _limiter(limit=1, max_queue=1)
+
+        async with limiter.acquire():
+            waiter = asyncio.create_task(limiter.acquire().__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            assert limiter.queued == 0
+
+        assert limiter.active == 0
+
+
+class TestAdmissionIntegration:
+    """Тесты контроля допуска на уровне сессий и HTTP."""
+
+    @pytest.mark.asyncio
+    async def test_session_group_limited(self, mock_db_helper):
+        """Тест, что сессия группы занимает слот лимитера, а без группы - нет."""
+        limiter = _limiter(limit=1, max_queue=0)
+        mock_db_helper.limiters = {"lease": limiter}
+
+        async with mock_db_helper.transaction("lease"):
+            assert limiter.active == 1
+            with pytest.raises(AdmissionRejectedError):
+                async with mock_db_helper.session_only("lease"):
+                    pass
+            async with mock_db_helper.session_only():
+                pass
+
+        assert limiter.active == 0
+
+    @pytest.mark.asyncio
+    async def test_stalled_export_keeps_list_slots(self, users_table, test_user_data):
+        """Тест, что недочитанная выгрузка держит слот выгрузки, а не слот чтения списков."""
+        repository = UserRepository(users_table)
+        await repository.create_user({**test_user_data, "locktime": 0, "created_at": datetime.now()})
+        list_limiter = _limiter(limit=1, max_queue=0)
+        export_limiter = _limiter(limit=1, max_queue=0)
+        users_table.limiters = {"list": list_limiter, "export": export_limiter}
+
+        export = repository.iter_users()
+        await anext(export)
+        try:
+            assert export_limiter.active == 1
+            assert len(await repository.list_users()) == 1
+            with pytest.raises(AdmissionRejectedError):
+                await anext(repository.iter_users())
+        finally:
+            await export.aclose()
+
+        assert (list_limiter.active, export_limiter.active) == (0, 0)
+
+    @pytest.mark.asyncio
+    async def test_rejection_maps_to_503(self):
+        """Тест, что отказ в допуске отдается как 503 с Retry-After."""
+        from app.main import admission_rejected_handler
+
+        response = await admission_rejected_handler(None, AdmissionRejectedError("lease", "queue full", 3))
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "3"
+        assert "retry" in json.loads(response.body)["detail"]
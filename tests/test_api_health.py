@@ -68,3 +68,14 @@ class TestHealthAPI:
             if original_infra is not None:
                 client.app.state.infra = original_infra
 
+
+    def test_pool_status(self, client):
+        """Тест эндпоинта состояния пула соединений."""
+        response = client.get("/health/pool")
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["pool_size"] == client.app.state.infra.db_helper.pool_size
+        assert data["checked_out"] == 0
+        assert data["saturated"] is False
+        assert "connect" in data["events"]
@@ -1,4 +1,5 @@
 """Тесты для API endpoints пользователей."""
+import json
 from uuid import uuid4
 
 import pytest
@@ -21,3 +22,113 @@ class TestUserAPI:
         response = client.post("/user/create_user", json=invalid_data)
         assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
+
+    def test_get_users_not_modified(self, client):
+        """Тест, что при совпадении If-None-Match возвращается 304 без обращения к БД."""
+        from unittest.mock import patch
+
+        services = client.app.state.service_container
+        etag = services.user_service.users_etag()
+        with patch.object(services._infra.db_helper, "session_only") as session_only:
+            response = client.get("/user/get_users", headers={"If-None-Match": f'"other", {etag}'})
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers["etag"] == etag
+        session_only.assert_not_called()
+
+    def test_availability_not_ready(self, client):
+        """Тест, что до первой сверки с БД сводка и поток доступности отвечают 503."""
+        assert client.get("/user/availability").status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert client.get("/user/availability/stream").status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    def test_lease_token_only_in_lease_responses(self, db_client):
+        """Тест, что токен аренды возвращается только в ответе на аренду, а не в чтениях."""
+        project_id = str(uuid4())
+        created = db_client.post("/user/create_user", json={
+            "login": "lease@example.com",
+            "password": "test",
+            "project_id": project_id,
+            "env": "prod",
+            "domain": "regular"
+        })
+        user_id = created.json()["id"]
+        assert "lease_token" not in created.json()
+
+        leased = db_client.post("/user/lease", json={"project_id": project_id})
+        assert leased.json()["lease_token"]
+
+        listed = db_client.get("/user/get_users", params={"project_id": project_id})
+        got = db_client.get("/user/get_user", params={"user_id": user_id})
+        exported = db_client.get("/user/export", params={"project_id": project_id})
+
+        assert listed.json()["items"][0]["locktime"] != 0
+        assert "lease_token" not in listed.json()["items"][0]
+        assert "lease_token" not in got.json()
+        assert exported.text and "lease_token" not in exported.text
+
+    @pytest.mark.filterwarnings("error::UserWarning")
+    def test_export_and_batches_serialize_without_warnings(self, db_client):
+        """Тест, что строки из БД сериализуются без предупреждений pydantic о типах enum."""
+        project_id = str(uuid4())
+        for i in range(2):
+            db_client.post("/user/create_user", json={
+                "login": f"export{i}@example.com",
+                "password": "test",
+                "project_id": project_id,
+                "env": "stage",
+                "domain": "canary"
+            })
+
+        exported = db_client.get("/user/export", params={"project_id": project_id})
+        leased = db_client.post("/user/lease_batch", json={"project_id": project_id, "count": 2})
+        released = db_client.post(
+            "/user/release_batch", json={"user_ids": [op["user"]["id"] for op in leased.json()["results"]]}
+        )
+
+        assert [json.loads(line)["env"] for line in exported.text.splitlines()] == ["stage", "stage"]
+        assert [op["user"]["domain"] for op in leased.json()["results"]] == ["canary", "canary"]
+        assert released.status_code == status.HTTP_200_OK
+
+    def test_bulk_create_ndjson(self, db_client):
+        """Тест NDJSON-импорта: пустые строки пропускаются, невалидный JSON попадает в failures."""
+        rows = [_ndjson_row(f"ndjson{i}@example.com") for i in range(2)]
+        body = rows[0] + b"\n\n{not json\n   \n" + rows[1]
+
+        response = db_client.post(
+            "/user/bulk_create", content=body, headers={"Content-Type": "application/x-ndjson"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()["created"]) == 2
+        assert [failure["index"] for failure in response.json()["failures"]] == [1]
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_ndjson_lines_split_across_chunks(self, db_client):
+        """Тест, что строки, разрезанные между чанками тела запроса, собираются целиком."""
+        import httpx
+
+        body = b"\n".join(_ndjson_row(f"chunk{i}@example.com") for i in range(3)) + b"\n"
+
+        async def chunks():
+            for start in range(0, len(body), 7):
+                yield body[start:start + 7]
+
+        transport = httpx.ASGITransport(app=db_client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/user/bulk_create", content=chunks(), headers={"Content-Type": "application/x-ndjson"}
+            )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()["created"]) == 3
+        assert response.json()["failures"] == []
+
+
+def _ndjson_row(login: str) -> bytes:
+    return json.dumps({
+        "login": login,
+        "password": "test",
+        "project_id": str(uuid4()),
+        "env": "prod",
+        "domain": "regular"
+    }).encode()
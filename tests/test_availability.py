@@ -0,0 +1,185 @@
+"""Тесты для счетчиков доступности пользователей."""
+import asyncio
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from app.application.models import UserCreate, UserFilter
+from app.application.services.availability import AvailabilityTracker
+from app.application.services.availability_feed import AvailabilityFeed
+from app.application.services.user import UserService
+from app.infrastructure.db.notifications import PostgresReleaseNotifier, ReleaseNotifier
+from app.infrastructure.db.repository.user import UserRepository
+
+
+@pytest.fixture
+def repository(users_table) -> UserRepository:
+    return UserRepository(users_table, release_notifier=ReleaseNotifier())
+
+
+def _counts(tracker: AvailabilityTracker, **filters) -> dict:
+    return {(b.project_id, b.env, b.domain): (b.free, b.locked) for b in tracker.snapshot(**filters)}
+
+
+class TestAvailabilityTracker:
+    """Тесты для AvailabilityTracker."""
+
+    @pytest.mark.asyncio
+    async def test_reconcile_and_snapshot(self, repository, create_users, test_user_data):
+        """Тест сверки с БД и фильтрации сводки."""
+        project_id = test_user_data["project_id"]
+        await create_users(repository, 2, env="prod")
+        await create_users(repository, env="stage")
+        await repository.lease_user(project_id=project_id, env="prod")
+
+        tracker = AvailabilityTracker(repository, reconcile_interval=60)
+        await tracker.reconcile()
+
+        assert _counts(tracker) == {
+            (project_id, "prod", "regular"): (1, 1),
+            (project_id, "stage", "regular"): (1, 0),
+        }
+        assert _counts(tracker, env="stage") == {(project_id, "stage", "regular"): (1, 0)}
+        assert _counts(tracker, project_id=uuid4()) == {}
+
+    @pytest.mark.asyncio
+    async def test_changes_during_reconcile_are_kept(self, repository, test_user_data):
+        """Тест, что изменения, пришедшие во время сверки, применяются поверх ее результата."""
+        tracker = AvailabilityTracker(repository, reconcile_interval=60)
+        key = (test_user_data["project_id"], "prod", "regular")
+        started = asyncio.Event()
+        count_by_bucket = repository.count_by_bucket
+
+        async def slow_count():
+            rows = await count_by_bucket()
+            started.set()
+            await asyncio.sleep(0)
+            return rows
+
+        repository.count_by_bucket = slow_count
+        reconcile = asyncio.create_task(tracker.reconcile())
+        await started.wait()
+        tracker.on_created([{**test_user_data, "env": "prod", "domain": "regular"}])
+        await reconcile
+
+        assert _counts(tracker) == {key: (1, 0)}
+
+        tracker.on_released({key: 2})
+        tracker.on_locked([test_user_data] * 3)
+        assert _counts(tracker) == {key: (0, 1)}
+
+    @pytest.mark.asyncio
+    async def test_local_changes_reach_other_workers(self, repository, mock_db_helper, test_user_data):
+        """Тест, что свои создания и блокировки копятся и применяются трекером другого воркера."""
+        sender = PostgresReleaseNotifier(mock_db_helper)
+        receiver = PostgresReleaseNotifier(mock_db_helper)
+        local = AvailabilityTracker(repository, reconcile_interval=60, notifier=sender)
+        remote = AvailabilityTracker(repository, reconcile_interval=60, notifier=receiver)
+        key = (test_user_data["project_id"], "prod", "regular")
+        published = []
+
+        async def publish_deltas(deltas):
+            published.append(deltas)
+            for payload in sender._encode_deltas(deltas):
+                receiver._on_notification(None, 0, "user_availability", payload)
+
+        sender.publish_deltas = publish_deltas
+        local.on_created([test_user_data] * 3)
+        local.on_locked([test_user_data])
+        local.on_released({key: 1})
+        await local.publish()
+        await local.publish()
+
+        assert published == [{key: (2, 1)}]
+        assert _counts(remote) == {key: (2, 1)}
+        assert _counts(local) == {key: (3, 0)}
+
+
+class TestAvailabilityFeed:
+    """Тесты для AvailabilityFeed."""
+
+    @pytest.mark.asyncio
+    async def test_coalesces_changes_per_subscriber(self, repository, test_user_data):
+        """Тест, что изменения между рассылками схлопываются и доходят только подписчикам проекта."""
+        tracker = AvailabilityTracker(repository, reconcile_interval=60)
+        feed = AvailabilityFeed(tracker, interval=60, queue_size=10, max_subscribers=2, keepalive=60)
+        other = {**test_user_data, "project_id": uuid4()}
+        tracker.on_created([test_user_data, other])
+
+        mine = feed.subscribe([test_user_data["project_id"]])
+        everything = feed.subscribe()
+        assert feed.subscribe() is None
+
+        events = feed.events(mine)
+        assert [b.free for b in await anext(events)] == [1]
+
+        tracker.on_created([test_user_data])
+        tracker.on_locked([test_user_data])
+        tracker.on_created([other])
+        feed.flush()
+
+        assert [(b.free, b.locked) for b in await anext(events)] == [(1, 1)]
+        assert len(everything.queue) == 1 and len(everything.queue[0]) == 2
+
+        feed.unsubscribe(everything)
+        assert feed.subscribe() is not None
+
+    @pytest.mark.asyncio
+    async def test_slow_subscriber_gets_snapshot(self, repository, test_user_data):
+        """Тест, что переполненная очередь вытесняет старые события, а отставший подписчик получает снимок."""
+        tracker = AvailabilityTracker(repository, reconcile_interval=60)
+        feed = AvailabilityFeed(tracker, interval=60, queue_size=2, max_subscribers=10, keepalive=0.01)
+        subscription = feed.subscribe()
+        events = feed.events(subscription)
+        assert await anext(events) == []
+
+        for _ in range(5):
+            tracker.on_created([test_user_data])
+            feed.flush()
+
+        assert len(subscription.queue) == 2
+        assert [b.free for b in await anext(events)] == [5]
+        # Очередь пуста - по таймауту приходит keep-alive
+        assert await anext(events) == []
+
+
+class TestUserServiceAvailability:
+    """Тесты для UserService.get_availability."""
+
+    @pytest.mark.asyncio
+    async def test_service_updates_counters(self, repository, test_user_data):
+        """Тест, что создание, аренда и освобождение через сервис меняют сводку без сверки."""
+        tracker = AvailabilityTracker(repository, reconcile_interval=60)
+        repository._release_notifier.subscribe(tracker.on_released)
+        service = UserService(repository, availability=tracker)
+        project_id = test_user_data["project_id"]
+        key = (project_id, "prod", "regular")
+
+        with pytest.raises(HTTPException) as exc_info:
+            service.get_availability()
+        assert exc_info.value.status_code == 503
+
+        await tracker.reconcile()
+        created = UserCreate(**{k: test_user_data[k] for k in ("login", "password", "project_id", "env", "domain")})
+        await service.create_user(created)
+        await service.create_user(created.model_copy(update={"id": uuid4()}))
+        leased = await service.lease_user(UserFilter(project_id=project_id))
+
+        summary = service.get_availability(UserFilter(project_id=project_id))
+        assert [(b.free, b.locked) for b in summary.buckets] == [(1, 1)]
+
+        await service.release_lock(leased.id)
+        assert _counts(tracker) == {key: (2, 0)}
+
+    @pytest.mark.asyncio
+    async def test_stream_without_tracker_not_ready(self, repository):
+        """Тест, что поток без трекера доступности отвечает 503, а не падает."""
+        tracker = AvailabilityTracker(repository, reconcile_interval=60)
+        feed = AvailabilityFeed(tracker, interval=60, queue_size=10, max_subscribers=10, keepalive=60)
+        service = UserService(repository, availability_feed=feed)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await anext(service.stream_availability())
+        assert exc_info.value.status_code == 503
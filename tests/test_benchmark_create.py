@@ -0,0 +1,92 @@
+"""Бенчмарк create_user: ORM add + flush + refresh против INSERT ... RETURNING.
+
+Запуск с выводом результатов: pytest tests/test_benchmark_create.py -s
+Для Postgres нужно задать TEST_POSTGRES_URL.
+"""
+import time
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event
+
+from app.application.models import Env, Domain
+from app.infrastructure.db.repository.user import UserRepository
+from app.infrastructure.db.schemas import User as UserORM
+
+USERS_COUNT = 200
+
+
+def _to_dict(user: UserORM) -> dict:
+    """Маппер UserORM в словарь, как в прежней реализации."""
+    return {
+        "id": user.id,
+        "created_at": user.created_at,
+        "login": user.login,
+        "password": user.password,
+        "project_id": user.project_id,
+        "env": user.env,
+        "domain": user.domain,
+        "locktime": user.locktime,
+    }
+
+
+class LegacyUserRepository(UserRepository):
+    """Прежняя реализация создания: ORM-объект, flush и refresh."""
+
+    async def create_user(self, user_data: dict) -> dict:
+        async with self._db_helper.transaction() as session:
+            user = UserORM(**user_data)
+            session.add(user)
+            await session.flush()
+            await session.refresh(user)
+            return _to_dict(user)
+
+
+def _user_data(project_id) -> dict:
+    return {
+        "id": uuid4(),
+        "created_at": datetime.now(),
+        "login": "bench@example.com",
+        "password": "password",
+        "project_id": project_id,
+        "env": Env.prod,
+        "domain": Domain.regular,
+        "locktime": 0,
+    }
+
+
+class TestCreateBenchmark:
+    """Сравнение пропускной способности и числа запросов на одно создание."""
+
+    @pytest.mark.asyncio
+    async def test_create_throughput(self, dialect_db_helper):
+        """INSERT ... RETURNING делает один запрос на создание вместо двух."""
+        statements = []
+        event.listen(
+            dialect_db_helper.engine.sync_engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+        dialect = dialect_db_helper.engine.dialect.name
+        project_id = uuid4()
+
+        results = {}
+        for name, repository in (
+            ("legacy", LegacyUserRepository(dialect_db_helper)),
+            ("returning", UserRepository(dialect_db_helper)),
+        ):
+            payloads = [_user_data(project_id) for _ in range(USERS_COUNT)]
+            statements.clear()
+            started = time.perf_counter()
+            for user_data in payloads:
+                created = await repository.create_user(user_data)
+                assert created["id"] == user_data["id"]
+            elapsed = time.perf_counter() - started
+            results[name] = (USERS_COUNT / elapsed, len(statements) / USERS_COUNT)
+
+        for name, (throughput, per_op) in results.items():
+            print(f"[{dialect}] {name:>9} create: {throughput:8.0f} users/s, {per_op:.1f} statements/op")
+
+        assert results["legacy"][1] == 2
+        assert results["returning"][1] == 1
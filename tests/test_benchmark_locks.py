@@ -0,0 +1,146 @@
+"""Бенчмарк acquire_lock/release_lock: SELECT FOR UPDATE + ORM против UPDATE ... RETURNING.
+
+Запуск с выводом результатов: pytest tests/test_benchmark_locks.py -s
+Для Postgres нужно задать TEST_POSTGRES_URL.
+"""
+import time
+from datetime import datetime
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import event, select
+
+from app.application.models import Env, Domain
+from app.infrastructure.db.repository.user import UserNotFoundError, UserRepository
+from app.infrastructure.db.schemas import User as UserORM
+
+USERS_COUNT = 200
+
+
+def _to_dict(user: UserORM) -> dict:
+    """Маппер UserORM в словарь, как в прежней реализации."""
+    return {
+        "id": user.id,
+        "created_at": user.created_at,
+        "login": user.login,
+        "password": user.password,
+        "project_id": user.project_id,
+        "env": user.env,
+        "domain": user.domain,
+        "locktime": user.locktime,
+    }
+
+
+class LegacyUserRepository(UserRepository):
+    """Прежняя реализация блокировок: SELECT ... FOR UPDATE, мутация ORM-объекта и flush."""
+
+    async def acquire_lock(self, user_id: UUID) -> tuple[dict, bool]:
+        async with self._db_helper.transaction() as session:
+            stmt = select(UserORM).where(UserORM.id == user_id).with_for_update()
+            user = (await session.execute(stmt)).scalar_one_or_none()
+            if not user:
+                raise UserNotFoundError()
+
+            already_locked = user.locktime != 0
+            if not already_locked:
+                user.locktime = self._now()
+                session.add(user)
+
+            return _to_dict(user), already_locked
+
+    async def release_lock(self, user_id: UUID) -> tuple[dict, bool]:
+        async with self._db_helper.transaction() as session:
+            stmt = select(UserORM).where(UserORM.id == user_id).with_for_update()
+            user = (await session.execute(stmt)).scalar_one_or_none()
+            if not user:
+                raise UserNotFoundError()
+
+            already_unlocked = user.locktime == 0
+            if not already_unlocked:
+                user.locktime = 0
+                session.add(user)
+
+            return _to_dict(user), already_unlocked
+
+
+async def _create_users(db_helper, count: int) -> list[UUID]:
+    """Создать count свободных пользователей."""
+    ids = [uuid4() for _ in range(count)]
+    async with db_helper.transaction() as session:
+        session.add_all(
+            UserORM(
+                id=user_id,
+                created_at=datetime.now(),
+                login=f"bench{i}@example.com",
+                password="password",
+                project_id=uuid4(),
+                env=Env.prod,
+                domain=Domain.regular,
+                locktime=0,
+            )
+            for i, user_id in enumerate(ids)
+        )
+    return ids
+
+
+async def _run(operation, ids: list[UUID], statements: list) -> tuple[float, float]:
+    """Выполнить операцию для каждого id; вернуть (мкс на операцию, запросов на операцию)."""
+    statements.clear()
+    started = time.perf_counter()
+    for user_id in ids:
+        await operation(user_id)
+    elapsed = time.perf_counter() - started
+    return elapsed / len(ids) * 1_000_000, len(statements) / len(ids)
+
+
+class TestLockBenchmark:
+    """Сравнение задержки и числа запросов на одну операцию блокировки."""
+
+    @pytest.mark.asyncio
+    async def test_lock_roundtrips(self, dialect_db_helper):
+        """UPDATE ... RETURNING делает один запрос на успешную операцию вместо двух."""
+        ids = await _create_users(dialect_db_helper, USERS_COUNT)
+
+        statements = []
+        event.listen(
+            dialect_db_helper.engine.sync_engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+
+        legacy = LegacyUserRepository(dialect_db_helper)
+        current = UserRepository(dialect_db_helper)
+        dialect = dialect_db_helper.engine.dialect.name
+
+        results = {}
+        for name, repository in (("legacy", legacy), ("returning", current)):
+            results[name, "acquire"] = await _run(repository.acquire_lock, ids, statements)
+            results[name, "release"] = await _run(repository.release_lock, ids, statements)
+
+        for (name, operation), (latency, per_op) in results.items():
+            print(f"[{dialect}] {name:>9} {operation}: {latency:8.1f} us/op, {per_op:.1f} statements/op")
+
+        assert results["legacy", "acquire"][1] == 2
+        assert results["legacy", "release"][1] == 2
+        assert results["returning", "acquire"][1] == 1
+        assert results["returning", "release"][1] == 1
+
+    @pytest.mark.asyncio
+    async def test_conflict_fallback_read(self, dialect_db_helper):
+        """Повторная блокировка занятого пользователя делает ровно одно дополнительное чтение."""
+        ids = await _create_users(dialect_db_helper, 1)
+        repository = UserRepository(dialect_db_helper)
+        await repository.acquire_lock(ids[0])
+
+        statements = []
+        event.listen(
+            dialect_db_helper.engine.sync_engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+
+        user, already_locked = await repository.acquire_lock(ids[0])
+
+        assert already_locked is True
+        assert user["locktime"] != 0
+        assert len(statements) == 2
@@ -0,0 +1,79 @@
+"""Бенчмарк сериализации списка пользователей: прежний путь с двойной валидацией против быстрого.
+
+Запуск с выводом результатов: pytest tests/test_benchmark_serialization.py -s
+"""
+import json
+import time
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.application.models import Domain, Env, UserRead
+from app.application.services.user import UserService
+from app.presentation.responses import FastJSONResponse
+from app.presentation.schemas import UserPage
+
+# Прежний путь медленный, его стоимость на строку измеряется на выборке
+LEGACY_SAMPLE_ROWS = 1000
+
+_page_adapter = TypeAdapter(UserPage)
+
+
+def _rows(count: int) -> list[dict]:
+    project_id = uuid4()
+    return [
+        {
+            "id": uuid4(),
+            "created_at": datetime.now(),
+            "login": f"user{i}@example.com",
+            "password": "password",
+            "project_id": project_id,
+            "env": Env.prod,
+            "domain": Domain.regular,
+            "locktime": 0,
+            "lease_expires_at": None,
+            "lease_token": None,
+        }
+        for i in range(count)
+    ]
+
+
+def _legacy(rows: list[dict]) -> bytes:
+    """Прежний путь: валидация в сервисе, сборка схемы ответа и проверка по response_model, stdlib json."""
+    items = [UserRead.model_validate(row) for row in rows]
+    page = UserPage(items=[user.model_dump() for user in items], next_cursor=None)
+    content = _page_adapter.dump_python(_page_adapter.validate_python(page.model_dump()), mode="json")
+    return JSONResponse(content).body
+
+
+def _fast(rows: list[dict]) -> bytes:
+    """Быстрый путь: модели из доверенных строк и одна сериализация orjson."""
+    items = [UserService._user_to_read(row) for row in rows]
+    return FastJSONResponse({"items": items, "next_cursor": None}).body
+
+
+def _per_row_us(serialize, rows: list[dict]) -> float:
+    started = time.perf_counter()
+    serialize(rows)
+    return (time.perf_counter() - started) / len(rows) * 1e6
+
+
+class TestSerializationBenchmark:
+    """Стоимость сериализации одной строки списка."""
+
+    @pytest.mark.parametrize("rows_count", [10_000, 100_000])
+    def test_list_serialization(self, rows_count):
+        """Быстрый путь дает тот же JSON и дешевле прежнего на строку."""
+        rows = _rows(rows_count)
+        sample = rows[:LEGACY_SAMPLE_ROWS]
+
+        assert json.loads(_fast(sample[:100])) == json.loads(_legacy(sample[:100]))
+
+        legacy = _per_row_us(_legacy, sample)
+        fast = _per_row_us(_fast, rows)
+        print(f"{rows_count:>7} rows: legacy {legacy:7.2f} us/row, fast {fast:7.2f} us/row ({legacy / fast:.1f}x)")
+
+        assert fast < legacy
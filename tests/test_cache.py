@@ -0,0 +1,217 @@
+"""Тесты для кэша чтений пользователей."""
+import asyncio
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from app.application.services.user import UserService
+from app.infrastructure.cache import MISSING, InMemoryCache
+from app.infrastructure.db.notifications import PostgresReleaseNotifier
+from app.infrastructure.db.repository.cached_user import CachedUserRepository
+
+
+@pytest.fixture
+async def cache() -> InMemoryCache:
+    return InMemoryCache("test", max_entries=100, ttl=60)
+
+
+@pytest.fixture
+def repository(users_table, cache) -> CachedUserRepository:
+    return CachedUserRepository(users_table, cache)
+
+
+async def _lock(repository: CachedUserRepository, user: dict, ttl: int | None = None) -> dict:
+    results, _ = await repository.acquire_locks([user["id"]], ttl=ttl)
+    return results[0][0]
+
+
+async def _reserve(repository: CachedUserRepository, user: dict) -> dict:
+    return (await repository.reserve_users(1, "worker-1", project_id=user["project_id"]))[0]
+
+
+def _confirm(repository: CachedUserRepository, user: dict):
+    lease = {**user, "locktime": user["locktime"] + 1, "lease_expires_at": None}
+    return repository.confirm_reserved("worker-1", [lease])
+
+
+# Операция -> (подготовка состояния пользователя, изменение)
+_MUTATIONS = {
+    "lease_user": (None, lambda r, u: r.lease_user(project_id=u["project_id"])),
+    "lease_users": (None, lambda r, u: r.lease_users(1, project_id=u["project_id"])),
+    "acquire_lock": (None, lambda r, u: r.acquire_lock(u["id"])),
+    "acquire_locks": (None, lambda r, u: r.acquire_locks([u["id"]])),
+    "reserve_users": (None, _reserve),
+    "confirm_reserved": (_reserve, _confirm),
+    "renew_leases": (_lock, lambda r, u: r.renew_leases([(u["id"], u["lease_token"])], ttl=30)),
+    "release_lock": (_lock, lambda r, u: r.release_lock(u["id"])),
+    "release_users": (_lock, lambda r, u: r.release_users([u["id"]])),
+    "release_reserved": (_reserve, lambda r, u: r.release_reserved("worker-1")),
+    "reclaim_expired": (lambda r, u: _lock(r, u, ttl=-1), lambda r, u: r.reclaim_expired(10)),
+}
+
+
+class TestInMemoryCache:
+    """Тесты для InMemoryCache."""
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        """Тест, что при переполнении вытесняется давно не использованная запись."""
+        cache = InMemoryCache("test", max_entries=2, ttl=60)
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        await cache.get("a")
+        await cache.set("c", 3)
+
+        assert await cache.get("b") is MISSING
+        assert await cache.get("a") == 1
+        assert await cache.get("c") == 3
+        assert len(cache) == 2
+
+    @pytest.mark.asyncio
+    async def test_ttl_expiry(self):
+        """Тест, что запись старше TTL считается промахом."""
+        cache = InMemoryCache("test", max_entries=10, ttl=5)
+        with patch("app.infrastructure.cache.time.monotonic", return_value=100.0):
+            await cache.set("a", None)
+            assert await cache.get("a") is None
+        with patch("app.infrastructure.cache.time.monotonic", return_value=105.0):
+            assert await cache.get("a") is MISSING
+        assert len(cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_invalidate_by_tag(self, cache):
+        """Тест, что инвалидация удаляет только записи с указанными тегами."""
+        await cache.set("a", 1, tags=("x",))
+        await cache.set("b", 2, tags=("x", "y"))
+        await cache.set("c", 3, tags=("z",))
+
+        await cache.invalidate(["x"])
+
+        assert await cache.get("a") is MISSING
+        assert await cache.get("b") is MISSING
+        assert await cache.get("c") == 3
+
+    @pytest.mark.asyncio
+    async def test_stale_fill_is_skipped(self, cache):
+        """Тест, что значение, прочитанное до инвалидации или очистки, не попадает в кэш."""
+        since = await cache.version()
+        await cache.invalidate(["x"])
+        await cache.set("a", 1, tags=("x",), since=since)
+        await cache.set("b", 2, tags=("y",), since=since)
+
+        assert await cache.get("a") is MISSING
+        assert await cache.get("b") == 2
+
+        since = await cache.version()
+        await cache.clear()
+        await cache.set("c", 3, tags=("y",), since=since)
+
+        assert await cache.get("b") is MISSING
+        assert await cache.get("c") is MISSING
+
+
+class TestCachedUserRepository:
+    """Тесты для CachedUserRepository."""
+
+    @pytest.mark.asyncio
+    async def test_reads_are_cached(self, repository, create_users, mock_db_helper, test_user_data):
+        """Тест, что повторное чтение не обращается к БД."""
+        (user,) = await create_users(repository)
+        project_id = test_user_data["project_id"]
+
+        assert (await repository.get_user(user["id"]))["id"] == user["id"]
+        assert len(await repository.list_users(project_id=project_id)) == 1
+
+        with patch.object(mock_db_helper, "session_only") as session_only:
+            assert (await repository.get_user(user["id"]))["id"] == user["id"]
+            assert len(await repository.list_users(project_id=project_id)) == 1
+        session_only.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_mutations_invalidate_affected_entries(self, repository, create_users, cache, test_user_data):
+        """Тест, что изменения сбрасывают затронутые записи и не трогают чужие фильтры."""
+        project_id = test_user_data["project_id"]
+        other_project_id = uuid4()
+        (user,) = await create_users(repository)
+        await create_users(repository, project_id=other_project_id)
+
+        assert [u["locktime"] for u in await repository.list_users(project_id=project_id)] == [0]
+        await repository.list_users(project_id=other_project_id)
+        assert (await repository.get_user(user["id"]))["locktime"] == 0
+        assert len(cache) == 3
+
+        await repository.acquire_lock(user["id"])
+
+        assert len(cache) == 1
+        assert (await repository.get_user(user["id"]))["locktime"] != 0
+        assert [u["locktime"] != 0 for u in await repository.list_users(locked=True)] == [True]
+
+        await repository.release_lock(user["id"])
+
+        assert (await repository.get_user(user["id"]))["locktime"] == 0
+        assert await repository.list_users(locked=True) == []
+
+        await create_users(repository)
+
+        assert len(await repository.list_users(project_id=project_id)) == 2
+        assert len(await repository.list_users()) == 3
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("operation", list(_MUTATIONS))
+    async def test_mutator_invalidates_user_and_filters(self, repository, create_users, cache, operation):
+        """Тест, что каждая операция записи сбрасывает пользователя и страницы его фильтров, но не чужие."""
+        prepare, mutate = _MUTATIONS[operation]
+        (user,) = await create_users(repository)
+        (other,) = await create_users(repository, project_id=uuid4())
+        if prepare is not None:
+            user = await prepare(repository, user)
+
+        for cached in (user, other):
+            await repository.get_user(cached["id"])
+            await repository.list_users(project_id=cached["project_id"])
+        await repository.list_users(locked=True)
+        assert len(cache) == 5
+
+        await mutate(repository, user)
+
+        assert len(cache) == 2
+        assert await cache.get(f"user:{other['id']}") is not MISSING
+        assert await cache.get(f"user:{user['id']}") is MISSING
+
+    @pytest.mark.asyncio
+    async def test_release_in_other_worker_invalidates_filter(self, users_table, create_users, cache):
+        """Тест, что освобождение в другом воркере сбрасывает страницы и пользователей его фильтра."""
+        notifier = PostgresReleaseNotifier(users_table)
+        repository = CachedUserRepository(users_table, cache, release_notifier=notifier)
+        (user,) = await create_users(repository, locktime=1)
+        (other,) = await create_users(repository, project_id=uuid4())
+        for cached in (user, other):
+            await repository.get_user(cached["id"])
+            await repository.list_users(project_id=cached["project_id"])
+
+        elsewhere = PostgresReleaseNotifier(users_table)
+        for payload in elsewhere._encode({(user["project_id"], "prod", "regular"): 1}):
+            notifier._on_notification(None, 0, "user_released", payload)
+        await asyncio.sleep(0)
+
+        assert len(cache) == 2
+        assert (await repository.get_user(other["id"]))["id"] == other["id"]
+        assert await cache.get(f"user:{user['id']}") is MISSING
+
+
+class TestUserServiceGetUser:
+    """Тесты для UserService.get_user."""
+
+    @pytest.mark.asyncio
+    async def test_get_user(self, repository, create_users):
+        """Тест чтения пользователя по id и 404 для несуществующего."""
+        service = UserService(repository)
+        (user,) = await create_users(repository)
+
+        assert (await service.get_user(user["id"])).id == user["id"]
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.get_user(uuid4())
+        assert exc_info.value.status_code == 404
@@ -34,6 +34,54 @@ class TestInfrastructureContainer:
         assert result is not None
         assert container._async_db_helper is not None
 
+    def test_db_helper_pool_settings(self, test_settings):
+        """Тест, что параметры пула берутся из настроек."""
+        test_settings.db_pool_size = 4
+        test_settings.db_max_overflow = 20
+        test_settings.db_pool_timeout_seconds = 1.5
+        container = InfrastructureContainer(test_settings)
+
+        helper = container.db_helper
+
+        assert (helper.pool_size, helper.max_overflow, helper.pool_timeout) == (4, 20, 1.5)
+
+    def test_release_notifier_by_dialect(self, test_settings):
+        """Тест выбора рассылки событий освобождения по URL базы."""
+        from app.infrastructure.db.notifications import PostgresReleaseNotifier, ReleaseNotifier
+        assert isinstance(InfrastructureContainer(test_settings).release_notifier, PostgresReleaseNotifier)
+
+        test_settings.database_url = "sqlite+aiosqlite:///:memory:"
+        notifier = InfrastructureContainer(test_settings).release_notifier
+
+        assert type(notifier) is ReleaseNotifier
+
+    def test_db_helper_admission_limits(self, test_settings):
+        """Тест, что лимитеры создаются только для групп с ненулевым лимитом."""
+        test_settings.admission_lease_limit = 4
+        test_settings.admission_list_limit = 0
+        container = InfrastructureContainer(test_settings)
+
+        limiters = container.db_helper.limiters
+
+        assert limiters["lease"].limit == 4
+        assert "list" not in limiters
+        assert limiters["create"].queue_timeout == test_settings.admission_queue_timeout_seconds
+
+    def test_admission_limits_fit_pool(self, test_settings):
+        """Тест, что сумма лимитов допуска больше пула соединений отклоняется."""
+        test_settings.db_pool_size = 5
+        test_settings.db_max_overflow = 5
+        test_settings.admission_lease_limit = 6
+        test_settings.admission_list_limit = 0
+        test_settings.admission_create_limit = 3
+        test_settings.admission_export_limit = 1
+
+        assert InfrastructureContainer(test_settings).db_helper.limiters["lease"].limit == 6
+
+        test_settings.admission_export_limit = 2
+        with pytest.raises(ValueError):
+            InfrastructureContainer(test_settings).db_helper
+
     def test_user_repository_property(self, test_settings, mock_db_helper):
         """Тест свойства user_repository."""
         container = InfrastructureContainer(test_settings)
@@ -54,6 +102,19 @@ class TestInfrastructureContainer:
         # Должен быть тот же объект (singleton)
         assert repo1 is repo2
 
+    def test_user_repository_cache(self, test_settings, mock_db_helper):
+        """Тест, что при включенном кэше репозиторий кэширует чтения."""
+        from app.infrastructure.db.repository.cached_user import CachedUserRepository
+
+        assert not isinstance(InfrastructureContainer(test_settings).user_repository, CachedUserRepository)
+
+        test_settings.user_cache_enabled = True
+        container = InfrastructureContainer(test_settings)
+        container._async_db_helper = mock_db_helper
+
+        assert isinstance(container.user_repository, CachedUserRepository)
+        assert container.user_repository._cache is container.user_cache
+
 
 class TestServicesContainer:
     """Тесты для ServicesContainer."""
@@ -84,3 +145,23 @@ class TestServicesContainer:
         # Должен быть тот же объект (singleton)
         assert service1 is service2
 
+
+    def test_user_service_lease_coalescer(self, test_settings, mock_infra_container):
+        """Тест, что коалесцер аренд создается только при заданном окне."""
+        from app.application.services.lease_coalescer import LeaseCoalescer
+        assert not isinstance(ServicesContainer(test_settings, mock_infra_container).user_service._leases, LeaseCoalescer)
+
+        test_settings.lease_coalesce_window_ms = 2
+        service = ServicesContainer(test_settings, mock_infra_container).user_service
+
+        assert isinstance(service._leases, LeaseCoalescer)
+
+    def test_lease_reaper_lazy_init(self, test_settings, mock_infra_container):
+        """Тест ленивой инициализации lease_reaper."""
+        container = ServicesContainer(test_settings, mock_infra_container)
+
+        reaper1 = container.lease_reaper
+        reaper2 = container.lease_reaper
+
+        assert reaper1 is reaper2
+        assert reaper1._batch_size == test_settings.lease_reaper_batch_size
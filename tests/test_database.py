@@ -62,3 +62,36 @@ class TestAsyncDatabaseHelper:
         assert mock_db_helper.engine is None
         assert mock_db_helper.async_session_factory is None
 
+
+    @pytest.mark.asyncio
+    async def test_pool_monitor(self, tmp_path):
+        """Тест настроек пула и счетчиков, собираемых по событиям пула."""
+        from sqlalchemy import text
+        from app.infrastructure.db.pool import POOL_CHECKOUT_WAIT, POOL_CONNECTIONS
+
+        helper = AsyncDatabaseHelper(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", pool_size=2, max_overflow=1)
+        await helper.connect()
+        waits_before = sum(POOL_CHECKOUT_WAIT.labels().counts)
+        checkouts_before = POOL_CONNECTIONS.labels("checkout").value
+        try:
+            assert helper.engine.sync_engine.pool.size() == 2
+
+            async with helper.transaction() as session:
+                snapshot = helper.pool_monitor.snapshot()
+                assert snapshot["checked_out"] == 1
+                assert snapshot["saturated"] is False
+                await session.execute(text("SELECT 1"))
+            async with helper.session_only():
+                pass
+
+            snapshot = helper.pool_monitor.snapshot()
+            assert snapshot["checked_out"] == 0
+            assert snapshot["checked_in"] == 1
+            assert snapshot["events"]["connect"] == 1
+            assert snapshot["events"]["checkout"] == 2
+            assert POOL_CONNECTIONS.labels("checkout").value == checkouts_before + 2
+            assert sum(POOL_CHECKOUT_WAIT.labels().counts) == waits_before + 2
+        finally:
+            await helper.close()
+
+        assert helper.pool_monitor.snapshot()["checked_out"] == 0
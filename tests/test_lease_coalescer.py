@@ -0,0 +1,86 @@
+"""Тесты для объединения запросов аренды."""
+import asyncio
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import pytest
+
+from app.application.services.lease_coalescer import LeaseCoalescer
+from app.infrastructure.db.repository.user import UserNotFoundError
+
+
+class TestLeaseCoalescer:
+    """Тесты для LeaseCoalescer."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_leases_share_one_statement(self, repository, create_users, test_user_data):
+        """Тест, что одновременные аренды по одному фильтру выполняются одним запросом."""
+        await create_users(repository, 3)
+        coalescer = LeaseCoalescer(repository, window=0.01, max_batch=100)
+        project_id = test_user_data["project_id"]
+
+        with patch.object(repository, "lease_users", wraps=repository.lease_users) as lease_users:
+            results = await asyncio.gather(*(coalescer.lease_user(project_id=project_id) for _ in range(5)))
+
+        lease_users.assert_awaited_once()
+        assert lease_users.call_args.args == (5,)
+        leased = [user for user in results if user is not None]
+        assert len(leased) == 3
+        assert len({user["id"] for user in leased}) == 3
+        assert results[3:] == [None, None]
+
+    @pytest.mark.asyncio
+    async def test_max_batch_flushes_without_window(self, repository, create_users, test_user_data):
+        """Тест, что полная пачка уходит в БД, не дожидаясь окна."""
+        await create_users(repository, 2)
+        coalescer = LeaseCoalescer(repository, window=60, max_batch=2)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(coalescer.lease_user(), coalescer.lease_user()), timeout=5
+        )
+
+        assert all(user is not None for user in results)
+
+    @pytest.mark.asyncio
+    async def test_acquire_lock_contract(self, repository, create_users):
+        """Тест, что блокировка по id сохраняет контракт репозитория."""
+        user_id = (await create_users(repository))[0]["id"]
+        coalescer = LeaseCoalescer(repository, window=0.01, max_batch=100)
+
+        with patch.object(repository, "acquire_locks", wraps=repository.acquire_locks) as acquire_locks:
+            first, second, missing = await asyncio.gather(
+                coalescer.acquire_lock(user_id),
+                coalescer.acquire_lock(user_id),
+                coalescer.acquire_lock(uuid4()),
+                return_exceptions=True,
+            )
+
+        acquire_locks.assert_awaited_once()
+        assert first[1] is False and first[0]["locktime"] != 0
+        assert second[1] is True
+        assert isinstance(missing, UserNotFoundError)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_request_lease_released(self, repository, create_users):
+        """Тест, что аренда, взятая для отмененного запроса, возвращается."""
+        user_id = (await create_users(repository))[0]["id"]
+        coalescer = LeaseCoalescer(repository, window=0.01, max_batch=100)
+
+        request = asyncio.create_task(coalescer.lease_user())
+        await asyncio.sleep(0)
+        request.cancel()
+        await asyncio.gather(*coalescer._tasks)
+
+        user, already_locked = await repository.acquire_lock(user_id)
+        assert already_locked is False
+
+    @pytest.mark.asyncio
+    async def test_error_propagated_to_all_waiters(self):
+        """Тест, что ошибка запроса пачки получают все ожидающие."""
+        user_repo = AsyncMock()
+        user_repo.lease_users = AsyncMock(side_effect=RuntimeError("db down"))
+        coalescer = LeaseCoalescer(user_repo, window=0.001, max_batch=100)
+
+        results = await asyncio.gather(coalescer.lease_user(), coalescer.lease_user(), return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
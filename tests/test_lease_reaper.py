@@ -0,0 +1,50 @@
+"""Тесты для фоновой очистки истекших аренд."""
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from pydantic import ValidationError
+
+from app.application.services.lease_reaper import LeaseReaper
+from app.config import Settings
+
+
+class TestLeaseReaper:
+    """Тесты для LeaseReaper."""
+
+    @pytest.mark.asyncio
+    async def test_reap_until_partial_batch(self, mock_user_repository):
+        """Тест, что очистка идет пачками, пока пачка заполнена целиком."""
+        mock_user_repository.reclaim_expired = AsyncMock(side_effect=[[{}, {}], [{}, {}], [{}]])
+        reaper = LeaseReaper(mock_user_repository, interval=60, batch_size=2)
+
+        result = await reaper.reap()
+
+        assert result == 5
+        assert mock_user_repository.reclaim_expired.call_count == 3
+        mock_user_repository.reclaim_expired.assert_called_with(2)
+
+    @pytest.mark.asyncio
+    async def test_start_runs_periodically(self, mock_user_repository):
+        """Тест, что запущенная задача вызывает очистку и переживает ошибки."""
+        mock_user_repository.reclaim_expired = AsyncMock(side_effect=[RuntimeError("db down")] + [[]] * 100)
+        reaper = LeaseReaper(mock_user_repository, interval=0.01, batch_size=10)
+
+        reaper.start()
+        await asyncio.sleep(0.05)
+        await reaper.stop()
+
+        assert mock_user_repository.reclaim_expired.call_count >= 2
+        assert reaper._task is None
+
+    @pytest.mark.asyncio
+    async def test_stop_without_start(self, mock_user_repository):
+        """Тест, что остановка незапущенной задачи безопасна."""
+        reaper = LeaseReaper(mock_user_repository, interval=60, batch_size=10)
+        await reaper.stop()
+
+    @pytest.mark.parametrize("setting", ["lease_reaper_interval_seconds", "lease_reaper_batch_size"])
+    def test_settings_must_be_positive(self, setting):
+        """Тест, что нулевой интервал или размер пачки очистки отклоняется при загрузке настроек."""
+        with pytest.raises(ValidationError):
+            Settings(**{setting: 0})
@@ -0,0 +1,169 @@
+"""Тесты для ожидания освобождения пользователей."""
+import asyncio
+import json
+from datetime import datetime
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from app.application.models import UserFilter
+from app.application.services.lease_waiters import LeaseWaiters, wait_key
+from app.application.services.user import UserService
+from app.infrastructure.db.notifications import PostgresReleaseNotifier, ReleaseNotifier, release_keys
+from app.infrastructure.db.repository.user import UserRepository
+from app.infrastructure.db.schemas import Domain, Env
+
+
+class TestLeaseWaiters:
+    """Тесты для LeaseWaiters."""
+
+    @pytest.mark.asyncio
+    async def test_wakes_oldest_matching_waiters(self):
+        """Тест, что освобождение будит самых ранних подходящих ожидающих, не больше count."""
+        waiters = LeaseWaiters(max_waiters=10)
+        project_id = uuid4()
+        any_key = wait_key(None)
+        project_key = wait_key(project_id, Env.prod)
+        other_key = wait_key(uuid4())
+
+        first = waiters.register(project_key)
+        other = waiters.register(other_key)
+        second = waiters.register(any_key)
+        third = waiters.register(project_key)
+
+        waiters.on_released({(project_id, "prod", "regular"): 2})
+
+        assert first[1].done() and second[1].done()
+        assert not third[1].done() and not other[1].done()
+
+    @pytest.mark.asyncio
+    async def test_limit_and_requeue_keeps_position(self):
+        """Тест лимита ожидающих и сохранения места в очереди после неудачной попытки."""
+        waiters = LeaseWaiters(max_waiters=2)
+        key = wait_key(None)
+        first = waiters.register(key)
+        second = waiters.register(key)
+
+        assert waiters.register(key) is None
+
+        waiters.on_released({(uuid4(), "prod", "regular"): 1})
+        first = waiters.requeue(key, first)
+        waiters.on_released({(uuid4(), "prod", "regular"): 1})
+
+        assert first[1].done()
+        assert not second[1].done()
+        waiters.discard(key, second)
+        assert waiters.register(key) is not None
+
+
+class TestReleaseNotifier:
+    """Тесты для рассылки событий освобождения."""
+
+    @pytest.mark.asyncio
+    async def test_local_dispatch(self):
+        """Тест, что события группируются по ключу фильтра и доставляются подписчикам."""
+        notifier = ReleaseNotifier()
+        received = []
+        notifier.subscribe(received.append)
+        project_id = uuid4()
+        users = [{"project_id": project_id, "env": Env.prod, "domain": Domain.regular}] * 2
+
+        await notifier.publish(users)
+        await notifier.publish([])
+
+        assert received == [{(project_id, "prod", "regular"): 2}]
+
+    def test_postgres_payload_roundtrip(self, mock_db_helper):
+        """Тест, что NOTIFY другого воркера разбирается, а собственный игнорируется."""
+        sender = PostgresReleaseNotifier(mock_db_helper)
+        receiver = PostgresReleaseNotifier(mock_db_helper)
+        received = []
+        sender.subscribe(received.append)
+        receiver.subscribe(received.append)
+        released = {(uuid4(), "prod", "regular"): i + 1 for i in range(100)}
+
+        payloads = sender._encode(released)
+        for payload in payloads:
+            assert len(payload.encode()) < 8000
+            sender._on_notification(None, 0, "user_released", payload)
+            receiver._on_notification(None, 0, "user_released", payload)
+        receiver._on_notification(None, 0, "user_released", "not json")
+
+        assert len(payloads) == 2
+        assert {key: count for chunk in received for key, count in chunk.items()} == released
+        assert json.loads(payloads[0])["origin"] == sender.origin
+
+    @pytest.mark.asyncio
+    async def test_postgres_notify_in_releasing_transaction(self, users_table, test_user_data):
+        """Тест, что NOTIFY об освобождении идет в освобождающей транзакции, а не в отдельной."""
+        notifier = PostgresReleaseNotifier(users_table)
+        repository = UserRepository(users_table, release_notifier=notifier)
+        received = []
+        notifier.subscribe(received.append)
+        await repository.create_user({**test_user_data, "locktime": 1, "created_at": datetime.now()})
+
+        sessions = []
+
+        async def send(session, channel, payloads):
+            sessions.append((session.in_transaction(), channel, len(payloads)))
+
+        with patch.object(notifier, "_send", side_effect=send), \
+                patch.object(users_table, "transaction", wraps=users_table.transaction) as transaction:
+            await repository.release_lock(test_user_data["id"])
+
+        assert transaction.call_count == 1
+        assert sessions == [(True, "user_released", 1)]
+        assert received == [{(test_user_data["project_id"], "prod", "regular"): 1}]
+
+    def test_release_keys(self):
+        """Тест подсчета освобожденных по ключам."""
+        project_id = uuid4()
+        users = [
+            {"project_id": project_id, "env": "prod", "domain": "regular"},
+            {"project_id": project_id, "env": Env.prod, "domain": Domain.canary},
+        ]
+
+        assert release_keys(users) == {(project_id, "prod", "regular"): 1, (project_id, "prod", "canary"): 1}
+
+
+class TestLeaseWait:
+    """Тесты аренды с ожиданием через сервис и репозиторий."""
+
+    @pytest.fixture
+    async def service(self, users_table):
+        notifier = ReleaseNotifier()
+        waiters = LeaseWaiters(max_waiters=10)
+        notifier.subscribe(waiters.on_released)
+        repository = UserRepository(users_table, release_notifier=notifier)
+        return UserService(repository, lease_waiters=waiters), repository
+
+    @pytest.mark.asyncio
+    async def test_waiter_woken_by_release(self, service, test_user_data):
+        """Тест, что ожидающий запрос получает пользователя, освобожденного другим клиентом."""
+        service, repository = service
+        user_id = test_user_data["id"]
+        await repository.create_user({**test_user_data, "locktime": 1234567890, "created_at": datetime.now()})
+        user_filter = UserFilter(project_id=test_user_data["project_id"])
+
+        waiting = asyncio.create_task(service.lease_user(user_filter, wait=5))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+
+        await repository.release_lock(user_id)
+        user = await asyncio.wait_for(waiting, timeout=1)
+
+        assert user.id == user_id
+        assert user.locktime != 0
+
+    @pytest.mark.asyncio
+    async def test_wait_timeout(self, service):
+        """Тест, что по истечении wait возвращается 409."""
+        service, _ = service
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.lease_user(UserFilter(), wait=0.05)
+
+        assert exc_info.value.status_code == 409
+        assert service._waiters._size == 0
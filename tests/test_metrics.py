@@ -0,0 +1,119 @@
+"""Тесты для метрик приложения."""
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.infrastructure.metrics import MetricsRegistry
+from app.presentation.middleware import MetricsMiddleware
+from app.presentation.middleware.metrics import REQUEST_DURATION, REQUESTS_TOTAL
+
+
+class TestMetricsRegistry:
+    """Тесты для MetricsRegistry."""
+
+    def test_counter_render(self):
+        """Тест рендера счетчика с метками и экранированием значений."""
+        registry = MetricsRegistry()
+        counter = registry.counter("jobs_total", "Jobs", ("queue",))
+        counter.labels("default").inc()
+        counter.labels("default").inc(2)
+        counter.labels('a"b').inc()
+
+        lines = registry.render().splitlines()
+
+        assert lines[:2] == ["# HELP jobs_total Jobs", "# TYPE jobs_total counter"]
+        assert 'jobs_total{queue="default"} 3.0' in lines
+        assert 'jobs_total{queue="a\\"b"} 1.0' in lines
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Тест, что корзины гистограммы кумулятивны и граница включается в корзину."""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+
+        lines = registry.render().splitlines()
+
+        assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+        assert 'latency_seconds_bucket{le="1.0"} 3' in lines
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+        assert "latency_seconds_sum 3.65" in lines
+        assert "latency_seconds_count 4" in lines
+
+    def test_gauge_function(self):
+        """Тест, что gauge с функцией вычисляется в момент рендера."""
+        registry = MetricsRegistry()
+        values = [1]
+        registry.gauge("pool_size", "Pool size").set_function(lambda: values[0])
+        values[0] = 7
+
+        assert "pool_size 7.0" in registry.render().splitlines()
+
+    def test_register_is_idempotent(self):
+        """Тест, что повторная регистрация возвращает ту же метрику, а смена типа запрещена."""
+        registry = MetricsRegistry()
+        counter = registry.counter("events_total", "Events")
+
+        assert registry.counter("events_total", "Events") is counter
+        with pytest.raises(ValueError):
+            registry.gauge("events_total", "Events")
+
+    def test_labels_count_checked(self):
+        """Тест, что число значений меток проверяется."""
+        counter = MetricsRegistry().counter("events_total", "Events", ("kind",))
+
+        with pytest.raises(ValueError):
+            counter.labels("a", "b")
+
+
+class TestMetricsMiddleware:
+    """Тесты для MetricsMiddleware."""
+
+    @pytest.fixture
+    def client(self) -> TestClient:
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/metrics-test/items/{item_id}")
+        async def item(item_id: int):
+            if item_id == 0:
+                raise HTTPException(status_code=404)
+            return {"id": item_id}
+
+        return TestClient(app)
+
+    def test_requests_labeled_by_route_template(self, client):
+        """Тест, что запросы считаются по шаблону роута и классу статуса."""
+        route = "/metrics-test/items/{item_id}"
+        ok = REQUESTS_TOTAL.labels("GET", route, "2xx").value
+        not_found = REQUESTS_TOTAL.labels("GET", route, "4xx").value
+        observed = REQUEST_DURATION.labels("GET", route).counts[:]
+
+        client.get("/metrics-test/items/1")
+        client.get("/metrics-test/items/2")
+        client.get("/metrics-test/items/0")
+
+        assert REQUESTS_TOTAL.labels("GET", route, "2xx").value == ok + 2
+        assert REQUESTS_TOTAL.labels("GET", route, "4xx").value == not_found + 1
+        assert sum(REQUEST_DURATION.labels("GET", route).counts) == sum(observed) + 3
+
+    def test_unmatched_route(self, client):
+        """Тест, что запросы мимо роутов не создают серий на каждый путь."""
+        before = REQUESTS_TOTAL.labels("GET", "unmatched", "4xx").value
+
+        client.get("/metrics-test/nope/1")
+        client.get("/metrics-test/nope/2")
+
+        assert REQUESTS_TOTAL.labels("GET", "unmatched", "4xx").value == before + 2
+
+
+def test_metrics_endpoint(client):
+    """Тест эндпоинта /metrics."""
+    client.get("/health/liveness")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_requests_total{method="GET",route="/health/liveness",status="2xx"}' in response.text
+    assert "# TYPE user_leases_acquired_total counter" in response.text
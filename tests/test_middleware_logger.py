@@ -0,0 +1,141 @@
+"""Тесты для middleware логирования."""
+import json
+import logging
+import time
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.presentation.middleware import LoggingMiddleware, start_log_listener, stop_log_listener
+
+
+class _CaptureHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def captured_records():
+    """Записи логов запросов, дошедшие до корневого логгера через очередь."""
+    handler = _CaptureHandler()
+    root = logging.getLogger()
+    root.addHandler(handler)
+    start_log_listener()
+    try:
+        yield handler.records
+    finally:
+        root.removeHandler(handler)
+
+
+def _make_client(**middleware_kwargs) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(LoggingMiddleware, **{"log_level": "INFO", **middleware_kwargs})
+
+    @app.get("/ok")
+    async def ok():
+        return {"status": "ok"}
+
+    @app.get("/missing")
+    async def missing():
+        raise HTTPException(status_code=404)
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    @app.get("/slow")
+    async def slow():
+        time.sleep(0.02)
+        return {"status": "slow"}
+
+    return TestClient(app, raise_server_exceptions=False)
+
+
+@pytest.fixture
+def logged_client() -> TestClient:
+    """Клиент для минимального приложения с LoggingMiddleware."""
+    return _make_client(sample_rate=1.0, slow_threshold=10.0)
+
+
+def _payload(record: logging.LogRecord) -> dict:
+    return json.loads(str(record.args[0]))
+
+
+class TestLoggingMiddleware:
+    """Тесты для LoggingMiddleware."""
+
+    def test_headers_and_single_record(self, logged_client, captured_records):
+        """Тест заголовков трейсинга и одной записи на запрос."""
+        response = logged_client.get("/ok?x=1", headers={"x-forwarded-for": "10.0.0.1, 10.0.0.2"})
+        stop_log_listener()
+
+        assert response.status_code == 200
+        assert response.headers["X-Request-ID"]
+        assert float(response.headers["X-Process-Time"]) >= 0
+
+        assert len(captured_records) == 1
+        record = captured_records[0]
+        assert record.levelno == logging.INFO
+        data = _payload(record)
+        assert data["request_id"] == response.headers["X-Request-ID"]
+        assert data["url"] == "/ok?x=1"
+        assert data["client_ip"] == "10.0.0.1"
+        assert data["status_code"] == 200
+
+    def test_error_status_logged_as_warning(self, logged_client, captured_records):
+        """Тест, что ответы 4xx логируются с уровнем WARNING."""
+        response = logged_client.get("/missing", headers={"x-real-ip": "10.0.0.3"})
+        stop_log_listener()
+
+        assert response.status_code == 404
+        assert captured_records[0].levelno == logging.WARNING
+        assert _payload(captured_records[0])["client_ip"] == "10.0.0.3"
+
+    def test_exception_logged_as_error(self, logged_client, captured_records):
+        """Тест, что необработанное исключение логируется с уровнем ERROR."""
+        response = logged_client.get("/boom")
+        stop_log_listener()
+
+        assert response.status_code == 500
+        errors = [record for record in captured_records if record.levelno == logging.ERROR]
+        assert _payload(errors[0])["error_type"] == "RuntimeError"
+
+    def test_record_formatted_off_loop(self, logged_client, captured_records):
+        """Тест, что сообщение не форматируется до попадания в очередь."""
+        logged_client.get("/ok")
+        stop_log_listener()
+
+        record = captured_records[0]
+        assert record.msg == "Request completed: %s"
+        assert not isinstance(record.args[0], str)
+
+    def test_success_sampling(self, captured_records):
+        """Тест, что успешные запросы сэмплируются, а ошибки и медленные - нет."""
+        client = _make_client(sample_rate=0.0, slow_threshold=0.01)
+
+        client.get("/ok")
+        client.get("/missing")
+        client.get("/slow")
+        stop_log_listener()
+
+        messages = [record.msg for record in captured_records]
+        assert messages == ["Request completed with warning: %s", "Request completed slowly: %s"]
+        assert all(record.levelno == logging.WARNING for record in captured_records)
+
+    def test_disabled_level_skips_log_data(self, captured_records):
+        """Тест, что при выключенном уровне данные записи не собираются."""
+        from unittest.mock import patch
+        client = _make_client(log_level="ERROR", sample_rate=1.0, slow_threshold=10.0)
+
+        with patch.object(LoggingMiddleware, "_log_data") as log_data:
+            client.get("/ok")
+            client.get("/missing")
+        stop_log_listener()
+
+        log_data.assert_not_called()
+        assert captured_records == []
@@ -0,0 +1,123 @@
+"""Проверка, что горячие запросы репозитория идут по индексам (EXPLAIN).
+
+На SQLite используется EXPLAIN QUERY PLAN. На Postgres (TEST_POSTGRES_URL) - EXPLAIN
+с выключенным seqscan: на маленькой тестовой таблице планировщик иначе выбрал бы
+последовательное чтение, а проверяется именно применимость индекса.
+"""
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event
+
+from app.application.models import Env, Domain
+from app.infrastructure.db.repository.user import UserRepository
+
+
+async def _capture_statements(db_helper, operation) -> list[tuple[str, tuple]]:
+    """Выполнить операцию и вернуть SQL и параметры, ушедшие в драйвер."""
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db_helper.engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        await operation()
+    finally:
+        event.remove(db_helper.engine.sync_engine, "before_cursor_execute", listener)
+    return statements
+
+
+async def _explain(db_helper, statement: str, parameters) -> str:
+    """Получить план запроса в виде текста."""
+    async with db_helper.engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            await conn.exec_driver_sql("SET enable_seqscan = off")
+            rows = (await conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)).all()
+        else:
+            rows = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)).all()
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+async def _plan_of(db_helper, operation) -> str:
+    """План первого запроса, выполненного операцией."""
+    statements = await _capture_statements(db_helper, operation)
+    return await _explain(db_helper, *statements[0])
+
+
+class TestQueryPlans:
+    """Проверка использования индексов таблицы users."""
+
+    @pytest.fixture
+    async def repository(self, dialect_db_helper, test_user_data) -> UserRepository:
+        repository = UserRepository(dialect_db_helper)
+        for locktime in (0, 1234567890):
+            await repository.create_user({
+                **test_user_data,
+                "id": uuid4(),
+                "locktime": locktime,
+                "created_at": datetime.now()
+            })
+        return repository
+
+    @pytest.mark.asyncio
+    async def test_lease_uses_partial_index(self, dialect_db_helper, repository, test_user_data):
+        """Поиск свободного пользователя идет по частичному индексу."""
+        plan = await _plan_of(dialect_db_helper, lambda: repository.lease_user(
+            project_id=test_user_data["project_id"], env=Env.prod, domain=Domain.regular
+        ))
+
+        assert "ix_users_free_project_env_domain_released" in plan
+        # Порядок ротации дает индекс: сортировки в плане нет
+        assert "TEMP B-TREE" not in plan and "Sort" not in plan
+
+    @pytest.mark.asyncio
+    async def test_lease_batch_uses_partial_index(self, dialect_db_helper, repository, test_user_data):
+        """Пакетный захват идет по частичному индексу."""
+        plan = await _plan_of(dialect_db_helper, lambda: repository.lease_users(
+            10, project_id=test_user_data["project_id"], env=Env.prod, domain=Domain.regular
+        ))
+
+        assert "ix_users_free_project_env_domain_released" in plan
+        assert "TEMP B-TREE" not in plan and "Sort" not in plan
+
+    @pytest.mark.asyncio
+    async def test_project_lease_uses_partial_index(self, dialect_db_helper, repository, test_user_data):
+        """Аренда только по проекту идет по частичному индексу без сортировки свободных строк."""
+        plan = await _plan_of(dialect_db_helper, lambda: repository.lease_user(
+            project_id=test_user_data["project_id"]
+        ))
+
+        assert "ix_users_free_project_env_domain_released" in plan
+        assert "TEMP B-TREE" not in plan and "Sort" not in plan
+
+    @pytest.mark.asyncio
+    async def test_unfiltered_lease_not_sorted(self, dialect_db_helper, repository):
+        """Аренда без фильтра не сортирует все свободные строки."""
+        plan = await _plan_of(dialect_db_helper, lambda: repository.lease_user())
+
+        assert "TEMP B-TREE" not in plan and "Sort" not in plan
+
+    @pytest.mark.asyncio
+    async def test_filtered_list_uses_composite_index(self, dialect_db_helper, repository, test_user_data):
+        """Фильтрованный список идет по составному индексу."""
+        plan = await _plan_of(dialect_db_helper, lambda: repository.list_users(
+            project_id=test_user_data["project_id"], env=Env.prod, domain=Domain.regular, limit=10
+        ))
+
+        assert "ix_users_project_env_domain" in plan
+
+    @pytest.mark.asyncio
+    async def test_unfiltered_list_uses_order_index(self, dialect_db_helper, repository):
+        """Список без фильтра читается в порядке индекса (created_at, id)."""
+        plan = await _plan_of(dialect_db_helper, lambda: repository.list_users(limit=10))
+
+        assert "ix_users_created_at_id" in plan
+
+    @pytest.mark.asyncio
+    async def test_reclaim_uses_expiry_index(self, dialect_db_helper, repository):
+        """Очистка истекших аренд идет по индексу lease_expires_at."""
+        plan = await _plan_of(dialect_db_helper, lambda: repository.reclaim_expired(100))
+
+        assert "ix_users_lease_expires_at" in plan
@@ -1,6 +1,6 @@
 """Тесты для репозитория пользователей."""
 from datetime import datetime
-from uuid import uuid4
+from uuid import UUID, uuid4
 import pytest
 
 from app.application.models import Env, Domain
@@ -183,25 +183,421 @@ class TestUserRepository:
         with pytest.raises(UserNotFoundError):
             await repository.release_lock(uuid4())
 
-    def test_to_dict(self, mock_db_helper):
-        """Тест метода _to_dict."""
+    @pytest.mark.asyncio
+    async def test_lease_user_success(self, mock_db_helper, test_user_data):
+        """Тест захвата свободного пользователя по фильтру."""
         repository = UserRepository(mock_db_helper)
-        
-        # Создаем тестовый объект UserORM
-        user_orm = UserORM(
-            id=uuid4(),
-            login="test@example.com",
-            password="password",
-            project_id=uuid4(),
-            env=Env.prod,
-            domain=Domain.regular,
-            locktime=0,
-            created_at=datetime.now()
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        user_data = {
+            **test_user_data,
+            "locktime": 0,
+            "created_at": datetime.now()
+        }
+        await repository.create_user(user_data)
+
+        result = await repository.lease_user(
+            project_id=user_data["project_id"], env=Env.prod, domain=Domain.regular
         )
-        
-        result = repository._to_dict(user_orm)
-        
-        assert result["id"] == user_orm.id
-        assert result["login"] == user_orm.login
-        assert result["locktime"] == user_orm.locktime
 
+        assert result["id"] == user_data["id"]
+        assert result["locktime"] != 0
+
+    @pytest.mark.asyncio
+    async def test_lease_user_skips_locked_and_filtered(self, mock_db_helper, test_user_data):
+        """Тест, что захватываются только свободные пользователи из фильтра."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        # Заблокированный пользователь в нужном проекте
+        await repository.create_user({
+            **test_user_data,
+            "locktime": 1234567890,
+            "created_at": datetime.now()
+        })
+        # Свободный пользователь в другом окружении
+        await repository.create_user({
+            **test_user_data,
+            "id": uuid4(),
+            "env": Env.stage,
+            "locktime": 0,
+            "created_at": datetime.now()
+        })
+
+        result = await repository.lease_user(project_id=test_user_data["project_id"], env=Env.prod)
+
+        assert result is None
+
+    @pytest.mark.asyncio
+    async def test_lease_user_exhausts_pool(self, mock_db_helper, test_user_data):
+        """Тест, что один пользователь не выдается дважды."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        await repository.create_user({
+            **test_user_data,
+            "locktime": 0,
+            "created_at": datetime.now()
+        })
+
+        first = await repository.lease_user()
+        second = await repository.lease_user()
+
+        assert first is not None
+        assert second is None
+
+    @pytest.mark.asyncio
+    async def test_lease_users_batch(self, mock_db_helper, test_user_data):
+        """Тест пакетного захвата свободных пользователей."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        for _ in range(3):
+            await repository.create_user({
+                **test_user_data,
+                "id": uuid4(),
+                "locktime": 0,
+                "created_at": datetime.now()
+            })
+
+        first = await repository.lease_users(2, project_id=test_user_data["project_id"])
+        second = await repository.lease_users(2, project_id=test_user_data["project_id"])
+
+        assert len(first) == 2
+        assert all(user["locktime"] != 0 for user in first)
+        assert len(second) == 1
+        assert second[0]["id"] not in {user["id"] for user in first}
+
+    @pytest.mark.asyncio
+    async def test_lease_users_batch_tokens_are_distinct(self, mock_db_helper, test_user_data):
+        """Тест, что у каждой строки пакетной блокировки свой токен аренды."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        for _ in range(4):
+            await repository.create_user({**test_user_data, "id": uuid4(), "locktime": 0, "created_at": datetime.now()})
+
+        leased = await repository.lease_users(2, project_id=test_user_data["project_id"])
+        locked, _ = await repository.acquire_locks([user["id"] for user in await repository.list_users(locked=False)])
+        tokens = [user["lease_token"] for user in leased] + [user["lease_token"] for user, _ in locked]
+
+        assert len(tokens) == 4
+        assert all(isinstance(token, UUID) for token in tokens)
+        assert len(set(tokens)) == 4
+        renewed = await repository.renew_leases([(user["id"], user["lease_token"]) for user in leased])
+        assert {row["id"] for row in renewed} == {user["id"] for user in leased}
+
+    @pytest.mark.asyncio
+    async def test_release_users_batch(self, mock_db_helper, test_user_data):
+        """Тест пакетной разблокировки с разными исходами по id."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        locked_id, unlocked_id, missing_id = uuid4(), uuid4(), uuid4()
+        await repository.create_user({
+            **test_user_data,
+            "id": locked_id,
+            "locktime": 1234567890,
+            "created_at": datetime.now()
+        })
+        await repository.create_user({
+            **test_user_data,
+            "id": unlocked_id,
+            "locktime": 0,
+            "created_at": datetime.now()
+        })
+
+        results, not_found = await repository.release_users([locked_id, unlocked_id, missing_id])
+
+        outcomes = {user["id"]: already_unlocked for user, already_unlocked in results}
+        assert outcomes == {locked_id: False, unlocked_id: True}
+        assert all(user["locktime"] == 0 for user, _ in results)
+        assert not_found == [missing_id]
+
+    @pytest.mark.asyncio
+    async def test_acquire_locks_batch(self, mock_db_helper, test_user_data):
+        """Тест пакетной блокировки по id с разными исходами."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        free_id, locked_id, missing_id = uuid4(), uuid4(), uuid4()
+        await repository.create_user({**test_user_data, "id": free_id, "locktime": 0, "created_at": datetime.now()})
+        await repository.create_user({
+            **test_user_data,
+            "id": locked_id,
+            "locktime": 1234567890,
+            "created_at": datetime.now()
+        })
+
+        results, not_found = await repository.acquire_locks([free_id, locked_id, missing_id], ttl=60)
+
+        outcomes = {user["id"]: already_locked for user, already_locked in results}
+        assert outcomes == {free_id: False, locked_id: True}
+        assert all(user["locktime"] != 0 for user, _ in results)
+        assert not_found == [missing_id]
+
+    @pytest.mark.asyncio
+    async def test_lease_prefers_least_recently_released(self, mock_db_helper, test_user_data, monkeypatch):
+        """Тест, что аренда по полному фильтру выдает пользователя, освобожденного раньше всех."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        bucket = {key: test_user_data[key] for key in ("project_id", "env", "domain")}
+        for _ in range(3):
+            await repository.create_user({**test_user_data, "id": uuid4(), "locktime": 0, "created_at": datetime.now()})
+
+        users = await repository.lease_users(3, **bucket)
+        for released_at, user in zip((300, 100, 200), users):
+            monkeypatch.setattr(UserRepository, "_now", staticmethod(lambda: released_at))
+            await repository.release_lock(user["id"])
+
+        # Возврат неиспользованного резерва не сдвигает пользователя в конец очереди
+        reserved = await repository.reserve_users(1, "worker-1", **bucket)
+        await repository.release_reserved("worker-1")
+
+        leased = [await repository.lease_user(**bucket) for _ in range(3)]
+
+        assert reserved[0]["id"] == users[1]["id"]
+        assert [user["id"] for user in leased] == [users[1]["id"], users[2]["id"], users[0]["id"]]
+
+    @pytest.mark.asyncio
+    async def test_reserve_users(self, mock_db_helper, test_user_data):
+        """Тест резервирования блока свободных пользователей за воркером."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        for _ in range(3):
+            await repository.create_user({**test_user_data, "id": uuid4(), "locktime": 0, "created_at": datetime.now()})
+
+        reserved = await repository.reserve_users(2, "worker-1", project_id=test_user_data["project_id"], ttl=60)
+
+        assert len(reserved) == 2
+        assert all(user["locktime"] != 0 and user["lease_expires_at"] for user in reserved)
+        assert await repository.release_reserved("worker-2") == 0
+        assert await repository.release_reserved("worker-1", [reserved[0]["id"]]) == 1
+        assert await repository.release_reserved("worker-1") == 1
+
+    @pytest.mark.asyncio
+    async def test_acquire_lock_with_ttl(self, mock_db_helper, test_user_data):
+        """Тест, что блокировка с TTL выставляет время истечения аренды."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        await repository.create_user({
+            **test_user_data,
+            "locktime": 0,
+            "created_at": datetime.now()
+        })
+
+        user_dict, _ = await repository.acquire_lock(test_user_data["id"], ttl=60)
+        assert user_dict["lease_expires_at"] == user_dict["locktime"] + 60
+
+        user_dict, _ = await repository.release_lock(test_user_data["id"])
+        assert user_dict["lease_expires_at"] is None
+
+    @pytest.mark.asyncio
+    async def test_reclaim_expired(self, mock_db_helper, test_user_data):
+        """Тест освобождения только истекших аренд в пределах лимита."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        expired_ids = [uuid4(), uuid4()]
+        for user_id in expired_ids:
+            await repository.create_user({
+                **test_user_data,
+                "id": user_id,
+                "locktime": 1234567890,
+                "lease_expires_at": 1234567950,
+                "created_at": datetime.now()
+            })
+        # Бессрочная аренда не должна освобождаться
+        await repository.create_user({
+            **test_user_data,
+            "id": uuid4(),
+            "locktime": 1234567890,
+            "created_at": datetime.now()
+        })
+
+        first = await repository.reclaim_expired(limit=1)
+        second = await repository.reclaim_expired(limit=10)
+
+        assert len(first) == 1
+        assert len(second) == 1
+        reclaimed = first + second
+        assert {user["id"] for user in reclaimed} == set(expired_ids)
+        assert all(user["locktime"] == 0 and user["lease_expires_at"] is None for user in reclaimed)
+
+    @pytest.mark.asyncio
+    async def test_renew_leases(self, mock_db_helper, test_user_data):
+        """Тест продления аренд только текущим держателем."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        for _ in range(3):
+            await repository.create_user({
+                **test_user_data,
+                "id": uuid4(),
+                "locktime": 0,
+                "created_at": datetime.now()
+            })
+        held, stolen, released = await repository.lease_users(3, ttl=10)
+        await repository.release_lock(released["id"])
+
+        renewed = await repository.renew_leases(
+            [
+                (held["id"], held["lease_token"]),
+                (stolen["id"], uuid4()),
+                (released["id"], released["lease_token"]),
+            ],
+            ttl=600,
+        )
+
+        assert [row["id"] for row in renewed] == [held["id"]]
+        assert renewed[0]["lease_expires_at"] >= held["locktime"] + 600
+
+    @pytest.mark.asyncio
+    async def test_version_changes_on_writes(self, mock_db_helper, test_user_data):
+        """Тест, что версия данных меняется после записи и освобождения в другом воркере, но не после чтения."""
+        from app.infrastructure.db.notifications import ReleaseNotifier
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        notifier = ReleaseNotifier()
+        repository = UserRepository(mock_db_helper, release_notifier=notifier)
+        initial = repository.version
+
+        user = await repository.create_user({**test_user_data, "locktime": 0, "created_at": datetime.now()})
+        created = repository.version
+        await repository.list_users()
+        await repository.get_user(user["id"])
+
+        assert initial != created
+        assert repository.version == created
+
+        notifier._dispatch({(user["project_id"], "prod", "regular"): 1})
+        assert repository.version != created
+        assert UserRepository(mock_db_helper).version != initial
+
+    @pytest.mark.asyncio
+    async def test_renew_leases_without_ttl(self, mock_db_helper, test_user_data):
+        """Тест, что продление без TTL не меняет время истечения."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        await repository.create_user({
+            **test_user_data,
+            "locktime": 0,
+            "created_at": datetime.now()
+        })
+        user_dict, _ = await repository.acquire_lock(test_user_data["id"], ttl=30)
+
+        renewed = await repository.renew_leases([(user_dict["id"], user_dict["lease_token"])])
+
+        assert [(row["id"], row["lease_expires_at"]) for row in renewed] == [
+            (user_dict["id"], user_dict["lease_expires_at"])
+        ]
+
+    @pytest.mark.asyncio
+    async def test_list_users_keyset_pagination(self, mock_db_helper, test_user_data):
+        """Тест фильтрации и keyset-пагинации по (created_at, id)."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        created_at = datetime.now()
+        ids = sorted(uuid4() for _ in range(3))
+        for user_id in ids:
+            await repository.create_user({
+                **test_user_data,
+                "id": user_id,
+                "locktime": 0,
+                "created_at": created_at
+            })
+        await repository.create_user({
+            **test_user_data,
+            "id": uuid4(),
+            "locktime": 1234567890,
+            "created_at": created_at
+        })
+
+        first = await repository.list_users(project_id=test_user_data["project_id"], locked=False, limit=2)
+        last = first[-1]
+        second = await repository.list_users(
+            project_id=test_user_data["project_id"],
+            locked=False,
+            after=(last["created_at"], last["id"]),
+            limit=2,
+        )
+        locked = await repository.list_users(locked=True)
+
+        assert [user["id"] for user in first + second] == ids
+        assert len(locked) == 1
+        assert locked[0]["locktime"] == 1234567890
+
+    @pytest.mark.asyncio
+    async def test_iter_users_stream(self, mock_db_helper, test_user_data):
+        """Тест потоковой выгрузки пользователей по фильтру."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        for locktime in (0, 0, 1234567890):
+            await repository.create_user({
+                **test_user_data,
+                "id": uuid4(),
+                "locktime": locktime,
+                "created_at": datetime.now()
+            })
+
+        free = [user async for user in repository.iter_users(locked=False, batch_size=1)]
+        everyone = [user async for user in repository.iter_users(project_id=test_user_data["project_id"])]
+
+        assert len(free) == 2
+        assert all(user["locktime"] == 0 for user in free)
+        assert len(everyone) == 3
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_users(self, mock_db_helper, test_user_data):
+        """Тест массовой вставки с пропуском уже существующих id."""
+        repository = UserRepository(mock_db_helper)
+
+        async with mock_db_helper.engine.begin() as conn:
+            await conn.run_sync(UserORM.metadata.create_all)
+
+        existing = {**test_user_data, "locktime": 0, "created_at": datetime.now()}
+        await repository.create_user(existing)
+        new_rows = [{**existing, "id": uuid4()} for _ in range(3)]
+
+        inserted = await repository.bulk_create_users([existing, *new_rows])
+
+        assert set(inserted) == {row["id"] for row in new_rows}
+        assert len(await repository.list_users()) == 4
@@ -0,0 +1,155 @@
+"""Тесты для резервов пользователей воркера."""
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select
+
+from app.application.services.reservation import ReservationPool
+from app.application.services.user import UserService
+from app.infrastructure.db.schemas import User as UserORM
+
+
+async def _rows(mock_db_helper) -> dict:
+    async with mock_db_helper.session_only() as session:
+        result = await session.execute(
+            select(UserORM.id, UserORM.locktime, UserORM.reserved_by, UserORM.lease_expires_at)
+        )
+        return {row.id: row for row in result.all()}
+
+
+def _pool(repository, **kwargs) -> ReservationPool:
+    options = {"block_size": 3, "low_water": 1, "reservation_ttl": 60, "flush_interval": 60, **kwargs}
+    return ReservationPool(repository, **options)
+
+
+class TestReservationPool:
+    """Тесты для ReservationPool."""
+
+    @pytest.mark.asyncio
+    async def test_refill_and_take_from_memory(self, repository, create_users, mock_db_helper, test_user_data):
+        """Тест, что после дозаполнения аренды выдаются без запросов к БД."""
+        await create_users(repository, 5)
+        pool = _pool(repository)
+        project_id = test_user_data["project_id"]
+
+        # Первый запрос - промах, он же запускает дозаполнение
+        assert pool.take(project_id=project_id) is None
+        await pool.maintain()
+
+        rows = await _rows(mock_db_helper)
+        assert sum(row.reserved_by == pool.worker_id for row in rows.values()) == 3
+
+        with patch.object(mock_db_helper, "transaction") as transaction:
+            first = pool.take(project_id=project_id, ttl=30)
+            second = pool.take(project_id=project_id)
+        transaction.assert_not_called()
+        assert first["id"] != second["id"]
+        assert first["lease_expires_at"] == first["locktime"] + 30
+
+        await pool.maintain()
+
+        rows = await _rows(mock_db_helper)
+        assert rows[first["id"]].reserved_by is None
+        assert rows[first["id"]].lease_expires_at == first["lease_expires_at"]
+        assert rows[second["id"]].lease_expires_at is None
+        # Резерв опустился до low_water и был дозаполнен до block_size
+        assert sum(row.reserved_by == pool.worker_id for row in rows.values()) == 3
+
+    @pytest.mark.asyncio
+    async def test_leases_from_block_have_own_tokens(self, repository, create_users):
+        """Тест, что аренды из одного блока резерва получают разные токены, действующие сразу."""
+        await create_users(repository, 3)
+        pool = _pool(repository, low_water=0)
+        pool.take()
+        await pool.maintain()
+
+        leases = [pool.take() for _ in range(3)]
+        assert len({lease["lease_token"] for lease in leases}) == 3
+
+        # Токен действует и до, и после записи аренды в БД
+        for confirmed in (False, True):
+            if confirmed:
+                await pool.maintain()
+            renewed = await repository.renew_leases([(lease["id"], lease["lease_token"]) for lease in leases])
+            assert len(renewed) == 3
+
+    @pytest.mark.asyncio
+    async def test_released_before_confirm_stays_free(self, repository, create_users, mock_db_helper):
+        """Тест, что аренда, освобожденная до записи в БД, освобождается сразу после записи."""
+        await create_users(repository, 1)
+        pool = _pool(repository, low_water=0)
+        service = UserService(repository, reservation_pool=pool)
+        pool.take()
+        await pool.maintain()
+
+        user = pool.take()
+        released = await service.release_lock(user["id"])
+        again = await service.release_users([user["id"]])
+
+        assert not released.already_unlocked
+        assert [result.already_unlocked for result in again.results] == [True]
+        # Строка все еще в резерве: освобождение ждет записи аренды
+        assert (await _rows(mock_db_helper))[user["id"]].reserved_by == pool.worker_id
+
+        await pool._confirm()
+
+        row = (await _rows(mock_db_helper))[user["id"]]
+        assert (row.locktime, row.reserved_by) == (0, None)
+        assert await repository.lease_user() is not None
+
+    @pytest.mark.asyncio
+    async def test_release_of_reserved_row_keeps_reserve(self, repository, create_users):
+        """Тест, что освобождение строки из резерва до ее выдачи не отдает ее второй раз."""
+        (user,) = await create_users(repository, 1)
+        pool = _pool(repository, block_size=1, low_water=0)
+        pool.take()
+        await pool.maintain()
+
+        _, already_unlocked = await repository.release_lock(user["id"])
+        results, _ = await repository.release_users([user["id"]])
+
+        assert already_unlocked
+        assert [already_unlocked for _, already_unlocked in results] == [True]
+        assert pool.take()["id"] == user["id"]
+        assert await repository.lease_user() is None
+
+    @pytest.mark.asyncio
+    async def test_stop_returns_unused_reservations(self, repository, create_users, mock_db_helper):
+        """Тест, что при остановке выданные аренды записываются, а остаток резерва возвращается."""
+        await create_users(repository, 3)
+        pool = _pool(repository, low_water=0)
+        pool.start()
+        pool.take()
+        await pool.maintain()
+        user = pool.take()
+
+        await pool.stop()
+
+        rows = await _rows(mock_db_helper)
+        assert rows[user["id"]].locktime != 0
+        assert all(row.reserved_by is None for row in rows.values())
+        assert sum(row.locktime == 0 for row in rows.values()) == 2
+
+    @pytest.mark.asyncio
+    async def test_stale_reservations_not_handed_out(self, repository, create_users, mock_db_helper):
+        """Тест, что резерв старше половины TTL возвращается, а не выдается."""
+        await create_users(repository, 2)
+        pool = _pool(repository, block_size=2, low_water=0, reservation_ttl=0)
+        pool.take()
+        await pool.maintain()
+
+        assert pool.take() is None
+        await pool.maintain()
+
+        rows = await _rows(mock_db_helper)
+        assert all(row.locktime == 0 or row.reserved_by == pool.worker_id for row in rows.values())
+
+    def test_handles_project_allowlist(self, repository):
+        """Тест ограничения резервов списком проектов."""
+        project_id = uuid4()
+        pool = _pool(repository, project_ids=[project_id])
+
+        assert pool.handles(project_id)
+        assert not pool.handles(uuid4())
+        assert _pool(repository).handles(None)
@@ -3,7 +3,7 @@ from datetime import datetime
 from uuid import uuid4
 import pytest
 
-from app.application.models import UserRead
+from app.application.models import UserFilter, UserListFilter, UserRead
 from app.application.services.user import UserService
 from app.infrastructure.db.repository.user import UserNotFoundError
 from fastapi import HTTPException, status
@@ -64,20 +64,51 @@ class TestUserService:
         assert "created_at" in call_args
         assert isinstance(call_args["created_at"], datetime)
 
+    @pytest.mark.asyncio
+    async def test_bulk_create_users(self, mock_user_repository, test_user_create):
+        """Тест массового импорта с ошибками валидации, повторами и существующими id."""
+        from unittest.mock import AsyncMock
+        service = UserService(mock_user_repository)
+        existing_id = uuid4()
+        row = test_user_create.model_dump(mode="json")
+
+        async def mock_bulk_create_users(users):
+            return [user["id"] for user in users if user["id"] != existing_id]
+
+        mock_user_repository.bulk_create_users = AsyncMock(side_effect=mock_bulk_create_users)
+
+        async def chunks():
+            yield [row, {**row, "id": str(uuid4()), "login": "not-an-email"}]
+            yield [{**row, "id": str(existing_id)}, row, "not-a-dict"]
+
+        result = await service.bulk_create_users(chunks())
+
+        assert result.created == [test_user_create.id]
+        assert [(f.index, f.error.split(":")[0]) for f in result.failures] == [
+            (1, "login"),
+            (2, "User already exists"),
+            (3, "Duplicate id in request"),
+            (4, "row"),
+        ]
+        inserted = mock_user_repository.bulk_create_users.call_args_list[0].args[0]
+        assert inserted[0]["locktime"] == 0
+        assert isinstance(inserted[0]["created_at"], datetime)
+
     @pytest.mark.asyncio
     async def test_get_users_empty(self, mock_user_repository):
         """Тест получения пустого списка пользователей."""
         from unittest.mock import AsyncMock
         service = UserService(mock_user_repository)
         
-        async def mock_list_users():
+        async def mock_list_users(**kwargs):
             return []
         
         mock_user_repository.list_users = AsyncMock(side_effect=mock_list_users)
         
         result = await service.get_users()
         
-        assert result == []
+        assert result.items == []
+        assert result.next_cursor is None
 
     @pytest.mark.asyncio
     async def test_get_users_success(self, mock_user_repository, test_user_read):
@@ -85,16 +116,115 @@ class TestUserService:
         from unittest.mock import AsyncMock
         service = UserService(mock_user_repository)
         
-        async def mock_list_users():
+        async def mock_list_users(**kwargs):
             return [test_user_read.model_dump()]
         
         mock_user_repository.list_users = AsyncMock(side_effect=mock_list_users)
         
         result = await service.get_users()
         
+        assert len(result.items) == 1
+        assert isinstance(result.items[0], UserRead)
+        assert result.items[0].login == test_user_read.login
+        assert result.next_cursor is None
+
+    @pytest.mark.asyncio
+    async def test_get_users_single_flight(self, mock_user_repository, test_user_read):
+        """Тест, что одновременные одинаковые чтения делят один запрос к репозиторию."""
+        import asyncio
+        from unittest.mock import AsyncMock
+        from app.application.models import UserListFilter
+        service = UserService(mock_user_repository)
+        release = asyncio.Event()
+
+        async def mock_list_users(**kwargs):
+            await release.wait()
+            return [test_user_read.model_dump()]
+
+        mock_user_repository.list_users = AsyncMock(side_effect=mock_list_users)
+        project_filter = UserListFilter(project_id=test_user_read.project_id)
+
+        same = [asyncio.create_task(service.get_users(project_filter)) for _ in range(3)]
+        cancelled = asyncio.create_task(service.get_users(project_filter))
+        other = asyncio.create_task(service.get_users(project_filter, limit=10))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        release.set()
+
+        pages = await asyncio.gather(*same, other)
+        assert all(page.items[0].login == test_user_read.login for page in pages)
+        assert mock_user_repository.list_users.await_count == 2
+
+        # После завершения запроса результат не переиспользуется
+        await service.get_users(project_filter)
+        assert mock_user_repository.list_users.await_count == 3
+
+    def test_users_etag(self, mock_user_repository):
+        """Тест, что ETag меняется с версией данных и раз в etag_max_age секунд."""
+        from unittest.mock import patch
+        service = UserService(mock_user_repository, etag_max_age=10)
+
+        with patch("app.application.services.user.time.time", return_value=100.0):
+            etag = service.users_etag()
+            assert service.users_etag() == etag
+            mock_user_repository._version += 1
+            changed = service.users_etag()
+            assert changed != etag
+        with patch("app.application.services.user.time.time", return_value=110.0):
+            assert service.users_etag() != changed
+
+        assert UserService(mock_user_repository).users_etag() == f'W/"{mock_user_repository.version}"'
+
+    @pytest.mark.asyncio
+    async def test_get_users_pagination(self, mock_user_repository, test_user_read):
+        """Тест выдачи курсора и его передачи в репозиторий."""
+        from unittest.mock import AsyncMock
+        service = UserService(mock_user_repository)
+
+        rows = [{**test_user_read.model_dump(), "id": uuid4()} for _ in range(3)]
+        mock_user_repository.list_users = AsyncMock(return_value=rows)
+
+        page = await service.get_users(UserListFilter(locked=False), limit=2)
+
+        assert len(page.items) == 2
+        assert page.next_cursor is not None
+        call_kwargs = mock_user_repository.list_users.call_args.kwargs
+        assert call_kwargs["limit"] == 3
+        assert call_kwargs["locked"] is False
+        assert call_kwargs["after"] is None
+
+        await service.get_users(cursor=page.next_cursor, limit=2)
+
+        after = mock_user_repository.list_users.call_args.kwargs["after"]
+        assert after == (page.items[-1].created_at, page.items[-1].id)
+
+    @pytest.mark.asyncio
+    async def test_get_users_invalid_cursor(self, mock_user_repository):
+        """Тест некорректного курсора."""
+        service = UserService(mock_user_repository)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.get_users(cursor="not-a-cursor")
+
+        assert exc_info.value.status_code == status.HTTP_400_BAD_REQUEST
+
+    @pytest.mark.asyncio
+    async def test_export_users(self, mock_user_repository, test_user_read):
+        """Тест потоковой выгрузки пользователей."""
+        service = UserService(mock_user_repository)
+        captured = {}
+
+        async def mock_iter_users(**kwargs):
+            captured.update(kwargs)
+            yield test_user_read.model_dump()
+
+        mock_user_repository.iter_users = mock_iter_users
+
+        result = [user async for user in service.export_users(UserListFilter(locked=True))]
+
         assert len(result) == 1
         assert isinstance(result[0], UserRead)
-        assert result[0].login == test_user_read.login
+        assert captured["locked"] is True
 
     @pytest.mark.asyncio
     async def test_acquire_lock_success(self, mock_user_repository, test_user_read):
@@ -103,7 +233,7 @@ class TestUserService:
         service = UserService(mock_user_repository)
         user_id = test_user_read.id
         
-        async def mock_acquire_lock(uid):
+        async def mock_acquire_lock(uid, ttl=None):
             locked_user = {**test_user_read.model_dump(), "locktime": 1234567890}
             return locked_user, False
         
@@ -114,6 +244,22 @@ class TestUserService:
         assert result.already_locked is False
         assert isinstance(result.user, UserRead)
 
+    @pytest.mark.asyncio
+    async def test_acquire_lock_default_ttl(self, mock_user_repository, test_user_read):
+        """Тест, что без TTL в запросе используется TTL из настроек сервиса."""
+        from unittest.mock import AsyncMock
+        service = UserService(mock_user_repository, lease_ttl=300)
+
+        mock_user_repository.acquire_lock = AsyncMock(
+            return_value=({**test_user_read.model_dump(), "locktime": 1234567890}, False)
+        )
+
+        await service.acquire_lock(test_user_read.id)
+        assert mock_user_repository.acquire_lock.call_args.kwargs["ttl"] == 300
+
+        await service.acquire_lock(test_user_read.id, ttl=60)
+        assert mock_user_repository.acquire_lock.call_args.kwargs["ttl"] == 60
+
     @pytest.mark.asyncio
     async def test_acquire_lock_already_locked(self, mock_user_repository, test_user_read):
         """Тест блокировки уже заблокированного пользователя."""
@@ -121,7 +267,7 @@ class TestUserService:
         service = UserService(mock_user_repository)
         user_id = test_user_read.id
         
-        async def mock_acquire_lock(uid):
+        async def mock_acquire_lock(uid, ttl=None):
             locked_user = {**test_user_read.model_dump(), "locktime": 1234567890}
             return locked_user, True
         
@@ -139,7 +285,7 @@ class TestUserService:
         service = UserService(mock_user_repository)
         user_id = uuid4()
         
-        async def mock_acquire_lock(uid):
+        async def mock_acquire_lock(uid, ttl=None):
             raise UserNotFoundError()
         
         mock_user_repository.acquire_lock = AsyncMock(side_effect=mock_acquire_lock)
@@ -149,6 +295,150 @@ class TestUserService:
         
         assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
 
+    @pytest.mark.asyncio
+    async def test_lease_user_success(self, mock_user_repository, test_user_read):
+        """Тест захвата свободного пользователя по фильтру."""
+        from unittest.mock import AsyncMock
+        service = UserService(mock_user_repository)
+        user_filter = UserFilter(project_id=test_user_read.project_id)
+
+        async def mock_lease_user(**kwargs):
+            return {**test_user_read.model_dump(), "locktime": 1234567890}
+
+        mock_user_repository.lease_user = AsyncMock(side_effect=mock_lease_user)
+
+        result = await service.lease_user(user_filter)
+
+        assert isinstance(result, UserRead)
+        assert result.locktime == 1234567890
+        call_kwargs = mock_user_repository.lease_user.call_args.kwargs
+        assert call_kwargs["project_id"] == test_user_read.project_id
+        assert call_kwargs["env"] is None
+
+    @pytest.mark.asyncio
+    async def test_lease_user_no_free_users(self, mock_user_repository):
+        """Тест захвата, когда свободных пользователей нет."""
+        from unittest.mock import AsyncMock
+        service = UserService(mock_user_repository)
+
+        mock_user_repository.lease_user = AsyncMock(return_value=None)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.lease_user(UserFilter())
+
+        assert exc_info.value.status_code == status.HTTP_409_CONFLICT
+
+    @pytest.mark.asyncio
+    async def test_lease_counters(self, mock_user_repository, test_user_read):
+        """Тест доменных счетчиков аренд."""
+        from unittest.mock import AsyncMock
+        from app.application.services.user import (
+            LEASES_ACQUIRED,
+            LEASES_ALREADY_LOCKED,
+            LEASES_EXHAUSTED,
+            LEASES_RELEASED,
+        )
+        service = UserService(mock_user_repository)
+        user = {**test_user_read.model_dump(), "locktime": 1234567890}
+        before = [c.labels().value for c in (LEASES_ACQUIRED, LEASES_ALREADY_LOCKED, LEASES_EXHAUSTED, LEASES_RELEASED)]
+
+        mock_user_repository.acquire_lock = AsyncMock(side_effect=[(user, False), (user, True)])
+        mock_user_repository.lease_users = AsyncMock(return_value=[user, user])
+        mock_user_repository.release_users = AsyncMock(return_value=([(user, False), (user, True)], []))
+        await service.acquire_lock(test_user_read.id)
+        await service.acquire_lock(test_user_read.id)
+        await service.lease_users(UserFilter(), 3)
+        await service.release_users([test_user_read.id, test_user_read.id])
+
+        after = [c.labels().value for c in (LEASES_ACQUIRED, LEASES_ALREADY_LOCKED, LEASES_EXHAUSTED, LEASES_RELEASED)]
+        assert [a - b for a, b in zip(after, before)] == [3, 1, 1, 1]
+
+    @pytest.mark.asyncio
+    async def test_single_leases_use_coalescer(self, mock_user_repository, test_user_read):
+        """Тест, что при включенном коалесцере одиночные блокировки идут через него."""
+        from unittest.mock import AsyncMock, Mock
+        coalescer = Mock()
+        coalescer.acquire_lock = AsyncMock(return_value=({**test_user_read.model_dump(), "locktime": 1}, False))
+        coalescer.lease_user = AsyncMock(return_value=None)
+        service = UserService(mock_user_repository, lease_coalescer=coalescer)
+
+        result = await service.acquire_lock(test_user_read.id)
+        with pytest.raises(HTTPException):
+            await service.lease_user(UserFilter())
+
+        assert result.already_locked is False
+        coalescer.acquire_lock.assert_awaited_once()
+        coalescer.lease_user.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_lease_user_from_reservation(self, mock_user_repository, test_user_read):
+        """Тест, что аренда берется из резерва воркера, а при промахе - из БД."""
+        from unittest.mock import AsyncMock, Mock
+        reserved = {**test_user_read.model_dump(), "locktime": 1234567890}
+        reservations = Mock()
+        reservations.handles = Mock(return_value=True)
+        reservations.take = Mock(side_effect=[reserved, None])
+        mock_user_repository.lease_user = AsyncMock(return_value=reserved)
+        service = UserService(mock_user_repository, lease_ttl=60, reservation_pool=reservations)
+
+        await service.lease_user(UserFilter())
+        mock_user_repository.lease_user.assert_not_awaited()
+        assert reservations.take.call_args.kwargs["ttl"] == 60
+
+        await service.lease_user(UserFilter())
+        mock_user_repository.lease_user.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_lease_users_success(self, mock_user_repository, test_user_read):
+        """Тест пакетного захвата пользователей."""
+        from unittest.mock import AsyncMock
+        service = UserService(mock_user_repository)
+
+        locked_user = {**test_user_read.model_dump(), "locktime": 1234567890}
+        mock_user_repository.lease_users = AsyncMock(return_value=[locked_user])
+
+        result = await service.lease_users(UserFilter(), 5)
+
+        assert len(result) == 1
+        assert result[0].already_locked is False
+        assert result[0].user.locktime == 1234567890
+        assert mock_user_repository.lease_users.call_args.args == (5,)
+
+    @pytest.mark.asyncio
+    async def test_release_users_success(self, mock_user_repository, test_user_read):
+        """Тест пакетной разблокировки пользователей."""
+        from unittest.mock import AsyncMock
+        service = UserService(mock_user_repository)
+        missing_id = uuid4()
+
+        mock_user_repository.release_users = AsyncMock(
+            return_value=([({**test_user_read.model_dump(), "locktime": 0}, True)], [missing_id])
+        )
+
+        result = await service.release_users([test_user_read.id, missing_id])
+
+        assert len(result.results) == 1
+        assert result.results[0].already_unlocked is True
+        assert result.not_found == [missing_id]
+
+    @pytest.mark.asyncio
+    async def test_renew_leases(self, mock_user_repository):
+        """Тест продления аренд с разделением на продленные и потерянные."""
+        from unittest.mock import AsyncMock
+        service = UserService(mock_user_repository, lease_ttl=120)
+        held_id, lost_id = uuid4(), uuid4()
+
+        mock_user_repository.renew_leases = AsyncMock(
+            return_value=[{"id": held_id, "lease_expires_at": 1234567890}]
+        )
+
+        result = await service.renew_leases([(held_id, uuid4()), (lost_id, uuid4())])
+
+        assert [lease.user_id for lease in result.renewed] == [held_id]
+        assert result.renewed[0].lease_expires_at == 1234567890
+        assert result.lost == [lost_id]
+        assert mock_user_repository.renew_leases.call_args.kwargs["ttl"] == 120
+
     @pytest.mark.asyncio
     async def test_release_lock_success(self, mock_user_repository, test_user_read):
         """Тест успешной разблокировки пользователя."""